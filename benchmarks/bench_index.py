@@ -0,0 +1,119 @@
+"""
+索引后端基准测试：后缀 pygtrie（FileIndexer）与 trigram 倒排（NgramIndexer）
+对比构建耗时、内存占用、索引文件加载与查询延迟，并校验两者搜索结果一致；
+另外测量 top-k 查询与逐字输入（前缀复用缓存）的延迟
+
+用法: python benchmarks/bench_index.py [--files 20000] [--seed 0]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'search_files_app'))
+
+import everything
+from ngram_index import NgramIndexer
+
+WORDS = ['report', 'photo', 'IMG', 'video', 'backup', 'draft', 'final', 'project',
+         'notes', 'data', 'readme', '截图', '文档', 'Übersicht', 'test', 'build']
+EXTS = ['.jpg', '.png', '.mp4', '.txt', '.py', '.docx', '.zip', '']
+QUERIES = ['a', 'im', 'rep', 'photo', 'final report', '截图', 'übers', '.mp4', 'zzz', 'draft 2023 jpg']
+TYPING = ['f', 'fi', 'fin', 'fina', 'final', 'final r', 'final re', 'final rep', 'final repo']
+
+
+def make_paths(num_files, seed):
+    """
+    生成可复现的合成文件路径（不落盘）
+    """
+    rng = random.Random(seed)
+    dirs = ['/data']
+    paths = []
+    for i in range(num_files):
+        if rng.random() < 0.05:
+            dirs.append(os.path.join(rng.choice(dirs), rng.choice(WORDS) + str(len(dirs))))
+        name = '_'.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        name += f"_{rng.randint(2000, 2025)}_{i}" + rng.choice(EXTS)
+        paths.append((name, os.path.join(rng.choice(dirs), name)))
+    return paths
+
+
+def build(indexer_cls, paths):
+    """
+    返回 (索引, 构建耗时ms, 内存占用MB)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    indexer = indexer_cls()
+    for name, full_path in paths:
+        indexer._add_to_index(name, full_path)
+    elapsed = (time.perf_counter() - start) * 1000
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return indexer, elapsed, current / 1024 / 1024
+
+
+def time_query(searcher, query, limit=None, repeat=5):
+    """不使用查询缓存的最佳耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        searcher._cache.clear()
+        start = time.perf_counter()
+        results = searcher.search(query, limit=limit)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引后端基准测试")
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = make_paths(args.files, args.seed)
+    print(f"合成文件数：{len(paths)}")
+
+    backends = [("trie", everything.FileIndexer), ("ngram", NgramIndexer)]
+    searchers = {}
+    for label, cls in backends:
+        indexer, elapsed, memory = build(cls, paths)
+        searchers[label] = everything.FileSearcher(indexer)
+        print(f"{label:<6} 构建耗时: {elapsed:>10.2f}ms  内存: {memory:>9.2f}MB")
+
+    print()
+    for label, indexer_cls, filename in [("trie", everything.FileIndexer, "bench_index.pkl"),
+                                         ("ngram", NgramIndexer, "bench_index.sbidx")]:
+        path = os.path.join(tempfile.gettempdir(), filename)
+        searchers[label].indexer.save_index(path)
+        start = time.perf_counter()
+        loaded = indexer_cls()
+        loaded.load_index(path)
+        everything.FileSearcher(loaded).search(QUERIES[2])
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label:<6} 索引文件: {os.path.getsize(path) / 1024 / 1024:>9.2f}MB  加载+首次查询: {elapsed:>10.2f}ms")
+        del loaded  # 避免释放上一个索引的耗时计入下一次测量
+        os.remove(path)
+
+    print(f"\n{'查询':<16}{'结果数':>8}{'trie(ms)':>12}{'ngram(ms)':>12}{'ngram top100(ms)':>18}")
+    for query in QUERIES:
+        trie_ms, trie_results = time_query(searchers["trie"], query)
+        ngram_ms, ngram_results = time_query(searchers["ngram"], query)
+        top_ms, top_results = time_query(searchers["ngram"], query, limit=100)
+        mark = '' if trie_results == ngram_results and top_results == ngram_results[:100] else '  结果不一致!'
+        print(f"{query:<16}{len(trie_results):>8}{trie_ms:>12.2f}{ngram_ms:>12.2f}{top_ms:>18.2f}{mark}")
+
+    print(f"\n逐字输入（ngram，top100，前缀复用缓存）")
+    searcher = searchers["ngram"]
+    searcher._cache.clear()
+    for query in TYPING:
+        start = time.perf_counter()
+        results = searcher.search(query, limit=100)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{query!r:<16}{len(results):>8}{elapsed:>12.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
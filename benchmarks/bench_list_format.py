@@ -0,0 +1,90 @@
+"""
+列表响应格式基准：逐条 JSON（get_files + jsonify）与列式格式（file_columns）
+对比服务端 CPU（读取目录并编码 / 已缓存时只编码）与响应大小（原始、gzip、brotli），
+以及分页列表（/list）首页的耗时：各排序方式首次计算行顺序，与之后的翻页
+
+用法: python benchmarks/bench_list_format.py [--files 100000] [--repeat 3]
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_app'))
+
+from modules import file_dir, file_columns
+from bench_listing import make_tree
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def legacy_encode(file_list):
+    # 与 flask.jsonify 的默认设置相同（ensure_ascii、紧凑分隔符）
+    return json.dumps(file_list, separators=(',', ':')).encode('utf-8')
+
+
+def columns_encode(columns):
+    return json.dumps(columns.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def first_page(columns, sort, reverse, page_size):
+    page = columns.take(columns.order(sort, reverse)[:page_size])
+    return columns_encode(page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表响应格式基准")
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--page-size', type=int, default=500)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='storagebox_bench_')
+    try:
+        print(f"生成测试目录：{args.files} 个文件...")
+        make_tree(root, args.files, 0)
+
+        cases = [
+            ("逐条 JSON", file_dir.get_files, legacy_encode),
+            ("列式 JSON", file_columns.scan, columns_encode),
+        ]
+        print(f"\n{'格式':<12}{'读取+编码(ms)':>16}{'仅编码(ms)':>14}{'原始(KB)':>12}{'gzip(KB)':>12}{'br(KB)':>10}")
+        for label, load, encode in cases:
+            total_ms, body = best_of(lambda: encode(load(root)), args.repeat)
+            cached = load(root)
+            encode_ms, _ = best_of(lambda: encode(cached), args.repeat)
+            gzip_size = len(gzip.compress(body, file_columns.GZIP_LEVEL))
+            br_size = (len(file_columns.brotli.compress(body, quality=file_columns.BROTLI_QUALITY))
+                       if file_columns.brotli else float('nan'))
+            print(f"{label:<12}{total_ms:>16.1f}{encode_ms:>14.1f}{len(body) / 1024:>12.1f}"
+                  f"{gzip_size / 1024:>12.1f}{br_size / 1024:>10.1f}")
+
+        columns = file_columns.scan(root)
+        print(f"\n{'分页排序':<12}{'首次(ms)':>12}{'已缓存(ms)':>14}{'末页(ms)':>12}")
+        for sort in file_columns.SORTS:
+            for reverse in (False, True):
+                start = time.perf_counter()
+                first_page(columns, sort, reverse, args.page_size)
+                cold_ms = (time.perf_counter() - start) * 1000
+                cached_ms, _ = best_of(lambda: first_page(columns, sort, reverse, args.page_size), args.repeat)
+                last_ms, _ = best_of(lambda: columns_encode(columns.take(
+                    columns.order(sort, reverse)[-args.page_size:])), args.repeat)
+                label = f"{sort} {'desc' if reverse else 'asc'}"
+                print(f"{label:<12}{cold_ms:>12.1f}{cached_ms:>14.2f}{last_ms:>12.2f}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+目录列表基准测试：旧版 listdir + getmtime/isdir/getsize 与 scandir 引擎对比
+统计每次列表的 stat 系统调用次数与耗时
+
+用法: python benchmarks/bench_listing.py [--files 100000] [--dirs 100] [--repeat 5]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_app'))
+
+from modules import file_dir
+
+
+def legacy_get_files(path):
+    """
+    原 get_files 实现（listdir + 每项多次 stat），仅用于对比
+    """
+    if not os.path.exists(path):
+        return
+    dir_list = []
+    files = [os.path.join(path, f) for f in os.listdir(path)]
+    for file_path in files:
+        name = os.path.basename(file_path)
+        modified_time = os.path.getmtime(file_path)
+        modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(modified_time))
+        if os.path.isdir(file_path):
+            file_type = "文件夹"
+            icon = ""
+            size = "-"
+        else:
+            size = os.path.getsize(file_path)
+            _, ext = os.path.splitext(name)
+            file_type = ext[1:].lower() if ext else "file"
+            if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']:
+                icon = os.path.join(path, name)
+            else:
+                icon = ""
+        dir_list.append({
+            "icon": icon,
+            "name": name,
+            "modified": modified,
+            "type": file_type,
+            "size": file_dir.convert_size(str(size)),
+            "path": path
+        })
+    return file_dir.sort_files(dir_list)
+
+
+class StatCounter:
+    """
+    通过包装 os.stat / os.scandir 统计 stat 调用次数
+    DirEntry.stat() 在 C 层直接调用 stat，因此用代理对象计数
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        self._stat = os.stat
+        self._scandir = os.scandir
+        counter = self
+
+        def counting_stat(*args, **kwargs):
+            counter.count += 1
+            return counter._stat(*args, **kwargs)
+
+        class CountingEntry:
+            def __init__(self, entry):
+                self._entry = entry
+                self.name = entry.name
+                self.path = entry.path
+                self._stat_cache = {}
+
+            def stat(self, follow_symlinks=True):
+                # DirEntry 会缓存 stat 结果，只有首次调用才产生系统调用
+                if follow_symlinks not in self._stat_cache:
+                    counter.count += 1
+                    self._stat_cache[follow_symlinks] = self._entry.stat(follow_symlinks=follow_symlinks)
+                return self._stat_cache[follow_symlinks]
+
+            def is_dir(self, follow_symlinks=True):
+                return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+        class CountingScandir:
+            def __init__(self, path):
+                self._it = counter._scandir(path)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+            def __iter__(self):
+                for entry in self._it:
+                    yield CountingEntry(entry)
+
+        os.stat = counting_stat
+        os.scandir = CountingScandir
+        return self
+
+    def __exit__(self, *exc):
+        os.stat = self._stat
+        os.scandir = self._scandir
+
+
+def make_tree(root, num_files, num_dirs):
+    """
+    生成测试目录：num_files 个文件与 num_dirs 个子目录
+    """
+    exts = ['.jpg', '.txt', '.mp4', '.py', '']
+    for i in range(num_dirs):
+        os.mkdir(os.path.join(root, f"dir_{i:06d}"))
+    for i in range(num_files):
+        with open(os.path.join(root, f"file_{i:07d}{exts[i % len(exts)]}"), 'wb') as f:
+            f.write(b'x' * (i % 64))
+
+
+def bench(func, path, repeat):
+    """
+    返回 (stat 次数, 最快耗时ms, 结果)
+    """
+    with StatCounter() as counter:
+        result = func(path)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - start)
+    return counter.count, best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="get_files / get_dirs 基准测试")
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--dirs', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='storagebox_bench_')
+    try:
+        print(f"生成测试目录：{args.files} 个文件，{args.dirs} 个目录...")
+        make_tree(root, args.files, args.dirs)
+
+        cases = [
+            ("legacy get_files", legacy_get_files),
+            ("scandir get_files", file_dir.get_files),
+            ("scandir get_dirs", file_dir.get_dirs),
+        ]
+        results = {}
+        for label, func in cases:
+            stats, elapsed, result = bench(func, root, args.repeat)
+            results[label] = result
+            print(f"{label:<20} stat 调用: {stats:>8}  耗时: {elapsed:>10.2f}ms")
+
+        if results["legacy get_files"] != results["scandir get_files"]:
+            print("警告：新旧实现结果不一致")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
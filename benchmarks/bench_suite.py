@@ -0,0 +1,309 @@
+"""
+综合基准：在磁盘上生成可复现的合成目录树（深度、分支数、文件名长度、Unicode 比例、文件数均可配置），
+测量以下操作的耗时与内存峰值（tracemalloc），结果写入 JSON 文件，便于不同提交之间对比：
+  - file_dir.get_files（根目录与文件最多的目录）
+  - file_dir.search_files（扩展名与子串通配）
+  - FileIndexer / NgramIndexer 的 build_index、save_index、load_index
+  - FileSearcher.search（不同长度的查询、多词查询与无结果查询）
+  - 图片缩略图生成（create_image_renditions）
+
+用法: python benchmarks/bench_suite.py [--files 10000] [--depth 4] [--fanout 6] [--name-len 16]
+                                      [--unicode 0.2] [--hot 0.1] [--seed 0] [--repeat 3] [--images 5]
+                                      [--root 目录] [--output bench_results.json]
+                                      [--compare 旧结果.json] [--threshold 1.2]
+--root 指定的目录会保留，参数相同时下次直接复用（10^6 个文件的生成需要几分钟）
+--compare 时耗时或内存超过旧结果 threshold 倍（且绝对差值超过 MIN_DELTA）的项目标记为退化，并以退出码 1 结束
+后缀 trie 后端构建很慢，10^5 以上文件数建议只测 --backends ngram
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'flask_app'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'search_files_app'))
+
+import everything
+from ngram_index import NgramIndexer
+from modules import file_dir, create_thumbnail
+from bench_thumbnail import make_images
+
+ASCII_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789_-'
+UNICODE_CHARS = '截图文档照片视频备份项目数据资料ÄÖÜßéèçñøåあいうえおカメラ한국어Ωλπ'
+EXTS = ['.jpg', '.png', '.mp4', '.txt', '.py', '.docx', '.zip', '.pdf', '']
+MARKER = '.bench_tree.json'
+# 查询长度：取树中真实文件名的子串，保证有结果
+QUERY_LENGTHS = (1, 2, 3, 5, 8)
+# 对比时绝对差值低于此值（ms / MB）的变化视为噪声
+MIN_DELTA = {'ms': 1.0, 'peak_mb': 1.0}
+
+
+def make_name(rng, name_len, unicode_ratio):
+    length = max(1, int(rng.gauss(name_len, name_len / 4)))
+    chars = UNICODE_CHARS if rng.random() < unicode_ratio else ASCII_CHARS
+    return ''.join(rng.choice(chars) for _ in range(length))
+
+
+def make_tree(root, num_files, depth, fanout, name_len, unicode_ratio, seed, hot):
+    """
+    生成目录树：每层 fanout 个子目录直到 depth 层，文件随机分布到所有目录，
+    其中 hot 比例的文件集中在一个目录（模拟照片、下载等大目录）
+    文件内容为空，大小用 truncate 设置（稀疏文件，不占磁盘）
+    :return: 目录数
+    """
+    rng = random.Random(seed)
+    dirs = [root]
+    level = [root]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                path = os.path.join(parent, f"{make_name(rng, name_len // 2 or 1, unicode_ratio)}_{i}")
+                os.mkdir(path)
+                next_level.append(path)
+        dirs.extend(next_level)
+        level = next_level
+    hot_dir = rng.choice(dirs)
+    for i in range(num_files):
+        name = f"{make_name(rng, name_len, unicode_ratio)}_{i}{rng.choice(EXTS)}"
+        directory = hot_dir if rng.random() < hot else rng.choice(dirs)
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.truncate(rng.randint(0, 1 << 24))
+    return len(dirs)
+
+
+def prepare_tree(root, params):
+    """root 下已有参数相同的树时直接复用"""
+    marker = os.path.join(root, MARKER)
+    if os.path.exists(marker):
+        with open(marker, encoding='utf-8') as f:
+            if json.load(f) == params:
+                print(f"复用已有目录树 {root}")
+                return
+        print(f"{root} 中的目录树参数不同，重新生成")
+        shutil.rmtree(root)
+    os.makedirs(root, exist_ok=True)
+    start = time.perf_counter()
+    num_dirs = make_tree(root, params['files'], params['depth'], params['fanout'],
+                         params['name_len'], params['unicode'], params['seed'], params['hot'])
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    print(f"生成目录树：{params['files']} 个文件，{num_dirs} 个目录，{time.perf_counter() - start:.1f}s")
+
+
+def measure(func, repeat=1):
+    """
+    先计时 repeat 次取最快，再在 tracemalloc 下运行一次取内存峰值
+    :return: ({'ms', 'peak_mb'}, 最后一次的返回值)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    del result
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': round(best * 1000, 3), 'peak_mb': round(peak / 1024 / 1024, 3)}, result
+
+
+def largest_dir(root):
+    """文件最多的目录"""
+    best, count = root, -1
+    for path, _, files in os.walk(root):
+        if len(files) > count:
+            best, count = path, len(files)
+    return best
+
+
+def pick_queries(root, seed):
+    """从树中的文件名取不同长度的子串作为查询，另加多词查询、无结果查询与属性过滤查询"""
+    rng = random.Random(seed)
+    names = []
+    for _, _, files in os.walk(root):
+        names.extend(f for f in files if f != MARKER)
+        if len(names) >= 1000:
+            break
+    queries = {}
+    for length in QUERY_LENGTHS:
+        name = rng.choice([n for n in names if len(n) >= length] or names)
+        start = rng.randint(0, max(0, len(name) - length))
+        queries[f"len{length}"] = name[start:start + length]
+    name = rng.choice(names)
+    queries['multi'] = f"{name[:2]} {name[-3:]}"
+    queries['miss'] = 'zzzzqqqq'
+    # 文件大小在 0~16MB 之间均匀分布
+    queries['filter_ext'] = 'ext:jpg size:>8M'
+    queries['filter_size'] = 'size:>15M'
+    queries['filter_term'] = f"{name[:3]} type:image"
+    return queries
+
+
+def run_suite(root, args, results):
+    def record(key, stats, **extra):
+        stats.update(extra)
+        results[key] = stats
+        line = f"{key:<36}{stats['ms']:>12.2f}ms{stats['peak_mb']:>10.2f}MB"
+        if extra:
+            line += '  ' + ' '.join(f"{k}={v}" for k, v in extra.items())
+        print(line)
+
+    big_dir = largest_dir(root)
+    for label, path in (("root", root), ("largest_dir", big_dir)):
+        stats, items = measure(lambda: file_dir.get_files(path), args.repeat)
+        record(f"get_files.{label}", stats, items=len(items))
+
+    for label, pattern in (("ext", '*.jpg'), ("substring", '*ab*')):
+        stats, items = measure(lambda: file_dir.search_files(root, pattern), args.repeat)
+        record(f"search_files.{label}", stats, results=len(items))
+
+    queries = pick_queries(root, args.seed)
+    backends = [("trie", everything.FileIndexer, 'bench_suite.pkl'),
+                ("ngram", NgramIndexer, 'bench_suite.sbidx')]
+    work_dir = tempfile.mkdtemp(prefix='storagebox_suite_')
+    try:
+        for label, cls, filename in backends:
+            if label not in args.backends:
+                continue
+
+            def build():
+                indexer = cls()
+                indexer.build_index(root, workers=args.workers)
+                return indexer
+            stats, indexer = measure(build)
+            record(f"{label}.build_index", stats, files=len(indexer))
+
+            index_file = os.path.join(work_dir, filename)
+            stats, _ = measure(lambda: indexer.save_index(index_file))
+            record(f"{label}.save_index", stats, file_mb=round(os.path.getsize(index_file) / 1024 / 1024, 3))
+
+            def load():
+                loaded = cls()
+                loaded.load_index(index_file)
+                return loaded
+            stats, loaded = measure(load)
+            record(f"{label}.load_index", stats)
+            del loaded
+
+            searcher = everything.FileSearcher(indexer)
+            for key, query in queries.items():
+                def search():
+                    searcher._cache.clear()     # 不计查询缓存
+                    return searcher.search(query)
+                stats, found = measure(search, args.repeat)
+                record(f"{label}.search.{key}", stats, query=query, results=len(found))
+            del indexer, searcher
+
+        if args.images:
+            image_dir = os.path.join(work_dir, 'images')
+            out_dir = os.path.join(work_dir, 'thumbs')
+            os.makedirs(image_dir)
+            os.makedirs(out_dir)
+            paths = make_images(image_dir, args.images, args.megapixels, False)
+            sizes = create_thumbnail.RENDITIONS
+
+            def thumbnails():
+                for path in paths:
+                    name = os.path.basename(path)
+                    create_thumbnail.create_image_renditions(
+                        path, {size: os.path.join(out_dir, f"{name}.{size}.webp") for size in sizes})
+            stats, _ = measure(thumbnails)
+            stats['ms_per_image'] = round(stats['ms'] / len(paths), 3)
+            record("thumbnail.image_renditions", stats, images=len(paths), megapixels=args.megapixels)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file, threshold):
+    """与旧结果对比，返回退化的项目数"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['params'] != results['params']:
+        print("警告：两次运行的目录树参数不同，对比结果仅供参考")
+    print(f"\n与 {baseline_file}（{baseline.get('commit')}）对比")
+    print(f"{'项目':<36}{'耗时比':>10}{'内存比':>10}")
+    regressions = 0
+    for key, stats in results['results'].items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        ratios = [stats[field] / old[field] if old[field] else 1.0 for field in MIN_DELTA]
+        worse = [stats[field] - old[field] > MIN_DELTA[field] and ratio > threshold
+                 for field, ratio in zip(MIN_DELTA, ratios)]
+        mark = ''
+        if any(worse):
+            mark = '  退化'
+            regressions += 1
+        print(f"{key:<36}{ratios[0]:>10.2f}{ratios[1]:>10.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表、搜索、索引与缩略图综合基准")
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=6)
+    parser.add_argument('--name-len', type=int, default=16, help="文件名平均长度（不含序号与扩展名）")
+    parser.add_argument('--unicode', type=float, default=0.2, help="Unicode 文件名的比例")
+    parser.add_argument('--hot', type=float, default=0.1, help="集中在同一个大目录中的文件比例")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="快速操作的重复次数（取最快）")
+    parser.add_argument('--workers', type=int, default=1, help="build_index 的进程数")
+    parser.add_argument('--backends', nargs='*', default=['trie', 'ngram'])
+    parser.add_argument('--images', type=int, default=5, help="缩略图测试的图片数，0 跳过")
+    parser.add_argument('--megapixels', type=float, default=12)
+    parser.add_argument('--root', help="目录树位置（保留并复用），默认使用临时目录")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="旧的结果文件")
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    params = {'files': args.files, 'depth': args.depth, 'fanout': args.fanout,
+              'name_len': args.name_len, 'unicode': args.unicode, 'hot': args.hot, 'seed': args.seed}
+    root = args.root or tempfile.mkdtemp(prefix='storagebox_tree_')
+    results = {}
+    try:
+        prepare_tree(root, params)
+        print()
+        run_suite(root, args, results)
+    finally:
+        if not args.root:
+            shutil.rmtree(root)
+
+    output = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': params,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.compare and compare(output, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+图片缩略图吞吐基准：原有 create_image_thumbnail（每个尺寸解码一次）
+与多尺寸引擎 create_image_renditions（一次解码生成全部尺寸，可用 EXIF 缩略图）
+
+用法: python benchmarks/bench_thumbnail.py [--images 20] [--megapixels 12] [--exif]
+"""
+import os
+import io
+import sys
+import time
+import struct
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_app'))
+
+from PIL import Image
+from modules import create_thumbnail
+
+
+def exif_with_thumbnail(width, height):
+    """构造带 IFD1 缩略图（160px 宽）的 EXIF 数据"""
+    thumb = io.BytesIO()
+    Image.new('RGB', (160, round(160 * height / width)), 'gray').save(thumb, 'JPEG')
+    data = thumb.getvalue()
+    ifd1_offset = 8 + 2 + 4
+    data_offset = ifd1_offset + 2 + 12 * 2 + 4
+    tiff = b'II*\0' + struct.pack('<I', 8)
+    tiff += struct.pack('<HI', 0, ifd1_offset)      # IFD0：无条目，指向 IFD1
+    tiff += struct.pack('<H', 2)
+    tiff += struct.pack('<HHII', 0x0201, 4, 1, data_offset)
+    tiff += struct.pack('<HHII', 0x0202, 4, 1, len(data))
+    tiff += struct.pack('<I', 0)
+    return b'Exif\0\0' + tiff + data
+
+
+def make_images(directory, count, megapixels, exif):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    base = Image.effect_noise((width // 8, height // 8), 60).convert('RGB').resize((width, height))
+    extra = {'exif': exif_with_thumbnail(width, height)} if exif else {}
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"img_{i}.jpg")
+        base.save(path, quality=90, **extra)
+        paths.append(path)
+    return paths
+
+
+def run(label, paths, func):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed * 1000 / len(paths):>10.1f}ms/张{len(paths) / elapsed:>10.2f}张/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片缩略图吞吐基准")
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--megapixels', type=float, default=12)
+    parser.add_argument('--exif', action='store_true', help="图片带 EXIF 缩略图")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    out_dir = os.path.join(work_dir, 'out')
+    os.makedirs(out_dir)
+    try:
+        paths = make_images(work_dir, args.images, args.megapixels, args.exif)
+        print(f"{args.images} 张 {args.megapixels}MP JPEG，尺寸 {create_thumbnail.RENDITIONS}\n")
+        sizes = create_thumbnail.RENDITIONS
+
+        def outputs(path):
+            name = os.path.basename(path)
+            return {size: os.path.join(out_dir, f"{name}.{size}.webp") for size in sizes}
+
+        def legacy_single(path):
+            create_thumbnail.create_image_thumbnail(os.path.dirname(path), os.path.basename(path),
+                                                    output_path=outputs(path)[sizes[-1]])
+
+        def legacy_all(path):
+            for size, output_path in outputs(path).items():
+                create_thumbnail.create_image_thumbnail(os.path.dirname(path), os.path.basename(path),
+                                                        (size, size), output_path)
+
+        def engine_single(path):
+            create_thumbnail.create_image_renditions(path, {sizes[-1]: outputs(path)[sizes[-1]]})
+
+        def engine_all(path):
+            create_thumbnail.create_image_renditions(path, outputs(path))
+
+        run(f"原有 {sizes[-1]}px", paths, legacy_single)
+        run(f"引擎 {sizes[-1]}px", paths, engine_single)
+        run("原有 全部尺寸（逐个解码）", paths, legacy_all)
+        run("引擎 全部尺寸（一次解码）", paths, engine_all)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
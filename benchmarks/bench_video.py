@@ -0,0 +1,106 @@
+"""
+视频缩略图延迟基准：原有 capture_video_thumbnail（按帧号定位第 1 帧）
+与封面帧引擎 create_video_renditions（按时间定位关键帧、跳过黑帧、顺带读取元数据）
+
+可传入真实的大 MKV/MP4 文件，否则生成带黑色片头的合成视频
+用法: python benchmarks/bench_video.py [--files a.mkv b.mp4] [--videos 3] [--seconds 60] [--width 1280]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_app'))
+
+import cv2
+import numpy as np
+from PIL import Image, ImageStat
+from modules import create_thumbnail, video_probe
+
+
+def make_videos(directory, count, seconds, width, fps=25):
+    """合成视频：前 10% 为黑帧，之后是带移动色块的画面"""
+    height = width * 9 // 16
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"video_{i}.mp4")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        frame = np.zeros((height, width, 3), np.uint8)
+        total = seconds * fps
+        for n in range(total):
+            frame[:] = 0
+            if n >= total // 10:
+                frame[:] = (60, 90, 120)
+                x = n * 7 % (width - 80)
+                frame[height // 3:height // 3 + 80, x:x + 80] = (255, 255, 255)
+            writer.write(frame)
+        writer.release()
+        paths.append(path)
+    return paths
+
+
+def run(label, paths, func):
+    times = []
+    dark = 0
+    for path in paths:
+        start = time.perf_counter()
+        output = func(path)
+        times.append(time.perf_counter() - start)
+        if output and os.path.exists(output):
+            with Image.open(output) as img:
+                if ImageStat.Stat(img.convert('L')).mean[0] < video_probe.DARK_THRESHOLD:
+                    dark += 1
+    times.sort()
+    print(f"{label:<24}{sum(times) * 1000 / len(times):>10.1f}ms/个"
+          f"{times[-1] * 1000:>10.1f}ms 最慢{dark:>6} 个黑图")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频缩略图延迟基准")
+    parser.add_argument('--files', nargs='*', help="真实视频文件")
+    parser.add_argument('--videos', type=int, default=3)
+    parser.add_argument('--seconds', type=int, default=60)
+    parser.add_argument('--width', type=int, default=1280)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    out_dir = os.path.join(work_dir, 'out')
+    os.makedirs(out_dir)
+    try:
+        paths = args.files or make_videos(work_dir, args.videos, args.seconds, args.width)
+        print(f"{len(paths)} 个视频")
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            meta = video_probe.probe(cap)
+            cap.release()
+            print(f"  {os.path.basename(path)}: {os.path.getsize(path) / 1e6:.1f}MB {meta}")
+        print()
+        sizes = create_thumbnail.RENDITIONS
+
+        def legacy(path):
+            output = os.path.join(out_dir, os.path.basename(path) + '.legacy.webp')
+            create_thumbnail.capture_video_thumbnail(os.path.dirname(path), os.path.basename(path),
+                                                     output_path=output)
+            return output
+
+        def engine(path):
+            outputs = {size: os.path.join(out_dir, f"{os.path.basename(path)}.{size}.webp") for size in sizes}
+            create_thumbnail.create_video_renditions(path, outputs)
+            return outputs[sizes[-1]]
+
+        def metadata(path):
+            cap = cv2.VideoCapture(path)
+            video_probe.probe(cap)
+            cap.release()
+
+        run("原有 第 1 帧", paths, legacy)
+        run("引擎 封面帧+全部尺寸", paths, engine)
+        run("仅读取元数据", paths, metadata)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 import os
-from flask import request, jsonify, Blueprint, send_from_directory
-from modules import file_dir
+from flask import request, jsonify, Blueprint, Response
+from modules import file_dir, dir_cache, search_index, search_stream, thumbnail_prefetch, video_probe, static_serve, file_jobs, folder_size, file_columns
 
 bp = Blueprint('update_path', __name__, url_prefix='/')
 
+# 分页列表每页的默认/最大条目数
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
 # 允许的图片扩展名
 VIDEO_TYPES = {'mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv', 'flv'}
 IMAGE_TYPES = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp'}
@@ -13,15 +17,64 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def list_files(path):
+    """目录列表（缓存）附加递归文件夹大小与已缓存的视频信息"""
+    return video_probe.annotate(folder_size.annotate(path, dir_cache.get_files(path)))
+
+def list_columns(path):
+    """list_files 的列式版本（见 file_columns）"""
+    columns = dir_cache.get_columns(path) or file_columns.FileColumns()
+    return video_probe.annotate_columns(folder_size.annotate_columns(path, columns))
+
 @bp.route('/get_files', methods=['POST'])
 def get_files():
+    """
+    body 中 format 为 'columns' 时返回列式列表（file_columns），按 Accept/Accept-Encoding 协商编码与压缩
+    """
     data = request.get_json()
-    return jsonify(file_dir.get_files(data['path']))
+    if data.get('format') == 'columns' and data['path'] not in ('/', '\\'):
+        columns = list_columns(data['path'])
+        thumbnail_prefetch.warm_paths(data['path'], thumbnail_prefetch.column_media_paths(columns))
+        return file_columns.respond(columns.to_dict())
+    file_list = list_files(data['path'])
+    thumbnail_prefetch.warm(data['path'], file_list)
+    return jsonify(file_list)
+
+@bp.route('/list', methods=['POST'])
+def list_page():
+    """
+    分页、服务端排序的目录列表（列式，见 file_columns），供前端虚拟滚动按需加载
+    body: {path, sort: 'name'/'size'/'mtime'/'type', order: 'asc'/'desc', offset, limit}
+    返回该页的列，另附 path、total（总条目数）、offset 与 version（目录重新读取后改变，前端据此丢弃已加载的页）
+    """
+    data = request.get_json()
+    path = data['path']
+    sort = data.get('sort') or 'name'
+    if sort not in file_columns.SORTS:
+        return "Invalid sort", 400
+    try:
+        offset = max(0, int(data.get('offset') or 0))
+        limit = min(max(1, int(data.get('limit') or PAGE_SIZE)), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return "Invalid range", 400
+
+    columns = dir_cache.get_columns(path) or file_columns.FileColumns()
+    rows = columns.order(sort, data.get('order') == 'desc')
+    if offset == 0:
+        # 打开目录时按当前排序预热整个目录的缩略图
+        media = set(columns.rows(thumbnail_prefetch.MEDIA_TYPES))
+        thumbnail_prefetch.warm_paths(path, [columns.full_path(row) for row in rows if row in media])
+    page = columns.take(rows[offset:offset + limit])
+    page = video_probe.annotate_columns(folder_size.annotate_columns(path, page))
+    result = page.to_dict()
+    result.update(path=path, total=len(columns), offset=offset, version=columns.version, sort=sort,
+                  order='desc' if data.get('order') == 'desc' else 'asc')
+    return file_columns.respond(result)
 
 @bp.route('/get_dirs', methods=['POST'])
 def get_dirs():
     data = request.get_json()
-    return jsonify(file_dir.get_dirs(data['path']))
+    return jsonify(dir_cache.get_dirs(data['path']))
 
 @bp.route('/get_file/<path:filename>')
 def get_file(filename):
@@ -32,74 +85,103 @@ def get_file(filename):
     # 安全检查
     if not os.path.isfile(filename) or not allowed_file(file_name):
         return "Invalid file", 404
-        
-    return send_from_directory(dir_path, file_name)
+
+    # 支持 Range（视频拖动进度只读取需要的字节）与 ETag 条件请求
+    response = static_serve.serve(os.path.join(dir_path, file_name))
+    if response is None:
+        return "Invalid file", 404
+    return response
+
+@bp.route('/get_media_info/<path:filename>')
+def get_media_info(filename):
+    """视频元数据（时长、分辨率、编码、帧率），优先读缓存"""
+    if not os.path.isfile(filename) or not allowed_file(os.path.basename(filename)):
+        return "Invalid file", 404
+    meta = video_probe.info(filename)
+    if meta is None:
+        return "Invalid file", 404
+    return jsonify(meta)
 
 
 @bp.route('/paste', methods=['POST'])
 def paste():
+    """
+    提交复制/移动任务，最多等待 file_jobs.WAIT 秒
+    返回 {"job": 任务状态, "fileList": 目标目录列表}，任务未结束时前端通过 /jobs/<id> 查询进度
+    """
     data = request.get_json()
-    type = data["operation"]
+    kind = "copy" if data["operation"] == "copy" else "move"
     src = data["sourcePath"]
     dst = data["destinationPath"]
-    items = data["items"]
-
-    if type == "copy":
-        for i in items:
-            if i["type"] == "文件夹":
-                file_dir.copy_dir(os.path.join(src,i['name']), os.path.join(dst,i["name"]))
-            elif i["type"] == "本地磁盘":
-                return
-            else:
-                file_dir.copy_file(os.path.join(src,i['name']),dst)
-    elif type == "cut":
-        for i in items:
-            if i["type"] == "本地磁盘":
-                return
-            else:
-                file_dir.move_file_or_dir(os.path.join(src,i['name']),dst)
-
-    return jsonify(file_dir.get_files(dst))
+    names = [i["name"] for i in data["items"] if i["type"] != "本地磁盘"]
+
+    job = file_jobs.submit(kind, src, dst, names)
+    file_jobs.wait(job)
+    return jsonify({"job": job.status(), "fileList": list_files(dst)})
 
 @bp.route('/create_file', methods=['POST'])
 def create_file():
     data = request.get_json()
     file_dir.create_file(data["name"], data["path"])
+    dir_cache.invalidate(data['path'])
+    folder_size.touch(data['path'])
     
-    return jsonify(file_dir.get_files(data['path']))
+    return jsonify(list_files(data['path']))
 
 @bp.route('/create_dir', methods=['POST'])
 def create_dir():
     data = request.get_json()
     file_dir.create_dir(data["name"], data["path"])
+    dir_cache.invalidate(data['path'])
+    folder_size.touch(data['path'])
     
-    return jsonify(file_dir.get_files(data['path']))
+    return jsonify(list_files(data['path']))
 
 @bp.route('/rename', methods=['POST'])
 def rename():
     data = request.get_json()
     file_dir.rename_file_or_dir(os.path.join(data["path"],data["old_name"]), 
                               os.path.join(data["path"],data["new_name"]))
-    return jsonify(file_dir.get_files(data["path"]))
+    dir_cache.invalidate(os.path.join(data["path"],data["old_name"]), recursive=True)
+    dir_cache.invalidate(data["path"])
+    folder_size.touch(data["path"])
+    return jsonify(list_files(data["path"]))
 
 @bp.route('/delete', methods=['POST'])
 def delete():
+    """删除与复制/移动共用任务队列，返回格式同 /paste"""
     data = request.get_json()
     path = data['path']
-    fileList = data['fileList']
-    for i in fileList:
-        if i["type"] == "文件夹":
-            file_dir.del_dir(os.path.join(path, i["name"]))
-        else:
-            file_dir.del_file(os.path.join(path, i["name"]))
-
-    return jsonify(file_dir.get_files(path))
+    job = file_jobs.submit("delete", path, None, [i["name"] for i in data['fileList']])
+    file_jobs.wait(job)
+    return jsonify({"job": job.status(), "fileList": list_files(path)})
+
+@bp.route('/jobs', methods=['GET'])
+def jobs():
+    return jsonify(file_jobs.manager.jobs())
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """任务进度：已完成字节/文件数、吞吐（字节/秒）、错误"""
+    job = file_jobs.get(job_id)
+    if job is None:
+        return "Invalid job", 404
+    return jsonify(job.status())
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    return jsonify({"ok": file_jobs.cancel(job_id)})
+
+@bp.route('/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    return jsonify({"ok": file_jobs.resume(job_id)})
 
 @bp.route('/parent_path', methods=['POST'])
 def parent_path():
     data = request.get_json()
     parent_path = os.path.normpath(os.path.join(data['path'],".."))
-    file_list = {'fileList': file_dir.get_files(parent_path)}
+    file_list = {'fileList': list_files(parent_path)}
+    thumbnail_prefetch.warm(parent_path, file_list['fileList'])
     file_list['path'] = parent_path
     return jsonify(file_list)
 
@@ -108,6 +190,28 @@ def search():
     data = request.get_json()
     if data["path"] == "":
         return jsonify("")
-    else:
-        fileList = file_dir.search_files(data["path"],'*'+data["search_term"]+'*')
-        return jsonify(fileList)
\ No newline at end of file
+    if data.get("format") == "columns":
+        entries = search_index.search(data["path"], data["search_term"], file_columns.stat_entry)
+        return file_columns.respond(video_probe.annotate_columns(file_columns.from_entries(entries)).to_dict())
+    fileList = search_index.search(data["path"], data["search_term"])
+    return jsonify(fileList)
+
+@bp.route('/search_stream', methods=['POST'])
+def stream_search():
+    """
+    流式搜索（NDJSON），同一 client_id 的新搜索会停止旧的搜索
+    """
+    data = request.get_json()
+    if data["path"] == "":
+        return jsonify("")
+    try:
+        max_results = min(max(1, int(data.get("limit") or search_stream.MAX_RESULTS)), search_stream.MAX_RESULTS)
+    except (TypeError, ValueError):
+        return "Invalid limit", 400
+    lines = search_stream.stream_search(data["path"], data["search_term"], data.get("client_id"), max_results)
+    return Response(lines, mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/index_status', methods=['GET'])
+def index_status():
+    return jsonify(search_index.status())
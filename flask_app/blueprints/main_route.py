@@ -1,26 +1,45 @@
 import os
-from flask import request, Blueprint, send_from_directory
-from modules import create_thumbnail
-
-VIDEO_TYPES = {'mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv', 'flv'}
-IMAGE_TYPES = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp'}
+from flask import request, Blueprint, send_from_directory, current_app, abort, Response
+from modules import thumbnail_service, thumbnail_prefetch, thumbnail_store, static_serve
 
 bp = Blueprint('main_route', __name__, url_prefix='/')
 
 @bp.route('/get_thumbnail/<path:file_path>')
 def get_thumbnail(file_path):
-    file_dir = os.path.dirname(file_path)
-    file_name = os.path.basename(file_path)
-    _, ext = os.path.splitext(file_name)
-    ext = ext[1:]
+    result = thumbnail_service.get(file_path, request.args.get('size', type=int))
+    if result is None:
+        # 生成超时（多为大视频）：先返回占位图，不缓存，前端下次加载时再取
+        _, ext = os.path.splitext(file_path)
+        placeholder = 'video.svg' if ext[1:].lower() in thumbnail_service.VIDEO_TYPES else 'image.svg'
+        response = send_from_directory(os.path.join(current_app.static_folder, 'img'), placeholder)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    if result is False:
+        abort(404)
+    # 同一 URL 在源文件编辑后会对应新的缩略图，只能用 ETag 重新验证
+    response = static_serve.serve(os.path.join(*result), 'image/webp')
+    if response is None:
+        abort(404)
+    return response
+
+@bp.route('/thumbnail/<key>')
+def thumbnail_by_key(key):
+    """按内容寻址的键获取缩略图（键见批量接口的 items），内容不会变化，允许长期缓存"""
+    if len(key) != 40 or not all(c in '0123456789abcdef' for c in key):
+        abort(404)
+    response = static_serve.serve(thumbnail_store.store.path(key), 'image/webp', immutable=True)
+    if response is None:
+        abort(404)
+    return response
 
-    thumbnail_name = 'thumbnail.' + file_name + '.webp'
-    thumbnail_path = os.path.join(create_thumbnail.output_dir, thumbnail_name)
-    
-    if not os.path.exists(thumbnail_path):
-        if ext in IMAGE_TYPES:
-            create_thumbnail.create_image_thumbnail(file_dir, file_name)
-        elif ext in VIDEO_TYPES:
-            create_thumbnail.capture_video_thumbnail(file_dir, file_name)
-    
-    return send_from_directory(create_thumbnail.output_dir, thumbnail_name)
\ No newline at end of file
+@bp.route('/get_thumbnails', methods=['POST'])
+def get_thumbnails():
+    """
+    批量获取已生成的缩略图（格式见 thumbnail_service.pack），未生成的在头部 missing 中列出
+    """
+    data = request.get_json()
+    paths = data.get('paths', [])[:thumbnail_service.MAX_BATCH]
+    # 这些是前端可见的条目，未生成的交给预热调度优先生成
+    thumbnail_prefetch.prioritize(paths)
+    body = thumbnail_service.pack(paths, data.get('size'), generate=False)
+    return Response(body, mimetype='application/octet-stream', headers={'Cache-Control': 'no-store'})
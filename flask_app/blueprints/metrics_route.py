@@ -0,0 +1,35 @@
+from flask import request, Blueprint, Response, jsonify
+from modules import metrics
+
+bp = Blueprint('metrics_route', __name__, url_prefix='/')
+
+@bp.route('/metrics')
+def get_metrics():
+    """Prometheus 文本格式的指标"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/metrics/profile', methods=['GET'])
+def get_profile():
+    """已采样请求的 cProfile 汇总，?sort=cumulative|tottime&limit=50"""
+    try:
+        report = metrics.profiler.report(request.args.get('sort', 'cumulative'),
+                                         request.args.get('limit', 50, type=int))
+    except KeyError:
+        return "Invalid sort", 400
+    return Response(report, mimetype='text/plain')
+
+@bp.route('/metrics/profile', methods=['POST'])
+def set_profile():
+    """
+    运行时开关请求采样：{"rate": 0.1} 开启（按比例采样，清空旧结果），{"rate": 0} 关闭
+    """
+    data = request.get_json() or {}
+    try:
+        rate = float(data.get('rate', 0))
+    except (TypeError, ValueError, AttributeError):
+        return "Invalid rate", 400
+    if rate > 0:
+        metrics.profiler.enable(rate)
+    else:
+        metrics.profiler.disable()
+    return jsonify({'rate': metrics.profiler.rate})
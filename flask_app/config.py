@@ -0,0 +1,32 @@
+import os
+
+# 建立搜索索引的根目录，可用环境变量 STORAGEBOX_INDEX_ROOTS 覆盖（以 os.pathsep 分隔）
+SEARCH_INDEX_ROOTS = [p for p in os.environ.get('STORAGEBOX_INDEX_ROOTS', '').split(os.pathsep) if p]
+
+# 搜索索引后端：'ngram'（紧凑 trigram 倒排索引）或 'trie'（后缀 pygtrie）
+SEARCH_INDEX_BACKEND = os.environ.get('STORAGEBOX_INDEX_BACKEND', 'ngram')
+
+# 索引快照与事件日志目录（为空则不持久化，每次启动全量构建）；写快照间隔（秒）
+SEARCH_INDEX_DIR = os.environ.get('STORAGEBOX_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_data'))
+SEARCH_INDEX_CHECKPOINT = int(os.environ.get('STORAGEBOX_INDEX_CHECKPOINT', '600'))
+
+# 统计递归目录大小的根目录，可用环境变量 STORAGEBOX_SIZE_ROOTS 覆盖，默认与搜索索引相同
+FOLDER_SIZE_ROOTS = [p for p in os.environ.get('STORAGEBOX_SIZE_ROOTS', '').split(os.pathsep) if p] or SEARCH_INDEX_ROOTS
+
+# 生产入口 serve.py：监听地址、工作进程数（默认 CPU 核数）
+SERVE_HOST = os.environ.get('STORAGEBOX_HOST', '0.0.0.0')
+SERVE_PORT = int(os.environ.get('STORAGEBOX_PORT', '5000'))
+SERVE_WORKERS = int(os.environ.get('STORAGEBOX_WORKERS', '0')) or os.cpu_count() or 1
+
+# 多进程模式下属主进程发布索引快照与目录大小的间隔（秒，只在有变化时发布），即工作进程结果的滞后；
+# 索引快照是整体重写，大索引按写入耗时自动延长间隔（见 search_index.CHECKPOINT_BACKOFF）
+SERVE_PUBLISH_INTERVAL = int(os.environ.get('STORAGEBOX_PUBLISH_INTERVAL', '5'))
+
+# 多进程模式下属主进程发布递归目录大小的统计文件
+FOLDER_SIZE_FILE = os.environ.get('STORAGEBOX_SIZE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_data', 'folder_size.json'))
+
+# 多进程模式下属主进程淘汰缩略图（按预算）的间隔（秒）
+THUMBNAIL_TRIM_INTERVAL = int(os.environ.get('STORAGEBOX_THUMBNAIL_TRIM_INTERVAL', '300'))
+
+# 多进程模式下文件任务状态的共享目录，任一工作进程都能查询、取消、续传任务
+JOB_SHARE_DIR = os.environ.get('STORAGEBOX_JOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_data', 'jobs'))
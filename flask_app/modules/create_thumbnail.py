@@ -1,34 +1,48 @@
 import os
+import io
 import cv2
-from PIL import Image
+from PIL import Image, ExifTags
+from modules import video_probe
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-output_dir = os.path.join(os.path.dirname(script_dir), "static\\thumbnail")
+output_dir = os.path.join(os.path.dirname(script_dir), "static", "thumbnail")
 output_prefix = 'thumbnail.'
 output_ext = '.webp'
 
-def create_image_thumbnail(input_dir, input_name, max_size=(480, 480)):
+# 缩略图尺寸（最长边像素），对应前端 min/mid/max 视图
+RENDITIONS = (96, 240, 480)
+
+def _tmp_path(output_path):
+    """同目录下的临时文件（保留扩展名），写完后 os.replace 原子替换"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.{os.getpid()}.tmp{ext}"
+
+def _output_path(input_name):
+    return os.path.join(output_dir, output_prefix + input_name + output_ext)
+
+def create_image_thumbnail(input_dir, input_name, max_size=(480, 480), output_path=None):
     """
     生成图像的缩略图（Pillow）
     实测比OpenCv生成的要小
+    :param output_path: 输出路径，默认 output_dir 下按文件名命名
     """
-    thumbnail_name = output_prefix + input_name + output_ext
     input_path = os.path.join(input_dir, input_name)
-    output_path = os.path.join(output_dir, thumbnail_name)
+    output_path = output_path or _output_path(input_name)
 
     # 打开图片
     img = Image.open(input_path)
     # 生成缩略图（自动保持宽高比）
     img.thumbnail(max_size, Image.Resampling.LANCZOS)  # Pillow 10+ 使用 LANCZOS
-    img.save(output_path)
+    tmp_path = _tmp_path(output_path)
+    img.save(tmp_path)
+    os.replace(tmp_path, output_path)
 
-def create_image_thumbnail_opencv(input_dir, input_name, size=(480, 480)):
+def create_image_thumbnail_opencv(input_dir, input_name, size=(480, 480), output_path=None):
     """
     生成图像的缩略图（OpenCV）
     """
-    thumbnail_name = output_prefix + input_name + output_ext
     input_path = os.path.join(input_dir, input_name)
-    output_path = os.path.join(output_dir, thumbnail_name)
+    output_path = output_path or _output_path(input_name)
     
     img = cv2.imread(input_path)
     if img is not None:
@@ -38,16 +52,18 @@ def create_image_thumbnail_opencv(input_dir, input_name, size=(480, 480)):
         new_size = (int(w*ratio), int(h*ratio))
         
         resized = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
-        cv2.imwrite(output_path, resized)
+        tmp_path = _tmp_path(output_path)
+        cv2.imwrite(tmp_path, resized)
+        os.replace(tmp_path, output_path)
 
-def capture_video_thumbnail(input_dir, input_name, frame_num=1):
+def capture_video_thumbnail(input_dir, input_name, frame_num=1, output_path=None):
     """
     提取视频第一帧（OpenCV）
     :param frame_num: 获取第几帧，默认第0帧
+    :param output_path: 输出路径，默认 output_dir 下按文件名命名
     """
-    thumbnail_name = output_prefix + input_name + output_ext
     input_path = os.path.join(input_dir, input_name)
-    output_path = os.path.join(output_dir, thumbnail_name)
+    output_path = output_path or _output_path(input_name)
     
     cap = cv2.VideoCapture(input_path)
     # 设置要读取的帧
@@ -55,8 +71,75 @@ def capture_video_thumbnail(input_dir, input_name, frame_num=1):
     ret, frame = cap.read()
     if ret:
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # BGR转RGB
-        Image.fromarray(frame_rgb).save(output_path)
+        tmp_path = _tmp_path(output_path)
+        Image.fromarray(frame_rgb).save(tmp_path)
+        os.replace(tmp_path, output_path)
     cap.release()
 
+def _save(img, output_path):
+    tmp_path = _tmp_path(output_path)
+    img.save(tmp_path)
+    os.replace(tmp_path, output_path)
+
+def _exif_thumbnail(img):
+    """
+    读取 JPEG 内嵌的 EXIF 缩略图（IFD1），宽高比与原图不一致（带黑边）时不使用
+    """
+    raw = img.info.get('exif')
+    if not raw:
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset, length = ifd1.get(0x0201), ifd1.get(0x0202)
+        if not offset or not length:
+            return None
+        # 偏移相对 TIFF 头，raw 以 b'Exif\0\0' 开头
+        start = 6 + offset if raw.startswith(b'Exif') else offset
+        thumb = Image.open(io.BytesIO(raw[start:start + length]))
+        thumb.load()
+    except Exception:
+        return None
+    if abs(thumb.width / thumb.height - img.width / img.height) > 0.02:
+        return None
+    return thumb
+
+def save_renditions(img, outputs):
+    """
+    从一张图像生成多个尺寸：先缩到最大尺寸（JPEG 在解码阶段按 DCT 降采样），
+    较小的尺寸依次由上一个尺寸缩小，整个过程只解码一次（会原地修改 img）
+    :param outputs: {最长边像素: 输出路径}
+    """
+    for size in sorted(outputs, reverse=True):
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        _save(img, outputs[size])
+
+def create_image_renditions(input_path, outputs):
+    """
+    生成图像的多尺寸缩略图
+    EXIF 缩略图不小于某个尺寸时，该尺寸及更小的尺寸直接由 EXIF 缩略图生成，不解码原图
+    :param outputs: {最长边像素: 输出路径}
+    """
+    img = Image.open(input_path)
+    exif_thumb = _exif_thumbnail(img) if img.format == 'JPEG' else None
+    if exif_thumb is not None:
+        small = {size: path for size, path in outputs.items()
+                 if size <= max(exif_thumb.size) and size < max(img.size)}
+        if small:
+            save_renditions(exif_thumb, small)
+        outputs = {size: path for size, path in outputs.items() if size not in small}
+    if outputs:
+        save_renditions(img, outputs)
+
+def create_video_renditions(input_path, outputs):
+    """
+    提取视频封面帧（跳过黑帧）并生成多尺寸缩略图
+    :return: 视频元数据，未读取到帧时返回 None
+    """
+    frame, meta = video_probe.poster_frame(input_path)
+    if frame is None:
+        return None
+    save_renditions(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), outputs)
+    return meta
+
 if __name__ == '__main__':
     capture_video_thumbnail('D:\\', 'z1g3d#Kiriko#Overwatch#rule34hentai.net#0.mp4')
\ No newline at end of file
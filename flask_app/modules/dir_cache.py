@@ -0,0 +1,194 @@
+import os
+import threading
+from collections import OrderedDict
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from modules import file_dir, file_columns
+
+# 缓存上限：目录数与条目总数，超出后按 LRU 淘汰
+MAX_DIRS = 512
+MAX_ITEMS = 500000
+# 会改变目录列表的事件；读文件产生的 opened / closed_no_write 不使缓存失效
+# （缩略图、预热、视频探测与下载都会读取媒体目录中的文件）
+CHANGE_EVENTS = {'created', 'deleted', 'moved', 'modified', 'closed'}
+
+
+def _norm(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+class DirCacheUpdater(FileSystemEventHandler):
+    """
+    watchdog 事件处理：目录内容变化时使对应列表缓存失效
+    """
+    def __init__(self, cache):
+        self.cache = cache
+
+    def on_any_event(self, event):
+        if event.event_type not in CHANGE_EVENTS:
+            return
+        self._invalidate(event.src_path, event.is_directory)
+        dest_path = getattr(event, 'dest_path', '')
+        if dest_path:
+            self._invalidate(dest_path, event.is_directory)
+
+    def _invalidate(self, path, is_directory):
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        # 条目所在目录的列表发生变化
+        self.cache.invalidate(os.path.dirname(path))
+        if is_directory:
+            # 目录自身被删除/移动时，其子树的缓存一并失效
+            self.cache.invalidate(path, recursive=True)
+
+
+class DirCache:
+    """
+    目录列表缓存（LRU）
+    每个缓存的目录注册一个非递归监控，事件到达时精确失效
+    注意：watchdog 在持有自身锁时回调事件处理器，因此监控的注册/注销
+    只在请求线程、且不持有 self._lock 时进行
+    """
+    def __init__(self, max_dirs=MAX_DIRS, max_items=MAX_ITEMS):
+        self.max_dirs = max_dirs
+        self.max_items = max_items
+        self._entries = OrderedDict()   # {(类型, 路径): (规范化路径, 结果)}
+        self._items = 0
+        self._watches = {}              # {规范化路径: [watch, 引用数]}
+        self._idle = set()              # 引用数归零、待注销的监控
+        self._epoch = 0                 # 每次失效递增，防止并发加载写回旧结果
+        self._lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._observer = None
+        self._handler = DirCacheUpdater(self)
+        self.hits = 0
+        self.misses = 0
+
+    def share(self, processes):
+        """
+        多进程模式（serve.py）：每个工作进程各自缓存、各自注册监控（每个缓存的目录一个 inotify watch），
+        目录数上限按进程数平分，监控总数不超过 MAX_DIRS
+        """
+        with self._lock:
+            self.max_dirs = max(1, MAX_DIRS // processes)
+            while len(self._entries) > self.max_dirs:
+                self._remove(next(iter(self._entries)))
+        self._drop_idle_watches()
+
+    def get_files(self, path):
+        return self._get('files', path, file_dir.get_files)
+
+    def get_dirs(self, path):
+        return self._get('dirs', path, file_dir.get_dirs)
+
+    def get_columns(self, path):
+        """列式目录列表（见 file_columns），与 get_files 分别缓存"""
+        return self._get('columns', path, file_columns.scan)
+
+    def _get(self, kind, path, loader):
+        key = (kind, path)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        # 不存在的路径、磁盘列表不缓存
+        if path in ('/', '\\') or not os.path.isdir(path):
+            return loader(path)
+
+        norm_path = _norm(path)
+        # 先注册监控再读取目录，保证读取之后的任何变化都能收到事件
+        if not self._ensure_watch(norm_path):
+            return loader(path)
+        with self._lock:
+            epoch = self._epoch
+
+        result = loader(path)
+        with self._lock:
+            if (result is not None and epoch == self._epoch
+                    and key not in self._entries and norm_path in self._watches):
+                self._store(key, norm_path, result)
+            else:
+                self._idle.add(norm_path)
+        self._drop_idle_watches()
+        return result
+
+    def _store(self, key, norm_path, result):
+        self._entries[key] = (norm_path, result)
+        self._items += len(result)
+        self._watches[norm_path][1] += 1
+        self._idle.discard(norm_path)
+        while self._entries and (len(self._entries) > self.max_dirs or self._items > self.max_items):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        norm_path, result = self._entries.pop(key)
+        self._items -= len(result)
+        watch = self._watches.get(norm_path)
+        if watch is not None:
+            watch[1] -= 1
+            if watch[1] == 0:
+                self._idle.add(norm_path)
+
+    def invalidate(self, path, recursive=False):
+        """
+        使目录的列表缓存失效
+        :param recursive: 同时失效其所有子目录
+        """
+        norm_path = _norm(path)
+        prefix = os.path.join(norm_path, '')
+        with self._lock:
+            self._epoch += 1
+            for key, (cached_path, _) in list(self._entries.items()):
+                if cached_path == norm_path or (recursive and cached_path.startswith(prefix)):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            for key in list(self._entries):
+                self._remove(key)
+
+    def _ensure_watch(self, norm_path):
+        with self._watch_lock:
+            with self._lock:
+                if norm_path in self._watches:
+                    return True
+            try:
+                if self._observer is None:
+                    self._observer = Observer()
+                    self._observer.daemon = True
+                    self._observer.start()
+                handle = self._observer.schedule(self._handler, norm_path, recursive=False)
+            except Exception as e:
+                # 无法监控的目录不缓存，保证不返回过期结果
+                print(f"监控{norm_path}失败:{e}")
+                return False
+            with self._lock:
+                self._watches[norm_path] = [handle, 0]
+            return True
+
+    def _drop_idle_watches(self):
+        if not self._idle:
+            return
+        with self._watch_lock:
+            with self._lock:
+                stale = [self._watches.pop(p)[0] for p in self._idle
+                         if p in self._watches and self._watches[p][1] == 0]
+                self._idle.clear()
+            for handle in stale:
+                try:
+                    self._observer.unschedule(handle)
+                except Exception:
+                    pass
+
+
+cache = DirCache()
+share = cache.share
+get_files = cache.get_files
+get_dirs = cache.get_dirs
+get_columns = cache.get_columns
+invalidate = cache.invalidate
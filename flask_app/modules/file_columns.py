@@ -0,0 +1,263 @@
+import os
+import re
+import sys
+import json
+import gzip
+import stat
+import itertools
+from operator import itemgetter
+from flask import request, Response
+from modules import file_dir
+
+# query_filter（扩展名规则）位于同级的 search_files_app 目录，与 search_index 相同
+_SEARCH_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'search_files_app')
+if _SEARCH_APP not in sys.path:
+    sys.path.insert(0, _SEARCH_APP)
+import query_filter
+
+try:
+    import brotli   # 可选：pip install brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack  # 可选：pip install msgpack
+except ImportError:
+    msgpack = None
+
+FOLDER = "文件夹"
+# 小于此字节数的响应不压缩
+MIN_COMPRESS = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+# 分页列表支持的排序字段
+SORTS = ('name', 'size', 'mtime', 'type')
+
+_DIGITS = re.compile(r'\d+')
+_versions = itertools.count(1)
+
+
+def _pad_digits(match):
+    return match.group().rjust(20, '0')
+
+
+def _natural_keys(names):
+    """
+    自然排序的键：不区分大小写，数字按数值比较（file2 < file10）
+    拼成一个字符串统一替换再拆开（文件名不含 \\0），比逐个处理快
+    """
+    if not names:
+        return []
+    return _DIGITS.sub(_pad_digits, '\0'.join(names).lower()).split('\0')
+
+
+def _file_type(name):
+    """列表中的类型：扩展名（见 query_filter.extension），无扩展名为 'file'"""
+    return query_filter.extension(name) or "file"
+
+
+class FileColumns:
+    """
+    列式文件列表：每个字段一列，各列等长
+      - 目录与类型各存一张去重表（paths/types），行里只存下标
+      - size 为字节数（文件夹为 -1），mtime 为 Unix 秒，由客户端格式化；图标路径由客户端拼出
+      - 可选列（files 递归文件数、video 视频信息）由 annotate_columns 附加，没有值的行为 None
+    缓存在 dir_cache 中的对象同时缓存各排序方式的行顺序（order），分页请求复用；
+    version 标识一次目录读取，目录变化重新读取后改变
+    """
+    def __init__(self):
+        self.version = next(_versions)
+        self.paths = []
+        self.types = []
+        self.name = []
+        self.path = []
+        self.type = []
+        self.size = []
+        self.mtime = []
+        self.extra = {}         # {列名: 列}
+        self._path_ids = {}
+        self._type_ids = {}
+        self._orders = {}       # {(排序字段, 是否倒序): 行号列表}
+        self._by_name = None    # 按名称（自然排序）的行号，其余排序以此为次序
+
+    def __len__(self):
+        return len(self.name)
+
+    def _path_id(self, root):
+        path_id = self._path_ids.get(root)
+        if path_id is None:
+            path_id = self._path_ids[root] = len(self.paths)
+            self.paths.append(root)
+        return path_id
+
+    def _type_id(self, file_type):
+        type_id = self._type_ids.get(file_type)
+        if type_id is None:
+            type_id = self._type_ids[file_type] = len(self.types)
+            self.types.append(file_type)
+        return type_id
+
+    def add(self, root, name, st, is_dir):
+        self.name.append(name)
+        self.path.append(self._path_id(root))
+        self.type.append(self._type_id(FOLDER if is_dir else _file_type(name)))
+        self.size.append(-1 if is_dir else st.st_size)
+        self.mtime.append(int(st.st_mtime))
+
+    def extend(self, root, entries, is_dir):
+        """批量添加同一目录下的 [(文件名, stat_result), ...]（列出大目录时逐行调用 add 太慢）"""
+        count = len(entries)
+        self.name.extend(map(itemgetter(0), entries))
+        self.path.extend([self._path_id(root)] * count)
+        self.mtime.extend([int(st.st_mtime) for _, st in entries])
+        if is_dir:
+            self.type.extend([self._type_id(FOLDER)] * count)
+            self.size.extend([-1] * count)
+            return
+        type_ids = self._type_ids
+        for name, _ in entries:
+            file_type = _file_type(name)
+            type_id = type_ids.get(file_type)
+            self.type.append(type_id if type_id is not None else self._type_id(file_type))
+        self.size.extend([st.st_size for _, st in entries])
+
+    def rows(self, type_names):
+        """类型属于 type_names 的行号"""
+        ids = {i for i, file_type in enumerate(self.types) if file_type in type_names}
+        return [i for i, type_id in enumerate(self.type) if type_id in ids]
+
+    def full_path(self, row):
+        return os.path.join(self.paths[self.path[row]], self.name[row])
+
+    def order(self, sort='name', reverse=False):
+        """
+        排序后的行号，文件夹总在文件之前，同值按名称（自然排序，同键保持读取顺序）
+        每种排序只计算一次，缓存在对象上
+        """
+        if sort not in SORTS:
+            raise ValueError(f"不支持的排序字段:{sort}")
+        key = (sort, bool(reverse))
+        rows = self._orders.get(key)
+        if rows is None:
+            rows = self._orders[key] = self._sort(sort, bool(reverse))
+        return rows
+
+    def _sort(self, sort, reverse):
+        if self._by_name is None:
+            natural = _natural_keys(self.name)
+            self._by_name = sorted(range(len(natural)), key=natural.__getitem__)
+        if sort == 'name':
+            rows = self._by_name[::-1] if reverse else self._by_name
+        else:
+            # 稳定排序：同值的行保持名称顺序
+            if sort == 'type':
+                column = [self.types[type_id] for type_id in self.type]
+            else:
+                column = getattr(self, sort)
+            rows = sorted(self._by_name, key=column.__getitem__, reverse=reverse)
+        folder = self._type_ids.get(FOLDER)
+        if folder is None:
+            return rows
+        kinds = self.type
+        return [row for row in rows if kinds[row] == folder] + [row for row in rows if kinds[row] != folder]
+
+    def take(self, rows):
+        """只含指定行（按给定顺序）的新对象，去重表与 version 不变"""
+        result = FileColumns.__new__(FileColumns)
+        result.__dict__.update(self.__dict__)
+        for key in ('name', 'path', 'type', 'size', 'mtime'):
+            column = getattr(self, key)
+            setattr(result, key, [column[row] for row in rows])
+        result.extra = {key: [column[row] for row in rows] for key, column in self.extra.items()}
+        result._orders = {}
+        result._by_name = None
+        return result
+
+    def replace(self, **columns):
+        """返回替换/增加了若干列的浅拷贝（缓存中的对象不修改）"""
+        result = FileColumns.__new__(FileColumns)
+        result.__dict__.update(self.__dict__)
+        result.extra = dict(self.extra)
+        for key, column in columns.items():
+            if key in ('name', 'path', 'type', 'size', 'mtime'):
+                setattr(result, key, column)
+            else:
+                result.extra[key] = column
+        return result
+
+    def to_dict(self):
+        data = {
+            "format": "columns",
+            "count": len(self.name),
+            "sep": os.sep,
+            "paths": self.paths,
+            "types": self.types,
+            "name": self.name,
+            "path": self.path,
+            "type": self.type,
+            "size": self.size,
+            "mtime": self.mtime,
+        }
+        data.update(self.extra)
+        return data
+
+
+def scan(path):
+    """
+    读取目录为 FileColumns（每项一次 stat，不做时间与大小的格式化），
+    顺序与 file_dir.sort_files 相同：文件夹在前，再按名称
+    :return: 路径不存在时返回 None
+    """
+    if not os.path.isdir(path):
+        return None
+    dirs, files = [], []
+    for entry, st, is_dir in file_dir.scan_dir(path):
+        (dirs if is_dir else files).append((entry.name, st))
+    dirs.sort(key=itemgetter(0))
+    files.sort(key=itemgetter(0))
+    columns = FileColumns()
+    columns.extend(path, dirs, True)
+    columns.extend(path, files, False)
+    return columns
+
+
+def stat_entry(root, name):
+    """搜索结果的原始信息（代替 file_dir.get_file_info），文件不存在时返回 None"""
+    try:
+        return root, name, os.stat(os.path.join(root, name))
+    except OSError:
+        return None
+
+
+def from_entries(entries):
+    """由 stat_entry 的结果构建，保持传入的顺序"""
+    columns = FileColumns()
+    for root, name, st in entries:
+        columns.add(root, name, st, stat.S_ISDIR(st.st_mode))
+    return columns
+
+
+def encode(data):
+    """按 Accept 选择 MessagePack（已安装 msgpack 时）或 JSON，返回 (字节, MIME 类型)"""
+    if msgpack is not None and request.accept_mimetypes.best_match(
+            ['application/json', 'application/x-msgpack']) == 'application/x-msgpack':
+        return msgpack.packb(data, use_bin_type=True), 'application/x-msgpack'
+    try:
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    except UnicodeEncodeError:
+        # 文件名含无法解码的字节（surrogateescape），只能转义输出
+        body = json.dumps(data, separators=(',', ':')).encode('ascii')
+    return body, 'application/json'
+
+
+def respond(data):
+    """编码并按 Accept-Encoding 压缩（br 优先于 gzip）"""
+    body, mimetype = encode(data)
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if len(body) >= MIN_COMPRESS:
+        if brotli is not None and request.accept_encodings['br']:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers['Content-Encoding'] = 'br'
+        elif request.accept_encodings['gzip']:
+            body = gzip.compress(body, GZIP_LEVEL)
+            headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype=mimetype, headers=headers)
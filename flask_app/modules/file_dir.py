@@ -1,8 +1,12 @@
 import os
+import stat
 import shutil
 import time
 import fnmatch
 import psutil
+from modules import metrics
+
+IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
 
 def create_file(file, path):
     """
@@ -118,6 +122,24 @@ def get_disks():
         })
     return disk_info
 
+def scan_dir(path):
+    """
+    基于 os.scandir 遍历目录，每个条目最多一次 stat
+    :param path: 目录路径
+    :yield: (DirEntry, stat_result, 是否目录)
+    """
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                st = entry.stat()
+            except OSError:
+                # 失效的符号链接等，退回到链接自身的信息
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+            yield entry, st, stat.S_ISDIR(st.st_mode)
+
 def get_files(path):
     """
     获取指定目录下的文件、目录信息
@@ -128,28 +150,24 @@ def get_files(path):
     if path == '/' or path == '\\':
         return get_disks()
     dir_list = []
-    #处理所有文件和子文件夹
-    files = [os.path.join(path, f) for f in os.listdir(path)]
-    
-    for file_path in files:
-        # 获取文件基础信息
-        name = os.path.basename(file_path)
+    #处理所有文件和子文件夹（scandir 复用目录项信息，每项仅一次 stat）
+    for entry, st, is_dir in scan_dir(path):
+        name = entry.name
         
         # 获取修改时间并格式化为字符串
-        modified_time = os.path.getmtime(file_path)
-        modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(modified_time))
+        modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(st.st_mtime))
         
         # 判断文件类型
-        if os.path.isdir(file_path):
+        if is_dir:
             file_type = "文件夹"
             icon = ""
             size = "-"
         else:
-            size = os.path.getsize(file_path)
+            size = st.st_size
             # 根据扩展名简单判断文件类型
             _, ext = os.path.splitext(name)
             file_type = ext[1:].lower() if ext else "file"
-            if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']:
+            if ext in IMAGE_EXTS:
                 icon = os.path.join(path, name)
             else:
                 icon = ""
@@ -162,6 +180,8 @@ def get_files(path):
             "size": convert_size(str(size)),
             "path": path
         })
+    metrics.fs_calls.inc(op='scandir', caller='get_files')
+    metrics.fs_calls.inc(len(dir_list), op='stat', caller='get_files')
     return sort_files(dir_list)
 
 def get_dirs(path):
@@ -182,22 +202,54 @@ def get_dirs(path):
             })
         return dir_list
     
-    #处理所有文件和子文件夹
-    files = [os.path.join(path, f) for f in os.listdir(path)]
-    
-    for file_path in files:
-        # 获取文件基础信息
-        name = os.path.basename(file_path)
-        
-        # 判断文件类型
-        if os.path.isdir(file_path):
-            dir_list.append({
-                "name": name,
-                "path": path
-            })
+    #处理所有子文件夹（DirEntry.is_dir 直接使用目录项类型，通常无需 stat）
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                dir_list.append({
+                    "name": entry.name,
+                    "path": path
+                })
 
     return dir_list
   
+def get_file_info(root, name):
+    """
+    获取单个文件的列表信息（一次 stat）
+    :param root: 文件所在目录
+    :param name: 文件名
+    :return: 文件信息字典，文件不存在时返回 None
+    """
+    try:
+        st = os.stat(os.path.join(root, name))
+    except OSError:
+        return None
+
+    # 获取修改时间并格式化为字符串
+    modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(st.st_mtime))
+
+    # 判断文件类型
+    if stat.S_ISDIR(st.st_mode):
+        file_type = "文件夹"
+        size = "-"
+    else:
+        size = st.st_size
+        # 根据扩展名简单判断文件类型
+        _, ext = os.path.splitext(name)
+        file_type = ext[1:].lower() if ext else "file"
+
+    return {
+        "name": name,
+        "modified": modified,
+        "type": file_type,
+        "size": convert_size(str(size)),
+        "path": root
+    }
+
 def search_files(directory, pattern):
     """
     在指定目录及其子目录中搜索匹配的文件
@@ -206,35 +258,29 @@ def search_files(directory, pattern):
     :param pattern: 文件名匹配模式（支持Unix shell风格通配符）
     :return: 匹配的文件路径列表
     """
-    dir_list = []
+    return [info for info in iter_search_files(directory, pattern) if info is not None]
+
+def iter_search_files(directory, pattern, info=get_file_info, match=None):
+    """
+    search_files 的生成器版本：逐个产出匹配文件的信息，
+    每遍历完一个目录额外产出一个 None，便于调用方在没有匹配时也能检查超时与取消
+    :param info: info(所在目录, 文件名) 生成每个结果，文件不存在时返回 None
+    :param match: match(文件名) 判断是否匹配，给出时代替 pattern
+    """
+    if match is None:
+        match = lambda filename: fnmatch.fnmatch(filename, pattern)
     for root, dirs, files in os.walk(directory):
+        matched = 0
         for filename in files:
-            if fnmatch.fnmatch(filename, pattern):
-                name = filename
-            
-                # 获取修改时间并格式化为字符串
-                modified_time = os.path.getmtime(os.path.join(root, filename))
-                modified = time.strftime('%Y-%m-%d %H:%M', time.localtime(modified_time))
-
-                
-                # 判断文件类型
-                if os.path.isdir(os.path.join(root, filename)):
-                    file_type = "文件夹"
-                    size = "-"
-                else:
-                    size = os.path.getsize(os.path.join(root, filename))
-                    # 根据扩展名简单判断文件类型
-                    _, ext = os.path.splitext(name)
-                    file_type = ext[1:].lower() if ext else "file"
-                
-                dir_list.append({
-                    "name": name,
-                    "modified": modified,
-                    "type": file_type,
-                    "size": convert_size(str(size)),
-                    "path": root
-                })
-    return dir_list
+            if match(filename):
+                matched += 1
+                result = info(root, filename)
+                if result is not None:
+                    yield result
+        metrics.fs_calls.inc(op='scandir', caller='search_files')
+        if matched:
+            metrics.fs_calls.inc(matched, op='stat', caller='search_files')
+        yield None
 
 def sort_files(dir_list):
     """
@@ -0,0 +1,591 @@
+import os
+import sys
+import time
+import json
+import uuid
+import errno
+import shutil
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_all
+from modules import dir_cache, folder_size
+
+# 并行复制/删除文件的线程数
+WORKERS = 4
+# 每次内核复制调用的字节数，也是进度与取消的粒度
+CHUNK_SIZE = 16 * 1024 * 1024
+# 保留的任务记录数（只淘汰已结束的）
+MAX_JOBS = 200
+# 接口提交任务后最多等待这么久（秒），小任务可以直接返回结果
+WAIT = 0.5
+# 每个任务最多记录的错误数
+MAX_ERRORS = 50
+# 多进程模式下把任务状态写入共享目录、检查其他进程发来的取消/续传请求的间隔（秒）
+PUBLISH_INTERVAL = 0.5
+
+# 任务状态
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _kernel_copy(fin, fout, pos, count):
+    """copy_file_range：数据不经过用户态，同一文件系统上可能直接共享数据块（reflink）"""
+    return os.copy_file_range(fin.fileno(), fout.fileno(), count, pos, pos)
+
+
+def _sendfile_copy(fin, fout, pos, count):
+    os.lseek(fout.fileno(), pos, os.SEEK_SET)
+    return os.sendfile(fout.fileno(), fin.fileno(), pos, count)
+
+
+def _buffered_copy(fin, fout, pos, count):
+    fin.seek(pos)
+    data = fin.read(count)
+    fout.seek(pos)
+    return fout.write(data)
+
+
+# 依次尝试的复制方式，不支持时（跨文件系统的旧内核、Windows 等）退到下一种
+COPY_METHODS = [method for method, available in (
+    (_kernel_copy, hasattr(os, 'copy_file_range')),
+    (_sendfile_copy, hasattr(os, 'sendfile') and sys.platform.startswith('linux')),
+    (_buffered_copy, True),
+) if available]
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+def _same_file(src, dst):
+    """两个路径是否指向同一文件或目录（符号链接、结尾斜杠、大小写等写法不同也能识别）"""
+    try:
+        src_st, dst_st = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return (src_st.st_dev, src_st.st_ino) == (dst_st.st_dev, dst_st.st_ino)
+
+
+def _scan(src, dst):
+    """
+    遍历目录树，产出 ('dir', 源, 目标)、('file', 源, 目标, 大小)、('link', 源, 目标)
+    父目录先于子目录产出；目录的符号链接不跟随
+    """
+    stack = [(src, dst)]
+    while stack:
+        src_dir, dst_dir = stack.pop()
+        yield 'dir', src_dir, dst_dir
+        with os.scandir(src_dir) as it:
+            for entry in it:
+                target = os.path.join(dst_dir, entry.name)
+                if entry.is_symlink():
+                    yield 'link', entry.path, target
+                elif entry.is_dir():
+                    stack.append((entry.path, target))
+                else:
+                    yield 'file', entry.path, target, entry.stat().st_size
+
+
+class Job:
+    """
+    一个复制/移动/删除任务：操作 src_dir 下的 names，复制/移动到 dst_dir
+    """
+    def __init__(self, kind, src_dir, dst_dir, names):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.src_dir = src_dir
+        self.dst_dir = dst_dir
+        self.names = names
+        self.state = QUEUED
+        self.resume = False
+        self.created = set()    # 本任务创建（或写了一部分）的目标路径，续传时只有这些可以继续写入或跳过
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.transferred = 0    # 本次运行实际读写的字节（不含续传跳过的）
+        self.files_total = 0
+        self.files_done = 0
+        self.errors = []
+        self.started = None
+        self.finished = None
+
+    def add(self, nbytes=0, files=0, transferred=True):
+        with self._lock:
+            self.bytes_done += nbytes
+            self.files_done += files
+            if transferred:
+                self.transferred += nbytes
+
+    def plan(self, nbytes=0, files=0):
+        with self._lock:
+            self.bytes_total += nbytes
+            self.files_total += files
+
+    def error(self, path, e):
+        print(f"任务{self.id}处理{path}失败:{e}")
+        with self._lock:
+            if len(self.errors) < MAX_ERRORS:
+                self.errors.append({'path': path, 'error': str(e)})
+
+    def status(self):
+        end = self.finished or time.time()
+        elapsed = end - self.started if self.started else 0
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'src': self.src_dir,
+            'dst': self.dst_dir,
+            'bytes_total': self.bytes_total,
+            'bytes_done': self.bytes_done,
+            'files_total': self.files_total,
+            'files_done': self.files_done,
+            'throughput': round(self.transferred / elapsed) if elapsed > 0 else 0,
+            'elapsed': round(elapsed, 3),
+            'errors': list(self.errors),
+        }
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+
+class SharedJob:
+    """其他工作进程中的任务：共享目录中的状态快照，只读"""
+    def __init__(self, data, orphaned=False):
+        self.id = data['id']
+        self.state = data['state']
+        self.orphaned = orphaned    # 任务所在进程已退出，无法再取消/续传
+        self._data = data
+
+    def status(self):
+        return dict(self._data)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobManager:
+    """
+    文件任务队列：任务按提交顺序逐个执行，每个任务内的文件由线程池并行处理
+      - 复制：copy_file_range/sendfile 内核复制，按块推进进度，可取消
+      - 移动：同一文件系统内直接重命名，跨文件系统时复制后删除源
+      - 删除：并行删除文件后自底向上删除目录
+    取消或失败的任务可以续传：已完整复制的文件跳过，复制了一部分的文件从已有长度继续；
+    只续写本任务创建的目标（Job.created），原本就存在的目标仍记为"目标已存在"
+    """
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._jobs = OrderedDict()      # {任务ID: Job}
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+        self.share_dir = None
+        self._written = {}              # {任务ID: 上次写入共享目录时的进度}
+        self._share_lock = threading.Lock()
+
+    def share(self, share_dir):
+        """
+        多进程模式：任务在提交它的工作进程中执行，状态定期写入共享目录，
+        请求落到其他工作进程时从共享目录读取状态，取消/续传以标记文件转交任务所在进程
+        """
+        os.makedirs(share_dir, exist_ok=True)
+        self.share_dir = share_dir
+        threading.Thread(target=self._publish_loop, daemon=True).start()
+
+    def submit(self, kind, src_dir, dst_dir, names):
+        """
+        :param kind: 'copy' / 'move' / 'delete'（delete 时 dst_dir 为 None）
+        :param names: src_dir 下要处理的文件/目录名
+        """
+        job = Job(kind, src_dir, dst_dir, list(names))
+        with self._cond:
+            self._jobs[job.id] = job
+            self._prune()
+            self._enqueue(job)
+        self._write(job)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id) or self._load(job_id)
+
+    def jobs(self):
+        with self._cond:
+            result = [job.status() for job in self._jobs.values()]
+        if self.share_dir:
+            local = {job['id'] for job in result}
+            for name in sorted(os.listdir(self.share_dir)):
+                job_id, ext = os.path.splitext(name)
+                if ext == '.json' and job_id not in local:
+                    job = self._load(job_id)
+                    if job is not None:
+                        result.append(job.status())
+        return result
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return self._forward(job_id, 'cancel', (QUEUED, RUNNING))
+        if job.state not in (QUEUED, RUNNING):
+            return False
+        job.cancel_event.set()
+        with self._cond:
+            if job.state == QUEUED:
+                self._queue.remove(job)
+                self._finish(job, CANCELLED)
+        return True
+
+    def resume(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return self._forward(job_id, 'resume', (FAILED, CANCELLED))
+        if job.state not in (FAILED, CANCELLED):
+            return False
+        with self._cond:
+            job.resume = True
+            job.cancel_event.clear()
+            job.done_event.clear()
+            job.state = QUEUED
+            job._reset()
+            self._enqueue(job)
+        return True
+
+    def wait(self, job, timeout=WAIT):
+        """等待任务结束，返回是否已结束"""
+        return job.done_event.wait(timeout)
+
+    def _enqueue(self, job):
+        """调用方持有 _cond"""
+        self._queue.append(job)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _prune(self):
+        """调用方持有 _cond"""
+        if len(self._jobs) <= MAX_JOBS:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.state in (DONE, FAILED, CANCELLED)][:len(self._jobs) - MAX_JOBS]:
+            del self._jobs[job_id]
+            if self.share_dir:
+                self._written.pop(job_id, None)
+                try:
+                    os.remove(os.path.join(self.share_dir, job_id + '.json'))
+                except OSError:
+                    pass
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+                job.state = RUNNING
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            job.started = time.time()
+            state = DONE
+            try:
+                getattr(self, '_' + job.kind)(job)
+                if job.errors:
+                    state = FAILED
+            except JobCancelled:
+                state = CANCELLED
+            except Exception as e:
+                job.error(job.src_dir, e)
+                state = FAILED
+            with self._cond:
+                self._finish(job, state)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished = time.time()
+        self._invalidate(job)
+        self._write(job)
+        job.done_event.set()
+
+    # ---------------- 多进程共享 ---------------- #
+
+    def _write(self, job):
+        """把任务状态原子写入共享目录（进度没有变化时跳过）"""
+        if not self.share_dir:
+            return
+        with self._share_lock:
+            status = job.status()
+            progress = (status['state'], status['bytes_done'], status['files_done'], len(status['errors']))
+            if self._written.get(job.id) == progress:
+                return
+            self._written[job.id] = progress
+            path = os.path.join(self.share_dir, job.id + '.json')
+            try:
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(dict(status, pid=os.getpid()), f, ensure_ascii=False)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(f"写入任务{job.id}状态失败:{e}")
+
+    def _load(self, job_id):
+        """读取其他进程中的任务，任务所在进程已退出时视为失败"""
+        if not self.share_dir or not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.share_dir, job_id + '.json'), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        pid = data.pop('pid', None)
+        orphaned = bool(pid) and not _alive(pid)
+        if orphaned and data['state'] in (QUEUED, RUNNING):
+            data['state'] = FAILED
+            data['errors'] = data['errors'] + [{'path': data['src'], 'error': "任务所在的工作进程已退出"}]
+        return SharedJob(data, orphaned)
+
+    def _forward(self, job_id, action, states):
+        """取消/续传其他进程中的任务：写入标记文件，由任务所在进程处理"""
+        job = self._load(job_id)
+        if job is None or job.orphaned or job.state not in states:
+            return False
+        open(os.path.join(self.share_dir, f"{job_id}.{action}"), 'w').close()
+        return True
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(PUBLISH_INTERVAL)
+            try:
+                self._publish()
+            except Exception as e:
+                print(f"发布任务状态失败:{e}")
+
+    def _publish(self):
+        for name in os.listdir(self.share_dir):
+            job_id, ext = os.path.splitext(name)
+            if ext in ('.cancel', '.resume') and job_id in self._jobs:
+                os.remove(os.path.join(self.share_dir, name))
+                getattr(self, ext[1:])(job_id)
+        with self._cond:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            self._write(job)
+
+    def _invalidate(self, job):
+        for name in job.names:
+            dir_cache.invalidate(os.path.join(job.src_dir, name), recursive=True)
+        dir_cache.invalidate(job.src_dir)
+        folder_size.touch(job.src_dir)
+        if job.dst_dir:
+            dir_cache.invalidate(job.dst_dir)
+            folder_size.touch(job.dst_dir)
+
+    # ---------------- 复制 ---------------- #
+
+    def _copy(self, job):
+        for name in job.names:
+            job.check()
+            src = os.path.join(job.src_dir, name)
+            self._copy_item(job, src, os.path.join(job.dst_dir, name))
+
+    def _claim(self, job, dst):
+        """
+        登记要写入的目标：已存在且不是本任务创建的记为错误，返回 False
+        （失败后重试时不能写入或覆盖原本就存在的无关文件）
+        """
+        if dst not in job.created and os.path.lexists(dst):
+            job.error(dst, "目标已存在")
+            return False
+        job.created.add(dst)
+        return True
+
+    def _copy_item(self, job, src, dst):
+        """
+        复制一个文件或目录树，返回是否没有出错
+        源与目标为同一文件时记为错误（以 'wb' 打开目标会先截断源文件）；
+        目标已存在时只有是本任务之前创建的（续传）才写入
+        """
+        errors = len(job.errors)
+        if _same_file(src, dst):
+            job.error(src, "源与目标是同一文件")
+            return False
+        if os.path.isdir(src) and not os.path.islink(src):
+            if os.path.commonpath([os.path.abspath(src), os.path.abspath(dst)]) == os.path.abspath(src):
+                job.error(src, "不能复制到自身的子目录")
+                return False
+            if not self._claim(job, dst):
+                return False
+            dirs, tasks = [], []
+            for entry in _scan(src, dst):
+                job.check()
+                if entry[0] == 'dir':
+                    job.created.add(entry[2])
+                    os.makedirs(entry[2], exist_ok=True)
+                    dirs.append(entry[1:])
+                else:
+                    tasks.append(entry)
+                    job.plan(entry[3] if entry[0] == 'file' else 0, 1)
+            self._parallel(job, [self._pool.submit(self._copy_entry, job, entry) for entry in tasks])
+            # 子目录的文件写完后再设置目录时间
+            for src_dir, dst_dir in reversed(dirs):
+                try:
+                    shutil.copystat(src_dir, dst_dir)
+                except OSError as e:
+                    job.error(dst_dir, e)
+        else:
+            if not self._claim(job, dst):
+                return False
+            entry = ('link', src, dst) if os.path.islink(src) else ('file', src, dst, os.path.getsize(src))
+            job.plan(entry[3] if entry[0] == 'file' else 0, 1)
+            self._copy_entry(job, entry)
+        return len(job.errors) == errors
+
+    def _parallel(self, job, futures):
+        """等待文件任务完成（取消后尚未开始的任务直接返回）"""
+        wait_all(futures)
+        job.check()
+
+    def _copy_entry(self, job, entry):
+        if job.cancel_event.is_set() or not self._claim(job, entry[2]):
+            return
+        try:
+            if entry[0] == 'link':
+                _, src, dst = entry
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                os.symlink(os.readlink(src), dst)
+                job.add(files=1)
+            else:
+                self._copy_file(job, entry[1], entry[2])
+        except OSError as e:
+            job.error(entry[1], e)
+
+    def _copy_file(self, job, src, dst):
+        st = os.stat(src)
+        offset = 0
+        if job.resume:
+            # 目标已由 _claim 确认是本任务之前写入的
+            try:
+                dst_st = os.stat(dst)
+            except OSError:
+                dst_st = None
+            if dst_st is not None:
+                if dst_st.st_size == st.st_size and dst_st.st_mtime_ns == st.st_mtime_ns:
+                    job.add(st.st_size, 1, transferred=False)
+                    return
+                if dst_st.st_size < st.st_size:
+                    offset = dst_st.st_size
+                    job.add(offset, transferred=False)
+        with open(src, 'rb', buffering=0) as fin, open(dst, 'r+b' if offset else 'wb', buffering=0) as fout:
+            methods = list(COPY_METHODS)
+            pos = offset
+            while pos < st.st_size:
+                job.check()
+                count = min(CHUNK_SIZE, st.st_size - pos)
+                try:
+                    n = methods[0](fin, fout, pos, count)
+                except OSError as e:
+                    if len(methods) > 1 and e.errno in _FALLBACK_ERRNOS:
+                        methods.pop(0)
+                        continue
+                    raise
+                if not n:
+                    break   # 源文件在复制过程中变短
+                pos += n
+                job.add(n)
+            fout.truncate(pos)
+        shutil.copystat(src, dst)
+        job.add(files=1)
+
+    # ---------------- 移动 ---------------- #
+
+    def _move(self, job):
+        for name in job.names:
+            job.check()
+            src = os.path.join(job.src_dir, name)
+            dst = os.path.join(job.dst_dir, name)
+            if dst in job.created and not os.path.lexists(src) and os.path.lexists(dst):
+                continue    # 上次运行已移动
+            if not self._claim(job, dst):
+                continue
+            try:
+                if os.lstat(src).st_dev == os.stat(job.dst_dir).st_dev:
+                    os.rename(src, dst)
+                    job.plan(files=1)
+                    job.add(files=1)
+                    continue
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    job.error(src, e)
+                    continue
+            # 跨文件系统：复制完成且没有出错后删除源
+            if self._copy_item(job, src, dst):
+                self._delete_item(job, src, count=False)
+
+    # ---------------- 删除 ---------------- #
+
+    def _delete(self, job):
+        for name in job.names:
+            job.check()
+            path = os.path.join(job.src_dir, name)
+            if job.resume and not os.path.lexists(path):
+                continue    # 上次运行已删除
+            self._delete_item(job, path)
+
+    def _delete_item(self, job, path, count=True):
+        """
+        :param count: 是否计入任务进度（跨文件系统移动删除源时不计入）
+        """
+        try:
+            if not os.path.isdir(path) or os.path.islink(path):
+                size = os.lstat(path).st_size
+                os.remove(path)
+                if count:
+                    job.plan(size, 1)
+                    job.add(size, 1)
+                return
+            dirs, tasks = [], []
+            for entry in _scan(path, path):
+                job.check()
+                if entry[0] == 'dir':
+                    dirs.append(entry[1])
+                else:
+                    tasks.append(entry)
+                    if count:
+                        job.plan(entry[3] if entry[0] == 'file' else 0, 1)
+            self._parallel(job, [self._pool.submit(self._remove_entry, job, entry, count) for entry in tasks])
+            for dir_path in reversed(dirs):
+                os.rmdir(dir_path)
+        except OSError as e:
+            job.error(path, e)
+
+    def _remove_entry(self, job, entry, count):
+        if job.cancel_event.is_set():
+            return
+        try:
+            os.remove(entry[1])
+            if count:
+                job.add(entry[3] if entry[0] == 'file' else 0, 1)
+        except OSError as e:
+            job.error(entry[1], e)
+
+
+manager = JobManager()
+share = manager.share
+submit = manager.submit
+get = manager.get
+cancel = manager.cancel
+resume = manager.resume
+wait = manager.wait
@@ -0,0 +1,433 @@
+import os
+import json
+import time
+import threading
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from modules import file_dir, file_columns
+
+# 事件静默多久后（秒）统一刷新脏目录
+DEBOUNCE = 1.0
+
+# 只读副本检查统计文件是否被替换的最短间隔（秒）
+REFRESH_INTERVAL = 1.0
+
+
+def _norm(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+class _Node:
+    """一个目录：直接包含的文件字节数/文件数，包含子目录的总计，以及子目录路径集合"""
+    __slots__ = ('own_bytes', 'own_files', 'bytes', 'files', 'children')
+
+    def __init__(self, own_bytes=0, own_files=0, children=None):
+        self.own_bytes = own_bytes
+        self.own_files = own_files
+        self.bytes = own_bytes
+        self.files = own_files
+        self.children = children or set()
+
+
+def _rebase(norm_path, src, dst):
+    """src 子树中的路径换到 dst 下，其他路径不变"""
+    if norm_path == src:
+        return dst
+    if norm_path.startswith(os.path.join(src, '')):
+        return dst + norm_path[len(src):]
+    return norm_path
+
+
+def _scan_dir(path):
+    """读取单个目录：(直接文件字节数, 直接文件数, {子目录规范化路径: 子目录真实路径})，不跟随符号链接"""
+    own_bytes = own_files = 0
+    children = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    children[_norm(entry.path)] = entry.path
+                else:
+                    own_bytes += entry.stat(follow_symlinks=False).st_size
+                    own_files += 1
+            except OSError:
+                continue
+    return own_bytes, own_files, children
+
+
+def _scan_tree(top):
+    """扫描整个子树，返回 {规范化路径: _Node}（总计已汇总），top 不可读时返回空字典"""
+    nodes = {}
+    order = []
+    stack = [(_norm(top), top)]
+    while stack:
+        norm_path, path = stack.pop()
+        try:
+            own_bytes, own_files, children = _scan_dir(path)
+        except OSError:
+            continue
+        nodes[norm_path] = _Node(own_bytes, own_files, set(children))
+        order.append(norm_path)
+        stack.extend(children.items())
+    # 先序的逆序：子目录总是先于父目录汇总
+    for norm_path in reversed(order):
+        node = nodes[norm_path]
+        node.children &= nodes.keys()
+        for child in node.children:
+            node.bytes += nodes[child].bytes
+            node.files += nodes[child].files
+    return nodes
+
+
+class FolderSizeUpdater(FileSystemEventHandler):
+    """watchdog 事件处理：把内容变化的目录标记为脏目录"""
+    def __init__(self, service):
+        self.service = service
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed_no_write'):
+            return
+        if event.event_type == 'moved' and event.is_synthetic:
+            return      # 随目录一起移动的条目各有一个合成事件，已由目录的移动处理
+        src_path = os.fsdecode(event.src_path)
+        if event.is_directory and event.event_type == 'modified':
+            self.service.mark(src_path)
+            return
+        dest_path = os.fsdecode(getattr(event, 'dest_path', '') or '')
+        if event.is_directory and event.event_type == 'moved' and dest_path:
+            self.service.move(src_path, dest_path)
+            return
+        self.service.mark(os.path.dirname(src_path))
+        if dest_path:
+            self.service.mark(os.path.dirname(dest_path))
+
+
+class FolderSizeService:
+    """
+    递归目录大小：后台扫描一次根目录，得到每个目录的总字节数与文件数
+    之后只增量更新：目录内容变化时重新读取该目录（一次 scandir），
+    差值沿父目录链向上累加；新增的子目录扫描其子树，消失的子目录减去其总计，
+    改名/移动的目录把已统计的子树改挂到新路径，不重新扫描
+    所有修改在同一个后台线程中进行，列表请求只在锁内查字典
+
+    多进程模式下只有属主进程扫描与监控（start），定期 publish 到统计文件；
+    工作进程 attach 只读该文件，文件被替换后在下一次查询前重新读取
+    """
+    def __init__(self, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self.roots = []                 # 规范化的根目录
+        self._nodes = {}                # {规范化路径: _Node}
+        self._lock = threading.Lock()
+        self._pending_roots = []
+        self._dirty = set()
+        self._moves = []                # 待处理的目录移动 [(规范化源路径, 规范化目标路径)]
+        self._urgent = False            # 有需要立即刷新的目录（文件操作之后）
+        self._last = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._observer = None
+        self._handler = FolderSizeUpdater(self)
+        self._changed = False           # publish 之后是否有变化
+        self._snapshot_file = None      # 只读模式（attach）读取的统计文件
+        self._snapshot = None           # 已读取的统计文件 (inode, mtime_ns, 大小)
+        self._checked = 0.0
+
+    def start(self, roots):
+        if self._observer is not None:
+            return
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.start()
+        for root in roots:
+            if not os.path.isdir(root):
+                print(f"统计目录{root}不存在")
+                continue
+            # 先开始监控再扫描，扫描期间的变化在扫描完成后刷新
+            self._observer.schedule(self._handler, root, recursive=True)
+            with self._cond:
+                self.roots.append(_norm(root))
+                self._pending_roots.append(root)
+                self._wake()
+
+    def attach(self, roots, filename):
+        """只读模式：不扫描、不监控，读取属主进程 publish 的统计文件"""
+        self._snapshot_file = filename
+        self.roots = [_norm(root) for root in roots if os.path.isdir(root)]
+
+    def publish(self, filename):
+        """有变化时把统计结果原子写入文件（属主进程定期调用）"""
+        with self._lock:
+            if not self._changed:
+                return
+            self._changed = False
+            data = {'roots': self.roots,
+                    'dirs': {path: [node.bytes, node.files] for path, node in self._nodes.items()}}
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_name = filename + '.tmp'
+        with open(tmp_name, 'w', encoding='utf-8', errors='surrogateescape') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_name, filename)
+
+    def _refresh_snapshot(self):
+        """只读模式：统计文件被替换后重新读取"""
+        now = time.monotonic()
+        if self._snapshot_file is None or now - self._checked < REFRESH_INTERVAL:
+            return
+        self._checked = now
+        try:
+            st = os.stat(self._snapshot_file)
+            snapshot = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if snapshot == self._snapshot:
+                return
+            with open(self._snapshot_file, 'r', encoding='utf-8', errors='surrogateescape') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return      # 属主进程尚未发布
+        nodes = {path: _Node(total_bytes, total_files) for path, (total_bytes, total_files) in data['dirs'].items()}
+        with self._lock:
+            self._nodes = nodes
+            self._snapshot = snapshot
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def mark(self, path, urgent=False):
+        """
+        标记目录内容已变化
+        :param urgent: 立即刷新，不等待事件静默（文件操作接口调用）
+        """
+        norm_path = _norm(path)
+        if self._snapshot_file is not None or not self._covers(norm_path):
+            return      # 只读模式下由属主进程的监控发现变化
+        with self._cond:
+            self._dirty.add(norm_path)
+            self._last = time.monotonic()
+            self._urgent = self._urgent or urgent
+            self._wake()
+
+    def move(self, src_path, dest_path):
+        """目录改名/移动：源与目标都在统计范围内时改挂子树，否则按源目录消失、目标目录新增处理"""
+        src, dst = _norm(src_path), _norm(dest_path)
+        if self._snapshot_file is not None:
+            return
+        if src == dst or src in self.roots or not self._covers(src) or not self._covers(dst):
+            self.mark(os.path.dirname(src_path))
+            self.mark(os.path.dirname(dest_path))
+            return
+        with self._cond:
+            self._moves.append((src, dst))
+            # 两个父目录仍需刷新：移动前后的其他变化，以及子树未统计时扫描目标
+            self._dirty.update((os.path.dirname(src), os.path.dirname(dst)))
+            self._last = time.monotonic()
+            self._wake()
+
+    def touch(self, path):
+        self.mark(path, urgent=True)
+
+    def get(self, path):
+        """:return: {'bytes', 'files'}，未统计的目录返回 None"""
+        self._refresh_snapshot()
+        with self._lock:
+            node = self._nodes.get(_norm(path))
+            return {'bytes': node.bytes, 'files': node.files} if node else None
+
+    def annotate(self, path, file_list):
+        """
+        把列表中文件夹的 size 替换为递归大小，并附加 files（递归文件数）
+        返回新列表，不修改传入的（可能是目录缓存中的）条目
+        """
+        if not file_list or not self._covers(_norm(path)):
+            return file_list
+        self._refresh_snapshot()
+        result = []
+        with self._lock:
+            for item in file_list:
+                if item.get('type') == "文件夹":
+                    node = self._nodes.get(_norm(os.path.join(item['path'], item['name'])))
+                    if node is not None:
+                        item = dict(item, size=file_dir.convert_size(str(node.bytes)), files=node.files)
+                result.append(item)
+        return result
+
+    def annotate_columns(self, path, columns):
+        """annotate 的列式版本：文件夹的 size 换成递归字节数，并增加 files 列（其余行为 None）"""
+        if not columns or not self._covers(_norm(path)):
+            return columns
+        self._refresh_snapshot()
+        sizes = list(columns.size)
+        files = [None] * len(columns)
+        with self._lock:
+            for row in columns.rows((file_columns.FOLDER,)):
+                node = self._nodes.get(_norm(columns.full_path(row)))
+                if node is not None:
+                    sizes[row] = node.bytes
+                    files[row] = node.files
+        return columns.replace(size=sizes, files=files)
+
+    def _covers(self, norm_path):
+        return any(norm_path == root or norm_path.startswith(os.path.join(root, '')) for root in self.roots)
+
+    def _wake(self):
+        """调用方持有 _cond"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending_roots:
+                        root, moves, dirty = self._pending_roots.pop(0), None, None
+                        break
+                    if self._dirty:
+                        wait = self._last + self.debounce - time.monotonic()
+                        if self._urgent or wait <= 0:
+                            root, moves, dirty = None, self._moves, self._dirty
+                            self._moves, self._dirty, self._urgent = [], set(), False
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            try:
+                if root is not None:
+                    self._build(root)
+                else:
+                    for src, dst in moves:
+                        self._move(src, dst)
+                        # 移动前标记的脏目录已换到新路径下
+                        dirty = {_rebase(norm_path, src, dst) for norm_path in dirty}
+                    # 浅的目录先刷新，其新增子树扫描后，更深的脏目录多半已是最新
+                    for norm_path in sorted(dirty, key=len):
+                        self._refresh(norm_path)
+            except Exception as e:
+                print(f"统计目录大小失败:{e}")
+
+    def _build(self, root):
+        start = time.perf_counter()
+        nodes = _scan_tree(root)
+        with self._lock:
+            self._nodes.update(nodes)
+            self._changed = True
+        node = nodes.get(_norm(root))
+        if node is not None:
+            print(f"目录大小统计{root}就绪: {len(nodes)} 个目录, {node.files} 个文件, "
+                  f"{file_dir.convert_size(str(node.bytes))}, {time.perf_counter() - start:.1f}s")
+
+    def _refresh(self, norm_path):
+        """重新读取一个目录，并把变化累加到父目录链（只在后台线程中调用）"""
+        node = self._nodes.get(norm_path)
+        if node is None:
+            # 尚未统计的目录（新建或移入）：刷新已统计的父目录，由其扫描新增的子树
+            parent = os.path.dirname(norm_path)
+            if parent != norm_path and parent in self._nodes:
+                self._refresh(parent)
+            return
+        try:
+            own_bytes, own_files, children = _scan_dir(norm_path)
+        except OSError:
+            # 目录已不存在：由父目录的刷新移除
+            parent = os.path.dirname(norm_path)
+            if parent != norm_path and parent in self._nodes:
+                self._refresh(parent)
+            elif norm_path in self.roots:
+                with self._lock:
+                    self._drop(norm_path)
+                    self._changed = True
+            return
+        added = {}
+        for child, child_path in children.items():
+            if child not in node.children:
+                added.update(_scan_tree(child_path))
+        with self._lock:
+            delta_bytes = own_bytes - node.own_bytes
+            delta_files = own_files - node.own_files
+            node.own_bytes, node.own_files = own_bytes, own_files
+            for child in node.children - children.keys():
+                removed = self._drop(child)
+                delta_bytes -= removed.bytes
+                delta_files -= removed.files
+            for child in children.keys() - node.children:
+                child_node = added.get(child)
+                if child_node is not None:
+                    delta_bytes += child_node.bytes
+                    delta_files += child_node.files
+            self._nodes.update(added)
+            node.children = set(children) & (node.children | added.keys())
+            self._propagate(norm_path, delta_bytes, delta_files)
+            self._changed = True
+
+    def _move(self, src, dst):
+        """把 src 子树的节点改挂到 dst，总计从旧父目录链移到新父目录链（只在后台线程中调用）"""
+        with self._lock:
+            node = self._nodes.get(src)
+            if node is None:
+                return      # 未统计的子树：由新父目录的刷新扫描
+            if dst in self._nodes:
+                # 被替换的（空）目标目录
+                self._unlink(dst, self._drop(dst))
+            self._unlink(src, node)
+            # 先全部取出再放回，节点的键与 children 一起换成新路径
+            moved = {}
+            stack = [src]
+            while stack:
+                path = stack.pop()
+                child = self._nodes.pop(path, None)
+                if child is not None:
+                    stack.extend(child.children)
+                    child.children = {_rebase(p, src, dst) for p in child.children}
+                    moved[_rebase(path, src, dst)] = child
+            self._nodes.update(moved)
+            parent = os.path.dirname(dst)
+            if parent in self._nodes:
+                self._nodes[parent].children.add(dst)
+                self._propagate(parent, node.bytes, node.files)
+            self._changed = True
+
+    def _unlink(self, norm_path, node):
+        """从父目录的子目录中移除，并从父目录链减去其总计（调用方持有 _lock）"""
+        parent = os.path.dirname(norm_path)
+        if parent != norm_path and parent in self._nodes:
+            self._nodes[parent].children.discard(norm_path)
+            self._propagate(parent, -node.bytes, -node.files)
+
+    def _drop(self, norm_path):
+        """移除子树（调用方持有 _lock），返回子树根的节点"""
+        node = self._nodes.pop(norm_path, None) or _Node()
+        stack = list(node.children)
+        while stack:
+            child = self._nodes.pop(stack.pop(), None)
+            if child is not None:
+                stack.extend(child.children)
+        return node
+
+    def _propagate(self, norm_path, delta_bytes, delta_files):
+        """从 norm_path 起沿父目录链累加到根（调用方持有 _lock）"""
+        if not delta_bytes and not delta_files:
+            return
+        while True:
+            node = self._nodes.get(norm_path)
+            if node is None:
+                return
+            node.bytes += delta_bytes
+            node.files += delta_files
+            if norm_path in self.roots:
+                return
+            parent = os.path.dirname(norm_path)
+            if parent == norm_path:
+                return
+            norm_path = parent
+
+
+service = FolderSizeService()
+start = service.start
+attach = service.attach
+publish = service.publish
+stop = service.stop
+touch = service.touch
+annotate = service.annotate
+annotate_columns = service.annotate_columns
@@ -0,0 +1,211 @@
+import io
+import time
+import random
+import bisect
+import pstats
+import cProfile
+import threading
+from flask import request, g
+
+# 延迟直方图的桶上界（秒）
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}   # {标签值元组: 计数}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # {标签值元组: [各桶计数..., 总和, 总数]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {counts[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {counts[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    """
+    指标注册表，按 Prometheus 文本格式输出
+    除计数器/直方图外，各模块可注册采集函数，在输出时读取当前状态：
+      collector() -> [(名称, 'gauge'/'counter', 说明, [({标签: 值}, 数值), ...]), ...]
+    """
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for func in self._collectors:
+            try:
+                families = func()
+            except Exception as e:
+                print(f"采集指标失败:{e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """
+    按请求采样的 cProfile，运行时开关，结果累积到一个 pstats.Stats
+    """
+    def __init__(self):
+        self.rate = 0.0
+        self.requests = 0
+        self._stats = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def enable(self, rate=1.0):
+        """:param rate: 被采样的请求比例（0-1），开启时清空之前的结果"""
+        with self._lock:
+            self.rate = max(0.0, min(1.0, float(rate)))
+            self.requests = 0
+            self._stats = None
+
+    def disable(self):
+        self.rate = 0.0
+
+    def start(self):
+        """采样到时返回已开始的 Profile，否则返回 None"""
+        if not self.enabled or random.random() >= self.rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None     # 已有其他线程在采样（3.12 起同一时刻只能有一个）
+        return profile
+
+    def finish(self, profile):
+        profile.disable()
+        with self._lock:
+            self.requests += 1
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+    def report(self, sort='cumulative', limit=50):
+        with self._lock:
+            if self._stats is None:
+                return f"没有采样数据（rate={self.rate}）\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            out.write(f"采样请求数: {self.requests}, rate={self.rate}\n")
+            self._stats.sort_stats(sort).print_stats(limit)
+            return out.getvalue()
+
+
+registry = Registry()
+profiler = Profiler()
+
+request_seconds = registry.histogram(
+    'storagebox_request_seconds', "请求处理时间（秒，流式响应只计到开始返回）", ('endpoint', 'method', 'status'))
+fs_calls = registry.counter(
+    'storagebox_fs_calls_total', "列目录与搜索中的文件系统调用次数", ('op', 'caller'))
+
+
+def init_app(app):
+    """为所有蓝图路由记录延迟，并按需采样 cProfile"""
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_profile = profiler.start()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            request_seconds.observe(time.perf_counter() - start, endpoint=request.endpoint or 'unknown',
+                                    method=request.method, status=response.status_code)
+        profile = g.pop('metrics_profile', None)
+        if profile is not None:
+            profiler.finish(profile)
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        # 抛出异常的请求不经过 after_request
+        profile = g.pop('metrics_profile', None)
+        if profile is not None:
+            profile.disable()
+
+
+render = registry.render
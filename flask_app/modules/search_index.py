@@ -0,0 +1,339 @@
+import os
+import sys
+import time
+import hashlib
+import itertools
+import threading
+from watchdog.observers import Observer
+from modules import file_dir, metrics
+
+# everything.py 位于同级的 search_files_app 目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'search_files_app'))
+import everything
+from ngram_index import NgramIndexer
+from index_store import IndexStore
+import index_format
+import query_filter
+
+BACKENDS = {
+    'trie': everything.FileIndexer,
+    'ngram': NgramIndexer,
+}
+
+# 含有通配符的搜索词无法用子串索引回答，退回 os.walk + fnmatch
+WILDCARDS = set('*?[')
+
+# 两次写快照之间至少间隔上一次写入耗时的这么多倍：写快照是 O(索引大小) 的整体重写，
+# 大索引自动降低发布频率，写快照的时间不超过总时间的 1/CHECKPOINT_BACKOFF
+CHECKPOINT_BACKOFF = 20
+
+# 索引搜索每次持锁解析为路径的结果数
+RESULT_BATCH = 200
+
+# 只读副本检查快照文件是否被替换的最短间隔（秒）
+REFRESH_INTERVAL = 1.0
+
+
+def _norm(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _index_file(index_dir, norm_root):
+    name = hashlib.md5(norm_root.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    return os.path.join(index_dir, f"index_{name}.sbidx")
+
+
+class IndexedRoot:
+    """
+    单个根目录的索引：独立的 FileIndexer、锁与监控
+    """
+    def __init__(self, root, backend='ngram', index_dir=''):
+        self.root = root
+        self.norm_root = _norm(root)
+        self.indexer = BACKENDS[backend]()
+        self.searcher = everything.FileSearcher(self.indexer)
+        self.lock = threading.Lock()
+        self.ready = False
+        self.build_seconds = 0.0
+        self.checkpoint_seconds = 0.0   # 上一次写快照的耗时
+        self._checkpointed = 0.0        # 上一次写快照完成的时间（monotonic）
+        self.updater = None
+        self.store = None
+        # 支持对账的后端才持久化（快照 + 事件日志）
+        if index_dir and hasattr(self.indexer, 'reconcile'):
+            self.store = IndexStore(self.indexer, _index_file(index_dir, self.norm_root))
+
+    def covers(self, directory):
+        norm_dir = _norm(directory)
+        return norm_dir == self.norm_root or norm_dir.startswith(os.path.join(self.norm_root, ''))
+
+    def build(self, observer):
+        """
+        先开始监控再构建索引，构建期间的事件在队列中等待锁，不会丢失
+        """
+        start = time.perf_counter()
+        with self.lock:
+            if self.store is not None:
+                self.updater = self.store.updater(self.lock)
+            else:
+                self.updater = everything.BatchedIndexUpdater(self.indexer, self.lock)
+            observer.schedule(self.updater, self.root, recursive=True)
+            if self.store is not None:
+                stats = self.store.open(self.root)
+            else:
+                self.indexer.build_index(self.root)
+                stats = {'source': 'build'}
+            self.ready = True
+        self.build_seconds = time.perf_counter() - start
+        print(f"索引{self.root}就绪: {stats}")
+
+    def checkpoint(self, force=True):
+        """
+        有新事件时写入快照并清空日志
+        :param force: 为 False 时（定期写入），距上一次写入不足其耗时的 CHECKPOINT_BACKOFF 倍则跳过
+        """
+        if self.store is None or not self.ready or not self.store.journal.pending:
+            return
+        if not force and time.monotonic() - self._checkpointed < self.checkpoint_seconds * CHECKPOINT_BACKOFF:
+            return
+        start = time.perf_counter()
+        with self.lock:
+            self.store.checkpoint()
+        self.checkpoint_seconds = time.perf_counter() - start
+        self._checkpointed = time.monotonic()
+
+    def status(self):
+        status = {'root': self.root, 'ready': self.ready, 'files': len(self.indexer),
+                  'build_seconds': round(self.build_seconds, 3)}
+        if self.updater is not None:
+            status.update(self.updater.stats())
+        return status
+
+    def search(self, directory, term, info=file_dir.get_file_info, limit=None):
+        return [result for result in self.iter_search(directory, term, info, limit) if result is not None]
+
+    def iter_search(self, directory, term, info=file_dir.get_file_info, limit=None):
+        """
+        逐个产出 directory 下匹配文件的信息
+        目录与 limit 在索引中排序前求值，只 stat 返回的前 limit 个结果
+        （其间被删除的文件 info 返回 None，结果可能少于 limit）
+        排序持锁一次完成，之后每次持锁只解析 RESULT_BATCH 个ID，stat 与产出都在锁外；
+        其间索引被压缩（ID 重新分配）时重新查询，跳过已产出的结果
+        """
+        yielded = set()
+        while True:
+            with self.lock:
+                indexer = self.indexer
+                id_epoch = indexer.id_epoch
+                ids = self.searcher.search_ids(term, limit, directory)
+            for start in range(0, len(ids), RESULT_BATCH):
+                with self.lock:
+                    if indexer.id_epoch != id_epoch:
+                        break
+                    results = [indexer.result(i) for i in ids[start:start + RESULT_BATCH]]
+                for name, full_path in results:
+                    if full_path in yielded:
+                        continue
+                    if limit is not None and len(yielded) >= limit:
+                        return
+                    yielded.add(full_path)
+                    yield info(os.path.dirname(full_path), name)
+            else:
+                return
+
+
+class SnapshotRoot(IndexedRoot):
+    """
+    只读索引副本（多进程模式的工作进程）：不建索引、不监控文件系统，
+    以只读 mmap 映射索引进程发布的快照（各进程共享同一份页缓存），
+    快照被原子替换后（inode/mtime 变化）在下一次查询前重新映射
+    """
+    def __init__(self, root, index_dir):
+        self.root = root
+        self.norm_root = _norm(root)
+        self.index_file = _index_file(index_dir, self.norm_root)
+        self.indexer = NgramIndexer()
+        self.searcher = everything.FileSearcher(self.indexer)
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.build_seconds = 0.0
+        self.updater = None
+        self.store = None
+        self._snapshot = None       # 当前映射的快照 (inode, mtime_ns, 大小)
+        self._checked = 0.0
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        self.refresh()
+        return self.loaded
+
+    def refresh(self):
+        """快照文件变化时映射新快照；旧快照在正在进行的查询结束后随旧索引对象释放"""
+        now = time.monotonic()
+        if now - self._checked < REFRESH_INTERVAL or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = now
+            try:
+                st = os.stat(self.index_file)
+            except OSError:
+                return      # 索引进程尚未发布快照
+            snapshot = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if snapshot == self._snapshot:
+                return
+            start = time.perf_counter()
+            indexer = NgramIndexer()
+            try:
+                indexer.load_index(self.index_file)
+            except (OSError, index_format.IndexFormatError) as e:
+                print(f"映射索引快照{self.index_file}失败:{e}")
+                return
+            with self.lock:
+                self.indexer = indexer
+                self.searcher = everything.FileSearcher(indexer)
+                self._snapshot = snapshot
+                self.loaded = True
+            self.build_seconds = time.perf_counter() - start
+        finally:
+            self._refresh_lock.release()
+
+
+def _filtered(info, filters):
+    """遍历搜索用：不满足过滤条件的文件当作不存在（返回 None）"""
+    def filtered_info(root, name):
+        if not query_filter.stat_match(filters, os.path.join(root, name)):
+            return None
+        return info(root, name)
+    return filtered_info
+
+
+def _terms_match(text):
+    """遍历搜索用：与索引相同的匹配规则，文件名（小写）包含全部词"""
+    terms = text.lower().split()
+    return lambda filename: all(term in filename.lower() for term in terms)
+
+
+class SearchService:
+    """
+    后台索引服务：为配置的根目录构建 FileIndexer，并通过 IndexUpdater 实时更新
+    """
+    def __init__(self):
+        self.roots = []
+        self._observer = None
+        self._stopped = threading.Event()
+
+    def start(self, roots, backend='ngram', index_dir='', checkpoint_interval=600):
+        """
+        :param index_dir: 索引快照目录，为空时不持久化
+        :param checkpoint_interval: 写快照的间隔（秒），只在索引有变化时写入；大索引按上一次写入的
+                                    耗时自动延长（见 CHECKPOINT_BACKOFF）；
+                                    多进程模式下也是工作进程看到文件变化的延迟
+        """
+        if self._observer is not None:
+            return
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.start()
+        for root in roots:
+            if not os.path.isdir(root):
+                print(f"索引目录{root}不存在")
+                continue
+            indexed = IndexedRoot(root, backend, index_dir)
+            self.roots.append(indexed)
+            threading.Thread(target=indexed.build, args=(self._observer,), daemon=True).start()
+        if index_dir:
+            threading.Thread(target=self._checkpoint_loop, args=(checkpoint_interval,), daemon=True).start()
+
+    def attach(self, roots, index_dir):
+        """
+        只读模式（多进程模式的工作进程）：映射 start 所在进程发布到 index_dir 的快照，
+        快照尚不存在的根目录退回遍历搜索
+        """
+        for root in roots:
+            if not os.path.isdir(root):
+                print(f"索引目录{root}不存在")
+                continue
+            self.roots.append(SnapshotRoot(root, index_dir))
+
+    def _checkpoint_loop(self, interval):
+        while not self._stopped.wait(interval):
+            for indexed in self.roots:
+                indexed.checkpoint(force=False)
+
+    def stop(self):
+        if self._observer is not None:
+            self._stopped.set()
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+            for indexed in self.roots:
+                if indexed.updater is not None:
+                    indexed.updater.stop()
+                indexed.checkpoint()
+
+    def status(self):
+        """各根目录的索引状态：是否就绪、事件队列深度与批次延迟"""
+        return [indexed.status() for indexed in self.roots]
+
+    def search(self, directory, term, info=file_dir.get_file_info, limit=None):
+        """
+        已建立索引的目录直接查询索引，否则退回遍历搜索
+        :param info: info(所在目录, 文件名) 生成每个结果（默认为列表用的信息字典）
+        :param limit: 最多返回的结果数，None 为不限
+        """
+        results = (result for result in self.iter_search(directory, term, info, limit) if result is not None)
+        return list(itertools.islice(results, limit))
+
+    def iter_search(self, directory, term, info=file_dir.get_file_info, limit=None):
+        """
+        search 的生成器版本，产出的 None 表示没有新结果的进度点（见 file_dir.iter_search_files）
+        搜索词可带属性过滤条件（见 query_filter），索引在内存中求值，遍历搜索时逐个 stat 判断
+
+        匹配规则在索引与遍历搜索之间一致：空格分隔的各词不区分大小写、全部包含于文件名（取交集）
+        含通配符（* ? [）的搜索词只能遍历，整体按 fnmatch 匹配 "*搜索词*"
+        （区分大小写与否随操作系统，Windows 不区分）
+        :param limit: 索引只排序并返回前 limit 个结果；遍历搜索按遍历顺序产出，由调用方截断
+        """
+        text, filters = query_filter.parse(term)
+        if WILDCARDS.intersection(text):
+            match = None
+        else:
+            for indexed in self.roots:
+                if indexed.ready and indexed.covers(directory):
+                    return indexed.iter_search(directory, term, info, limit)
+            match = _terms_match(text)
+        if filters is not None:
+            info = _filtered(info, filters)
+        return file_dir.iter_search_files(directory, '*' + text + '*', info, match)
+
+
+service = SearchService()
+start = service.start
+attach = service.attach
+stop = service.stop
+search = service.search
+iter_search = service.iter_search
+status = service.status
+
+
+@metrics.registry.collector
+def _collect():
+    roots = service.status()
+    families = [
+        ('storagebox_index_ready', 'gauge', "索引是否就绪", 'ready'),
+        ('storagebox_index_files', 'gauge', "索引中的文件数", 'files'),
+        ('storagebox_index_build_seconds', 'gauge', "索引构建（或加载快照并对账）耗时（秒）", 'build_seconds'),
+        ('storagebox_index_queue_depth', 'gauge', "等待应用的文件系统事件数", 'queue_depth'),
+        ('storagebox_index_events_total', 'counter', "已应用的文件系统事件数", 'events'),
+        ('storagebox_index_event_lag_seconds', 'gauge', "上个批次最早事件入队到应用完成的时间（秒）", 'last_latency_ms'),
+        ('storagebox_index_event_lag_max_seconds', 'gauge', "事件入队到应用完成的最长时间（秒）", 'max_latency_ms'),
+    ]
+    result = []
+    for name, kind, help, field in families:
+        scale = 1000 if field.endswith('_ms') else 1
+        samples = [({'root': root['root']}, float(root[field]) / scale) for root in roots if field in root]
+        result.append((name, kind, help, samples))
+    return result
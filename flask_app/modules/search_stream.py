@@ -0,0 +1,103 @@
+import json
+import time
+import threading
+from modules import search_index
+
+CHUNK_SIZE = 200        # 每批最多结果数
+FLUSH_INTERVAL = 0.2    # 有结果时最多攒这么久就发送（秒）
+HEARTBEAT = 1.0         # 没有结果时发送进度行的间隔（秒），也用于及时发现客户端断开
+MAX_RESULTS = 10000     # 单次搜索的结果上限
+TIMEOUT = 60            # 单次搜索的总时长上限（秒）
+
+
+class QueryRegistry:
+    """
+    记录每个客户端最新的一次搜索，同一客户端发起新搜索后旧的搜索在下一个检查点停止
+    """
+    def __init__(self):
+        self._latest = {}   # {客户端ID: 令牌}
+        self._lock = threading.Lock()
+
+    def begin(self, client_id):
+        token = object()
+        if client_id:
+            with self._lock:
+                self._latest[client_id] = token
+        return token
+
+    def is_current(self, client_id, token):
+        return not client_id or self._latest.get(client_id) is token
+
+    def end(self, client_id, token):
+        if client_id:
+            with self._lock:
+                if self._latest.get(client_id) is token:
+                    del self._latest[client_id]
+
+
+registry = QueryRegistry()
+
+
+def _line(message):
+    return json.dumps(message, ensure_ascii=False) + '\n'
+
+
+def stream_search(directory, term, client_id=None, max_results=MAX_RESULTS, timeout=TIMEOUT):
+    """
+    流式搜索，产出 NDJSON 行：
+      {"files": [...]}                      一批结果（第一个结果找到后立即单独发送）
+      {"files": [], "scanned": n}           没有新结果时的进度行
+      {"done": true, "count": n, "reason": "done/limit/timeout/cancelled",
+       "first_result_ms": t, "elapsed_ms": t}
+    客户端断开时 WSGI 服务器关闭本生成器，遍历随之停止
+    已建索引的目录由索引只排序前 max_results 个结果，之后分批解析、逐个产出
+    """
+    token = registry.begin(client_id)
+    results = search_index.iter_search(directory, term, limit=max_results)
+    start = last_sent = time.monotonic()
+    chunk = []
+    count = scanned = 0
+    first_result_ms = None
+    reason = 'done'
+    try:
+        for info in results:
+            now = time.monotonic()
+            if info is None:
+                scanned += 1
+            else:
+                if first_result_ms is None:
+                    first_result_ms = round((now - start) * 1000, 2)
+                chunk.append(info)
+                count += 1
+
+            if not registry.is_current(client_id, token):
+                reason = 'cancelled'
+                break
+            if count >= max_results:
+                reason = 'limit'
+                break
+            if now - start > timeout:
+                reason = 'timeout'
+                break
+
+            if chunk:
+                if count == len(chunk) or len(chunk) >= CHUNK_SIZE or now - last_sent >= FLUSH_INTERVAL:
+                    yield _line({'files': chunk})
+                    chunk = []
+                    last_sent = now
+            elif now - last_sent >= HEARTBEAT:
+                yield _line({'files': [], 'scanned': scanned})
+                last_sent = now
+
+        if chunk:
+            yield _line({'files': chunk})
+        yield _line({
+            'done': True,
+            'count': count,
+            'reason': reason,
+            'first_result_ms': first_result_ms,
+            'elapsed_ms': round((time.monotonic() - start) * 1000, 2),
+        })
+    finally:
+        results.close()
+        registry.end(client_id, token)
@@ -0,0 +1,207 @@
+import os
+import uuid
+import mimetypes
+from flask import request, Response
+from werkzeug.http import http_date, parse_date
+
+# 非 sendfile 方式读文件的块大小
+BLOCK_SIZE = 256 * 1024
+# 单个请求最多处理的区间数，超出时忽略 Range 返回整个文件
+MAX_RANGES = 16
+# 内容寻址文件（URL 随内容变化）的缓存头
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# 同一 URL 内容可能变化的文件：可以缓存，但每次使用前用 ETag 重新验证
+REVALIDATE = 'no-cache'
+
+
+def etag(st):
+    """强 ETag：inode、修改时间与大小任一变化都会改变"""
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def parse_ranges(header, size):
+    """
+    解析 Range 头 'bytes=0-99,200-,-50'，重叠或相邻的区间合并
+    :return: [(起始, 结束（不含）), ...]；头部无效或区间过多返回 None（忽略 Range），
+             全部区间都不可满足时返回空列表（416）
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    specs = header[6:].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) + 1 if last else max(size, start + 1)
+                if start < 0 or end <= start:
+                    return None
+            else:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(0, size - suffix), size
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size)))
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _not_modified(tag, st):
+    """条件请求：If-None-Match 优先，没有时看 If-Modified-Since"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        return '*' in tags or tag in tags or f'W/{tag}' in tags
+    since = parse_date(request.headers.get('If-Modified-Since'))
+    return since is not None and int(st.st_mtime) <= since.timestamp()
+
+
+def _range_allowed(tag, st):
+    """If-Range 与当前版本不一致时忽略 Range，返回整个文件"""
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == tag
+    date = parse_date(if_range)
+    return date is not None and int(st.st_mtime) == int(date.timestamp())
+
+
+def _read(f, start, length):
+    """按块读取 [start, start+length)，读完关闭文件"""
+    try:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _body(f, start, length):
+    """
+    单个连续区间的响应体，尽量零拷贝发送：
+      - WSGI 服务器提供 wsgi.file_wrapper 时（如 gunicorn）交给它，由服务器从当前文件位置用 sendfile 发送；
+        file_wrapper 的语义是读到文件末尾，所以只用于延伸到末尾的区间
+      - Werkzeug 的服务器（run.py 与 serve.py）不提供 file_wrapper，但给出连接套接字 werkzeug.socket，
+        见 _sendfile
+      - 其余按块读取
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None and start + length >= os.fstat(f.fileno()).st_size:
+        f.seek(start)
+        return file_wrapper(f, BLOCK_SIZE)
+    sock = request.environ.get('werkzeug.socket')
+    if sock is not None:
+        return _sendfile(sock, f, start, length)
+    return _read(f, start, length)
+
+
+def _sendfile(sock, f, start, length):
+    """
+    先产出空块：Werkzeug 写第一个块时发出状态行与响应头（已有 Content-Length，不分块编码）；
+    之后直接在套接字上 socket.sendfile（Linux 上为 os.sendfile，TLS 连接等不支持时内部退回 send）
+    """
+    try:
+        yield b''
+        sock.sendfile(f, start, length)
+    finally:
+        f.close()
+
+
+def _multipart(f, ranges, size, mimetype, boundary):
+    """multipart/byteranges 响应体，返回 (生成器, 总长度)"""
+    heads = [f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+             f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n".encode('ascii')
+             for start, end in ranges]
+    tail = f"\r\n--{boundary}--\r\n".encode('ascii')
+    length = sum(len(head) for head in heads) + sum(end - start for start, end in ranges) + len(tail)
+
+    def generate():
+        try:
+            for head, (start, end) in zip(heads, ranges):
+                yield head
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = f.read(min(BLOCK_SIZE, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    yield data
+            yield tail
+        finally:
+            f.close()
+    return generate(), length
+
+
+def serve(path, mimetype=None, immutable=False):
+    """
+    发送文件：支持单/多区间 Range、If-Range、强 ETag 与 If-None-Match/If-Modified-Since
+    :param immutable: URL 随内容变化（内容寻址）时为 True，允许浏览器长期缓存不再验证
+    :return: Response，文件不存在时返回 None
+    """
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    st = os.fstat(f.fileno())
+    size = st.st_size
+    tag = etag(st)
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers = {
+        'ETag': tag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': IMMUTABLE if immutable else REVALIDATE,
+        'Accept-Ranges': 'bytes',
+    }
+
+    if _not_modified(tag, st):
+        f.close()
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if 'Range' in request.headers and _range_allowed(tag, st):
+        ranges = parse_ranges(request.headers['Range'], size)
+    if ranges == []:
+        f.close()
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+
+    if not ranges:
+        status, start, length = 200, 0, size
+        body = _body(f, start, length)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        status, length = 206, end - start
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        body = _body(f, start, length)
+    else:
+        boundary = uuid.uuid4().hex
+        status = 206
+        body, length = _multipart(f, ranges, size, mimetype, boundary)
+        mimetype = f'multipart/byteranges; boundary={boundary}'
+
+    headers['Content-Length'] = str(length)
+    headers['Content-Type'] = mimetype
+    response = Response(body, status=status, headers=headers, direct_passthrough=True)
+    # 响应结束或客户端断开时关闭文件
+    response.call_on_close(f.close)
+    return response
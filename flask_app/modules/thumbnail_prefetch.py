@@ -0,0 +1,121 @@
+import os
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from modules import thumbnail_service
+
+# 预热线程数（同时占用的解码进程数）与保留排队状态的目录数
+WORKERS = 2
+MAX_DIRS = 8
+# 可见条目队列上限，超出时丢弃最早的
+MAX_VISIBLE = 1000
+
+
+# 需要缩略图的文件类型
+MEDIA_TYPES = thumbnail_service.IMAGE_TYPES | thumbnail_service.VIDEO_TYPES
+
+
+def media_paths(file_list):
+    """文件列表中需要缩略图的条目路径（保持列表顺序）"""
+    return [os.path.join(item['path'], item['name']) for item in file_list or ()
+            if item.get('type') in MEDIA_TYPES]
+
+
+def column_media_paths(columns):
+    """media_paths 的列式版本（见 file_columns）"""
+    if not columns:
+        return []
+    return [columns.full_path(row) for row in columns.rows(MEDIA_TYPES)]
+
+
+class PrefetchScheduler:
+    """
+    缩略图预热调度
+      - 目录被列出时，其中的图片/视频按列表顺序排队
+      - 前端请求但尚未生成的（可见）条目优先，后请求的先处理
+      - 只处理最近一次列出的目录，切换目录后旧目录的队列暂停，回到该目录时继续
+    """
+    def __init__(self, service=thumbnail_service.service, workers=WORKERS):
+        self.service = service
+        self.workers = workers
+        self._queues = OrderedDict()    # {目录: (堆 [(序号, 路径)], 已排队的路径集合)}
+        self._visible = []              # 堆 [(-序号, 路径)]
+        self._active = None
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.generated = 0
+
+    def warm(self, directory, file_list):
+        """目录被列出：排队其中的媒体文件，并把它设为当前目录"""
+        self.warm_paths(directory, media_paths(file_list))
+
+    def warm_paths(self, directory, paths):
+        with self._cond:
+            self._active = directory
+            heap, queued = self._queues.pop(directory, ([], set()))
+            self._queues[directory] = (heap, queued)
+            # 刷新列表时只补充新出现的文件
+            for path in paths:
+                if path not in queued:
+                    queued.add(path)
+                    heapq.heappush(heap, (next(self._seq), path))
+            while len(self._queues) > MAX_DIRS:
+                self._queues.popitem(last=False)
+            if heap:
+                self._start()
+                self._cond.notify_all()
+
+    def prioritize(self, paths):
+        """可见条目提到队首"""
+        with self._cond:
+            for path in paths:
+                heapq.heappush(self._visible, (-next(self._seq), path))
+            if len(self._visible) > MAX_VISIBLE:
+                self._visible = heapq.nsmallest(MAX_VISIBLE, self._visible)
+                heapq.heapify(self._visible)
+            if paths:
+                self._start()
+                self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            active = self._queues.get(self._active)
+            return len(self._visible) + (len(active[0]) if active else 0)
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next(self):
+        """取下一个路径（调用方持有锁），没有时返回 None"""
+        if self._visible:
+            return heapq.heappop(self._visible)[1]
+        active = self._queues.get(self._active)
+        if active and active[0]:
+            return heapq.heappop(active[0])[1]
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                path = self._next()
+                while path is None:
+                    self._cond.wait()
+                    path = self._next()
+            # 已生成的直接命中返回；否则等待生成完成，限制同时占用的解码进程数
+            try:
+                if self.service.lookup(path, generate=False) is None:
+                    if self.service.get(path, timeout=None):
+                        self.generated += 1
+            except Exception as e:
+                print(f"预热{path}的缩略图失败:{e}")
+
+
+scheduler = PrefetchScheduler()
+warm = scheduler.warm
+warm_paths = scheduler.warm_paths
+prioritize = scheduler.prioritize
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import struct
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from modules import create_thumbnail, thumbnail_store, video_probe, metrics
+
+VIDEO_TYPES = {'mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv', 'flv'}
+IMAGE_TYPES = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'webp'}
+
+# 解码进程数与请求等待缩略图的最长时间（秒），超时返回占位图，任务在后台继续
+WORKERS = min(4, os.cpu_count() or 1)
+TIMEOUT = 2.0
+
+# 解码进程池的启动方式：进程池在处理请求的线程中创建，fork 会复制其他线程持有的锁，
+# 有 forkserver 时（POSIX）用它，否则用平台默认（Windows 为 spawn）
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+
+# 批量接口单次最多返回的缩略图数
+MAX_BATCH = 500
+
+generate_seconds = metrics.registry.histogram(
+    'storagebox_thumbnail_generate_seconds', "缩略图任务从提交到完成的时间（秒，含排队）", ('kind', 'result'))
+
+
+def rendition(size):
+    """请求的尺寸取不小于它的最小缩略图尺寸"""
+    for candidate in create_thumbnail.RENDITIONS:
+        if size is not None and candidate >= size:
+            return candidate
+    return create_thumbnail.RENDITIONS[-1]
+
+
+def _generate(file_path, outputs):
+    """
+    进程池任务：一次解码生成全部尺寸的缩略图
+    :param outputs: {尺寸: 输出路径}
+    :return: 是否生成成功；视频成功时返回其元数据，交给主进程缓存
+    """
+    ext = os.path.splitext(file_path)[1][1:].lower()
+    result = True
+    try:
+        if ext in IMAGE_TYPES:
+            create_thumbnail.create_image_renditions(file_path, outputs)
+        elif ext in VIDEO_TYPES:
+            result = create_thumbnail.create_video_renditions(file_path, outputs)
+        else:
+            return False
+    except Exception as e:
+        print(f"生成{file_path}的缩略图失败:{e}")
+        return False
+    if not result or not all(os.path.exists(path) for path in outputs.values()):
+        return False
+    return result
+
+
+class ThumbnailService:
+    """
+    后台缩略图服务：在有界进程池中解码，同一缩略图的并发请求共享一个进行中的任务
+    生成结果存入内容寻址的 ThumbnailStore
+    """
+    def __init__(self, store=thumbnail_store.store, workers=WORKERS):
+        self.store = store
+        self.workers = workers
+        self._pool = None
+        self._inflight = {}     # {缩略图键: Future}
+        self._lock = threading.Lock()
+
+    def share(self, processes):
+        """多进程模式：解码进程数在 processes 个服务进程间平分，缓存目录改为共享模式"""
+        self.workers = max(1, WORKERS // processes)
+        self.store.share()
+
+    def get(self, file_path, size=None, timeout=TIMEOUT):
+        """
+        :param size: 需要的最长边像素，取不小于它的缩略图尺寸，默认最大尺寸
+        :return: (缩略图目录, 缩略图文件名)；超时返回 None（任务继续），生成失败返回 False
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return False
+        key = self.store.key(file_path, rendition(size), st)
+        location = self.store.lookup(key)
+        if location is not None:
+            return location
+
+        keys = {r: self.store.key(file_path, r, st) for r in create_thumbnail.RENDITIONS}
+        future = self._submit(keys, file_path)
+        try:
+            ok = future.result(timeout)
+        except TimeoutError:
+            return None
+        except BrokenProcessPool as e:
+            print(f"缩略图进程池异常:{e}")
+            return False
+        return self.store.locate(key) if ok else False
+
+    def lookup(self, file_path, size=None, generate=True):
+        """
+        只查已生成的缩略图，不等待
+        :param generate: 未命中时提交后台生成
+        :return: (缩略图目录, 缩略图文件名) 或 None
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        key = self.store.key(file_path, rendition(size), st)
+        location = self.store.lookup(key)
+        if location is None and generate:
+            ext = os.path.splitext(file_path)[1][1:].lower()
+            if ext in IMAGE_TYPES or ext in VIDEO_TYPES:
+                self._submit({r: self.store.key(file_path, r, st) for r in create_thumbnail.RENDITIONS}, file_path)
+        return location
+
+    def pack(self, paths, size=None, generate=True):
+        """
+        把已生成的缩略图打包为一个响应体：
+          uint32（小端）头部长度 + JSON 头部 + 各缩略图字节依次拼接
+          头部: {"type": MIME, "items": [{"path", "key", "offset", "length"}], "missing": [路径, ...]}
+        offset 相对头部之后的数据区；key 可用于 /thumbnail/<key>（可长期缓存）；未生成的缩略图列入 missing
+        :param generate: 是否为未生成的缩略图提交后台生成
+        """
+        header = {'type': 'image/webp', 'items': [], 'missing': []}
+        chunks = []
+        offset = 0
+        for path in paths[:MAX_BATCH]:
+            location = self.lookup(path, size, generate)
+            data = None
+            if location is not None:
+                try:
+                    with open(os.path.join(*location), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    pass
+            if data is None:
+                header['missing'].append(path)
+                continue
+            header['items'].append({'path': path, 'key': os.path.splitext(location[1])[0],
+                                    'offset': offset, 'length': len(data)})
+            chunks.append(data)
+            offset += len(data)
+        head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        return struct.pack('<I', len(head)) + head + b''.join(chunks)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(START_METHOD))
+
+    def _submit(self, keys, file_path):
+        """同一源文件（同一版本）的所有尺寸共用一个任务，以最大尺寸的键标识"""
+        job = keys[create_thumbnail.RENDITIONS[-1]]
+        with self._lock:
+            future = self._inflight.get(job)
+            if future is not None:
+                return future
+            if self._pool is None:
+                self._pool = self._new_pool()
+            outputs = {r: self.store.reserve(key) for r, key in keys.items()}
+            try:
+                future = self._pool.submit(_generate, file_path, outputs)
+            except BrokenProcessPool:
+                # 工作进程异常退出后进程池不可用，重建
+                self._pool = self._new_pool()
+                future = self._pool.submit(_generate, file_path, outputs)
+            self._inflight[job] = future
+        start = time.perf_counter()
+        future.add_done_callback(lambda f: self._done(job, keys, f, file_path, start))
+        return future
+
+    def _done(self, job, keys, future, file_path, start):
+        ok = not future.cancelled() and future.exception() is None and future.result()
+        if ok:
+            for key in keys.values():
+                self.store.add(key)
+            if isinstance(ok, dict):
+                video_probe.store.put(file_path, ok)
+        ext = os.path.splitext(file_path)[1][1:].lower()
+        generate_seconds.observe(time.perf_counter() - start, kind='video' if ext in VIDEO_TYPES else 'image',
+                                 result='ok' if ok else 'failed')
+        with self._lock:
+            if self._inflight.get(job) is future:
+                del self._inflight[job]
+
+    def pending(self):
+        return len(self._inflight)
+
+    def shutdown(self, wait=False):
+        """取消排队的任务；wait 时等待进行中的解码结束、解码进程退出"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+service = ThumbnailService()
+get = service.get
+lookup = service.lookup
+pack = service.pack
+share = service.share
+shutdown = service.shutdown
+
+
+@metrics.registry.collector
+def _collect():
+    stats = service.store.stats()
+    lookups = stats['hits'] + stats['misses']
+    return [
+        ('storagebox_thumbnail_cache_lookups_total', 'counter', "缩略图缓存查询次数",
+         [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]),
+        ('storagebox_thumbnail_cache_hit_ratio', 'gauge', "缩略图缓存命中率",
+         [({}, round(stats['hits'] / lookups, 4) if lookups else 0)]),
+        ('storagebox_thumbnail_cache_entries', 'gauge', "已缓存的缩略图数", [({}, stats['count'])]),
+        ('storagebox_thumbnail_cache_bytes', 'gauge', "缩略图占用的磁盘字节数", [({}, stats['bytes'])]),
+        ('storagebox_thumbnail_pending', 'gauge', "进行中的缩略图任务数", [({}, service.pending())]),
+    ]
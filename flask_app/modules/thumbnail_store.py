@@ -0,0 +1,186 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from modules import create_thumbnail
+
+# 缩略图占用磁盘的上限，超出后按 LRU 淘汰
+MAX_BYTES = 1024 * 1024 * 1024
+
+# 共享模式下命中时刷新缩略图文件 mtime 的最短间隔（秒）
+TOUCH_INTERVAL = 600
+
+
+class ThumbnailStore:
+    """
+    内容寻址的缩略图存储：键为 (完整路径, mtime, 大小, 缩略图尺寸) 的哈希，文件编辑后自动换键
+    文件按键的前两位分散到子目录：<root>/ab/abcdef....webp
+    内存索引记录每个缩略图的大小与访问顺序，命中只需一次字典查找
+
+    共享模式（share，多进程模式的工作进程共用一个目录）：各进程的内存索引互不可见，
+    查询改为以磁盘为准，本进程不淘汰，由唯一的属主进程定期 trim；
+    命中时刷新文件 mtime，trim 按 mtime 近似最近访问顺序淘汰
+
+    旧版缩略图直接放在 root 下、按源文件名命名（thumbnail.<文件名>.webp），
+    不含源文件的目录与版本，无法换算成新键，也不计入预算，扫描磁盘时删除
+    """
+    def __init__(self, root, max_bytes=MAX_BYTES, ext=create_thumbnail.output_ext,
+                 legacy_prefix=create_thumbnail.output_prefix):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self.legacy_prefix = legacy_prefix
+        self._entries = None            # OrderedDict {键: 字节数}，首次使用时扫描磁盘
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.shared = False
+        self.hits = 0
+        self.misses = 0
+
+    def share(self):
+        self.shared = True
+
+    def key(self, file_path, size, st=None):
+        """
+        :param size: 缩略图尺寸（最长边像素）
+        :param st: 源文件的 os.stat 结果，省略时读取
+        """
+        if st is None:
+            st = os.stat(file_path)
+        raw = f"{os.path.abspath(file_path)}\0{st.st_mtime_ns}\0{st.st_size}\0{size}"
+        return hashlib.sha1(raw.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    def locate(self, key):
+        """:return: (子目录, 文件名)"""
+        return os.path.join(self.root, key[:2]), key + self.ext
+
+    def path(self, key):
+        return os.path.join(*self.locate(key))
+
+    def lookup(self, key):
+        """命中返回 (子目录, 文件名) 并更新访问顺序，否则返回 None"""
+        if self.shared:
+            return self._lookup_shared(key)
+        with self._lock:
+            entries = self._load()
+            if key not in entries:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+        return self.locate(key)
+
+    def _lookup_shared(self, key):
+        """以磁盘为准：其他进程生成的缩略图可以命中，已被属主进程淘汰的不再命中"""
+        path = self.path(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        with self._lock:
+            entries = self._load()
+            self._bytes -= entries.pop(key, 0)
+            if st is None:
+                self.misses += 1
+                return None
+            entries[key] = st.st_size
+            self._bytes += st.st_size
+            self.hits += 1
+        if time.time() - st.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return self.locate(key)
+
+    def reserve(self, key):
+        """返回写入路径（确保子目录存在）"""
+        sub_dir, name = self.locate(key)
+        os.makedirs(sub_dir, exist_ok=True)
+        return os.path.join(sub_dir, name)
+
+    def add(self, key):
+        """登记已写入的缩略图，超出预算时淘汰最久未访问的"""
+        try:
+            size = os.path.getsize(self.path(key))
+        except OSError:
+            return
+        with self._lock:
+            entries = self._load()
+            self._bytes += size - entries.pop(key, 0)
+            entries[key] = size
+            if not self.shared:
+                self._evict(entries)
+
+    def trim(self):
+        """
+        重新扫描磁盘，按 mtime 从旧到新淘汰到预算以内（共享模式下由属主进程定期调用）
+        :return: 淘汰的缩略图数
+        """
+        with self._lock:
+            self._entries = None
+            return self._evict(self._load())
+
+    def _evict(self, entries):
+        """超出预算时淘汰最久未访问的（调用方持有锁），返回淘汰数"""
+        evicted = 0
+        while self._bytes > self.max_bytes and len(entries) > 1:
+            old_key, old_size = entries.popitem(last=False)
+            self._bytes -= old_size
+            evicted += 1
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
+        return evicted
+
+    def _load(self):
+        """扫描磁盘建立索引，按修改时间近似访问顺序（调用方持有锁）"""
+        if self._entries is not None:
+            return self._entries
+        found = []
+        try:
+            with os.scandir(self.root) as it:
+                top = list(it)
+        except OSError:
+            top = []
+        self._remove_legacy(top)
+        sub_dirs = [e.path for e in top if len(e.name) == 2 and e.is_dir()]
+        for sub_dir in sub_dirs:
+            with os.scandir(sub_dir) as it:
+                for entry in it:
+                    key, ext = os.path.splitext(entry.name)
+                    if ext != self.ext or '.' in key:
+                        continue    # 未完成的临时文件
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime_ns, key, st.st_size))
+        found.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._bytes = sum(size for _, _, size in found)
+        return self._entries
+
+    def _remove_legacy(self, entries):
+        """删除 root 下旧版按文件名命名的缩略图"""
+        removed = 0
+        for entry in entries:
+            name = entry.name
+            if name.startswith(self.legacy_prefix) and name.endswith(self.ext) and entry.is_file(follow_symlinks=False):
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass    # 其他进程已删除
+        if removed:
+            print(f"已删除{removed}个旧版缩略图")
+
+    def stats(self):
+        with self._lock:
+            entries = self._load()
+            return {'count': len(entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+store = ThumbnailStore(create_thumbnail.output_dir)
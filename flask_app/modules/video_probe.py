@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import threading
+import cv2
+from modules import file_dir
+
+VIDEO_TYPES = {'mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv', 'flv'}
+
+# 依次尝试的封面时间点（占时长的比例），第一帧常是黑屏
+POSTER_OFFSETS = (0.1, 0.25, 0.5)
+# 亮度均值低于此值（0-255）视为黑帧；判断时每隔 DARK_STRIDE 个像素取样
+DARK_THRESHOLD = 20
+DARK_STRIDE = 16
+# 时长未知（无法按时间定位）时最多顺序读取的帧数
+MAX_SCAN_FRAMES = 120
+
+# 元数据日志中被覆盖的行超过此数且多于有效记录数时重写日志
+COMPACT_MIN = 1000
+# 重写日志并清除已删除/已修改文件的记录的最长间隔（秒）
+PRUNE_INTERVAL = 24 * 3600
+# 读取其他进程追加的记录的最短间隔（秒）
+REFRESH_INTERVAL = 1.0
+
+
+def _fourcc(value):
+    code = int(value)
+    chars = ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+    return chars.strip('\0 ') if chars.isprintable() else ''
+
+
+def probe(cap):
+    """
+    读取已打开视频的元数据（只读容器信息，不解码）
+    :return: {'duration': 秒, 'width', 'height', 'fps', 'frames', 'codec'}
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    return {
+        'duration': round(frames / fps, 3) if fps > 0 and frames > 0 else 0,
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+        'fps': round(fps, 3),
+        'frames': frames,
+        'codec': _fourcc(cap.get(cv2.CAP_PROP_FOURCC) or 0),
+    }
+
+
+def brightness(frame):
+    """稀疏取样估计帧的平均亮度"""
+    return float(frame[::DARK_STRIDE, ::DARK_STRIDE].mean())
+
+
+def poster_frame(input_path):
+    """
+    提取封面帧：按时间定位（FFmpeg 后端定位到之前最近的关键帧，只需解码一个 GOP 内的帧），
+    依次尝试 POSTER_OFFSETS，跳过近乎全黑的帧；都偏暗时取最亮的一帧
+    :return: (BGR 帧或 None, 元数据)
+    """
+    cap = cv2.VideoCapture(input_path)
+    try:
+        if not cap.isOpened():
+            return None, None
+        meta = probe(cap)
+        best, best_level = None, -1.0
+        if meta['duration'] > 0:
+            for offset in POSTER_OFFSETS:
+                cap.set(cv2.CAP_PROP_POS_MSEC, meta['duration'] * offset * 1000)
+                ret, frame = cap.read()
+                if not ret:
+                    continue
+                level = brightness(frame)
+                if level >= DARK_THRESHOLD:
+                    return frame, meta
+                if level > best_level:
+                    best, best_level = frame, level
+        if best is None:
+            # 无法定位：从头顺序读取，直到遇到不暗的帧
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            for _ in range(MAX_SCAN_FRAMES):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                level = brightness(frame)
+                if level > best_level:
+                    best, best_level = frame, level
+                if level >= DARK_THRESHOLD:
+                    break
+        return best, meta
+    finally:
+        cap.release()
+
+
+class MetadataStore:
+    """
+    视频元数据缓存：{完整路径: [mtime_ns, 大小, 元数据]}
+    保存为只追加的日志（每行一个 JSON [完整路径, mtime_ns, 大小, 元数据]，后写的行覆盖先写的），
+    每次探测只追加一行，多个进程（serve.py 的工作进程）可同时追加，并定期读取其他进程追加的行
+    被覆盖的行过多或距上次清理超过 PRUNE_INTERVAL 时重写日志，去掉文件已删除或已修改的记录
+    （重写期间其他进程追加的行会丢失，之后按需重新探测）
+    文件修改后（mtime 或大小变化）记录失效
+    """
+    def __init__(self, filename, legacy_file=None):
+        self.filename = filename
+        self.legacy_file = legacy_file  # 旧版整体保存的 JSON 文件，首次加载时迁移
+        self._entries = None
+        self._file_id = None            # 已读取的日志文件 (st_dev, st_ino)，被重写后整体重新读取
+        self._offset = 0                # 已读取到的位置
+        self._lines = 0                 # 已读取的行数
+        self._checked = 0.0
+        self._pruned = None             # 上一次重写日志的时间（monotonic），None 为本进程尚未重写
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """首次调用时读取日志，之后最多每 REFRESH_INTERVAL 秒读取新追加的行（调用方持有锁）"""
+        now = time.monotonic()
+        first = self._entries is None
+        if first:
+            self._entries = {}
+        elif now - self._checked < REFRESH_INTERVAL:
+            return self._entries
+        self._checked = now
+        try:
+            if first:
+                self._migrate()
+            self._read()
+        except OSError as e:
+            print(f"读取视频元数据{self.filename}失败:{e}")
+        return self._entries
+
+    def _read(self):
+        try:
+            f = open(self.filename, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            if (st.st_dev, st.st_ino) != self._file_id or st.st_size < self._offset:
+                self._entries, self._file_id, self._offset, self._lines = {}, (st.st_dev, st.st_ino), 0, 0
+            f.seek(self._offset)
+            data = f.read()
+        # 只处理完整的行，其他进程可能正在追加
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                path, mtime_ns, size, meta = json.loads(line.decode('utf-8', 'surrogateescape'))
+            except (ValueError, TypeError):
+                continue
+            self._entries[path] = [mtime_ns, size, meta]
+            self._lines += 1
+        self._offset += end
+
+    def _migrate(self):
+        """把旧版的 JSON 文件转为日志"""
+        if not self.legacy_file or os.path.exists(self.filename):
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._compact()
+        os.remove(self.legacy_file)
+
+    @staticmethod
+    def _line(path, entry):
+        return (json.dumps([path, *entry], ensure_ascii=False) + '\n').encode('utf-8', 'surrogateescape')
+
+    def _compact(self):
+        """重写日志：每个文件一行，去掉文件已删除或已修改的记录（调用方持有锁）"""
+        live = {}
+        for path, entry in self._entries.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                live[path] = entry
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmp_name = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmp_name, 'wb') as f:
+            f.write(b''.join(self._line(path, entry) for path, entry in live.items()))
+            st = os.fstat(f.fileno())
+        os.replace(tmp_name, self.filename)
+        self._entries = live
+        self._file_id, self._offset, self._lines = (st.st_dev, st.st_ino), st.st_size, len(live)
+        self._pruned = time.monotonic()
+
+    def entry(self, file_path):
+        """
+        缓存的原始记录 [mtime_ns, 大小, 元数据]，不 stat、不检查是否过期
+        （列表已有文件的修改时间与大小，由调用方比较，见 annotate）
+        """
+        with self._lock:
+            return self._load().get(os.path.abspath(file_path))
+
+    def get(self, file_path, st=None):
+        try:
+            st = st or os.stat(file_path)
+        except OSError:
+            return None
+        entry = self.entry(file_path)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        return None
+
+    def put(self, file_path, meta, st=None):
+        try:
+            st = st or os.stat(file_path)
+        except OSError:
+            return
+        path = os.path.abspath(file_path)
+        entry = [st.st_mtime_ns, st.st_size, meta]
+        with self._lock:
+            entries = self._load()
+            entries[path] = entry
+            try:
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+                # 追加模式下单次写入一行，与其他进程的追加不会交错
+                with open(self.filename, 'ab') as f:
+                    f.write(self._line(path, entry))
+                self._read()
+                superseded = self._lines - len(entries)
+                if (superseded > max(COMPACT_MIN, len(entries))
+                        or self._pruned is None or time.monotonic() - self._pruned > PRUNE_INTERVAL):
+                    self._compact()
+            except OSError as e:
+                print(f"保存视频元数据{self.filename}失败:{e}")
+
+    def info(self, file_path):
+        """读取元数据，未缓存时打开容器读取（不解码）并缓存"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        meta = self.get(file_path, st)
+        if meta is None:
+            cap = cv2.VideoCapture(file_path)
+            try:
+                if not cap.isOpened():
+                    return None
+                meta = probe(cap)
+            finally:
+                cap.release()
+            self.put(file_path, meta, st)
+        return meta
+
+
+def _listed(entry, modified, size):
+    """记录与列表条目（格式化的修改时间与大小）一致"""
+    return (entry is not None and file_dir.convert_size(str(entry[1])) == size
+            and time.strftime('%Y-%m-%d %H:%M', time.localtime(entry[0] / 1e9)) == modified)
+
+
+def annotate(file_list):
+    """
+    为列表中已缓存元数据的视频附加 'video' 字段（只查缓存，不打开、不 stat 文件）
+    用列表条目中的修改时间与大小判断记录是否过期（该格式精确到分钟与显示的大小）
+    返回新列表，不修改传入的（可能是目录缓存中的）条目
+    """
+    result = []
+    for item in file_list or ():
+        if item.get('type') in VIDEO_TYPES:
+            entry = store.entry(os.path.join(item['path'], item['name']))
+            if _listed(entry, item.get('modified'), item.get('size')):
+                item = dict(item, video=entry[2])
+        result.append(item)
+    return result
+
+
+def annotate_columns(columns):
+    """
+    annotate 的列式版本：有缓存元数据的视频行在 video 列中给出，其余为 None
+    用列中的修改时间（秒）与字节数判断记录是否过期，不 stat 文件
+    """
+    if not columns:
+        return columns
+    video = [None] * len(columns)
+    found = False
+    for row in columns.rows(VIDEO_TYPES):
+        entry = store.entry(columns.full_path(row))
+        if entry is not None and entry[0] // 1_000_000_000 == columns.mtime[row] and entry[1] == columns.size[row]:
+            video[row] = entry[2]
+            found = True
+    return columns.replace(video=video) if found else columns
+
+
+_thumbnail_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'thumbnail')
+store = MetadataStore(os.path.join(_thumbnail_dir, 'video_meta.jsonl'),
+                      legacy_file=os.path.join(_thumbnail_dir, 'video_meta.json'))
+info = store.info
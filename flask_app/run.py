@@ -1,14 +1,25 @@
+import os
 from flask import Flask, render_template
+import config
 from blueprints.file_utils import bp as file_utils_bp
 from blueprints.main_route import bp as main_route_bp
+from blueprints.metrics_route import bp as metrics_route_bp
+from modules import search_index, folder_size, metrics
 
 app = Flask(__name__)
 app.register_blueprint(file_utils_bp)
 app.register_blueprint(main_route_bp)
+app.register_blueprint(metrics_route_bp)
+metrics.init_app(app)
 
 @app.route('/')
 def home():
     return render_template('window.html')
 
 if __name__ == '__main__':
+    # debug 模式下只在重载器的子进程中启动索引服务
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        search_index.start(config.SEARCH_INDEX_ROOTS, config.SEARCH_INDEX_BACKEND,
+                           config.SEARCH_INDEX_DIR, config.SEARCH_INDEX_CHECKPOINT)
+        folder_size.start(config.FOLDER_SIZE_ROOTS)
     app.run(debug= True, host= '0.0.0.0')
\ No newline at end of file
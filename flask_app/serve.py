@@ -0,0 +1,167 @@
+"""
+生产环境入口：预先 fork 的多进程 WSGI 服务，各进程共享同一个监听套接字
+
+  主进程        绑定端口并监管子进程，自身不启动任何线程（fork 始终安全），子进程退出后重新启动
+  属主进程      唯一运行 watchdog 与后台扫描的进程，不处理请求：
+                  - 建立索引，变化后按 SERVE_PUBLISH_INTERVAL 发布快照（整体重写，大索引按写入耗时
+                    自动延长间隔，见 search_index.CHECKPOINT_BACKOFF）
+                  - 统计递归目录大小，有变化时发布到 FOLDER_SIZE_FILE
+                  - 每 THUMBNAIL_TRIM_INTERVAL 秒把共享的缩略图目录淘汰到预算以内
+  工作进程 × N  多线程处理请求；以只读 mmap 映射索引快照查询，多个进程共享同一份页缓存，
+                快照被替换后重新映射，内存不随工作进程数增加；目录大小读取属主进程发布的文件
+
+跨进程的其他状态：
+  - 缩略图目录共享（查询以磁盘为准，只有属主进程淘汰），解码进程池在工作进程间平分；
+    预热队列与进行中任务的去重仍在每个工作进程中，同一缩略图偶尔会被两个进程同时生成（原子替换，只浪费一次解码）
+  - 视频元数据日志（video_meta.jsonl）只追加，各工作进程同时追加并读取其他进程追加的记录
+  - 目录缓存在每个工作进程中各有一份，各自以 watchdog 监控缓存的目录；目录数上限按工作进程数平分，
+    inotify 监控总数仍不超过 dir_cache.MAX_DIRS（每个工作进程另占一个 inotify 实例）
+  - /metrics 在每个工作进程中各有一份，只反映应答的工作进程
+  - 建立索引与生成缩略图的进程池以 forkserver 启动（属主与工作进程都已有其他线程，不能直接 fork）
+多进程模式只支持 ngram 索引后端与持久化索引目录，否则工作进程的搜索退回遍历
+
+用法: python serve.py [--host 0.0.0.0] [--port 5000] [--workers 4]
+不支持 fork 的平台（Windows）退回单进程多线程
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import argparse
+import threading
+from werkzeug.serving import make_server
+import config
+from run import app
+from modules import search_index, folder_size, file_jobs, thumbnail_service, thumbnail_store, dir_cache
+
+OWNER, WORKER = '属主', '工作'
+
+
+def _stop(signum, frame):
+    sys.exit(0)
+
+
+def run_owner(server):
+    server.socket.close()
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    if shared_index():
+        search_index.start(config.SEARCH_INDEX_ROOTS, 'ngram', config.SEARCH_INDEX_DIR, config.SERVE_PUBLISH_INTERVAL)
+    folder_size.start(config.FOLDER_SIZE_ROOTS)
+    trimmed = None
+    while not stopped.wait(config.SERVE_PUBLISH_INTERVAL):
+        try:
+            folder_size.publish(config.FOLDER_SIZE_FILE)
+        except OSError as e:
+            print(f"发布目录大小失败:{e}")
+        if trimmed is None or time.monotonic() - trimmed >= config.THUMBNAIL_TRIM_INTERVAL:
+            thumbnail_store.store.trim()
+            trimmed = time.monotonic()
+    search_index.stop()     # 写入最后的快照
+    folder_size.stop()
+
+
+def run_worker(server, workers):
+    signal.signal(signal.SIGTERM, _stop)
+    if shared_index():
+        search_index.attach(config.SEARCH_INDEX_ROOTS, config.SEARCH_INDEX_DIR)
+    folder_size.attach(config.FOLDER_SIZE_ROOTS, config.FOLDER_SIZE_FILE)
+    thumbnail_service.share(workers)
+    dir_cache.share(workers)
+    file_jobs.share(config.JOB_SHARE_DIR)
+    try:
+        server.serve_forever()
+    finally:
+        # 工作进程以 os._exit 退出，不会执行 atexit，需自行结束解码进程，否则它们与 forkserver 一直残留
+        thumbnail_service.shutdown(wait=True)
+
+
+def shared_index():
+    return bool(config.SEARCH_INDEX_ROOTS) and config.SEARCH_INDEX_BACKEND == 'ngram' and bool(config.SEARCH_INDEX_DIR)
+
+
+def serve_single(host, port):
+    search_index.start(config.SEARCH_INDEX_ROOTS, config.SEARCH_INDEX_BACKEND,
+                       config.SEARCH_INDEX_DIR, config.SEARCH_INDEX_CHECKPOINT)
+    folder_size.start(config.FOLDER_SIZE_ROOTS)
+    app.run(host=host, port=port, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StorageBox 多进程服务")
+    parser.add_argument('--host', default=config.SERVE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVE_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVE_WORKERS)
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("当前平台不支持 fork，以单进程运行")
+        serve_single(args.host, args.port)
+        return
+    if config.SEARCH_INDEX_ROOTS and not shared_index():
+        print("多进程模式需要 ngram 索引后端与索引目录（STORAGEBOX_INDEX_DIR），搜索将退回遍历")
+
+    # 上次运行留下的任务状态（其进程都已退出）与目录大小（可能已过期，由属主进程重新统计）
+    shutil.rmtree(config.JOB_SHARE_DIR, ignore_errors=True)
+    if os.path.exists(config.FOLDER_SIZE_FILE):
+        os.remove(config.FOLDER_SIZE_FILE)
+    if shared_index():
+        os.makedirs(config.SEARCH_INDEX_DIR, exist_ok=True)
+    server = make_server(args.host, args.port, app, threaded=True)
+    children = {}   # {进程号: 角色}
+
+    def spawn(role):
+        pid = os.fork()
+        if pid:
+            children[pid] = role
+            return
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)    # Ctrl+C 由主进程统一处理
+            if role == OWNER:
+                run_owner(server)
+            else:
+                run_worker(server, args.workers)
+        except SystemExit:
+            pass
+        except BaseException as e:
+            print(f"{role}进程{os.getpid()}异常退出:{e}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    spawn(OWNER)
+    for _ in range(args.workers):
+        spawn(WORKER)
+    print(f"StorageBox 运行于 http://{args.host}:{args.port}，{args.workers} 个工作进程")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        role = children.pop(pid, None)
+        if role is not None and not stopping:
+            print(f"{role}进程{pid}退出（{os.waitstatus_to_exitcode(status)}），重新启动")
+            time.sleep(1)   # 避免启动即崩溃时频繁 fork
+            spawn(role)
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
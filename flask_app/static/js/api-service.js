@@ -1,7 +1,10 @@
+import { decode } from './msgpack.js';
+
 export async function APIService(path, body = null, method = 'GET') {
     const options = {
         method,
-        headers: { 'Content-Type': 'application/json' }
+        // 列式列表（format: 'columns'）在服务端支持时以 MessagePack 返回，其余接口总是 JSON
+        headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-msgpack, application/json;q=0.9' }
     };
     
     if (body) {
@@ -12,11 +15,42 @@ export async function APIService(path, body = null, method = 'GET') {
     return handleResponse(response);
 }
 
+// 读取 NDJSON 流式响应，每解析出一行调用一次 onMessage
+export async function APIStream(path, body, onMessage, signal = null) {
+    const response = await fetch(path, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body),
+        signal
+    });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (line) onMessage(JSON.parse(line));
+        }
+    }
+    if (buffer) onMessage(JSON.parse(buffer));
+}
+
 async function handleResponse(response) {
     // 处理json响应
     if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
     }
+    if ((response.headers.get('Content-Type') || '').startsWith('application/x-msgpack')) {
+        return decode(new Uint8Array(await response.arrayBuffer()));
+    }
     return response.json();
 }
 
@@ -30,7 +64,12 @@ body: clipboardState = {
     destinationPath: null,
     items: [] // fileList
 },
-returns: fileList = [
+returns: {
+    job: { id, kind, state: 'queued/running/done/failed/cancelled', src, dst,
+           bytes_total, bytes_done, files_total, files_done, throughput, elapsed, errors },
+    fileList
+}
+fileList = [
     { 
         name: 'file1.txt',
         modified: '', 
@@ -72,12 +111,47 @@ body: {
     path: 'path', 
     fileList: 'fileList'
 }
-returns: fileList;
+returns: { job, fileList };
+
+path: '/jobs/<id>',
+method: 'GET',
+returns: job;
+
+path: '/jobs/<id>/cancel', '/jobs/<id>/resume',
+method: 'POST',
+returns: { ok: true/false };
 
 path: '/get_files',
 method: 'POST',
-body: { path : 'path/to/directory'}
+body: { path : 'path/to/directory', format: 'columns' }   // format 可选
 returns: fileList;
+    format 为 'columns' 时返回列式列表（按 Accept 为 JSON 或 MessagePack，按 Accept-Encoding 压缩），
+    由 file-list.js 的 fromColumns 还原为 fileList：
+    {
+        format: 'columns', count: 2, sep: '/',
+        paths: ['path/to/directory'],        // 去重的所在目录表
+        types: ['文件夹', 'jpg'],             // 去重的类型表
+        name: ['dir', 'a.jpg'],
+        path: [0, 0],                        // paths 的下标
+        type: [0, 1],                        // types 的下标
+        size: [-1, 1234],                    // 字节，文件夹为 -1（已统计时为递归大小）
+        mtime: [1700000000, 1700000000],     // Unix 秒
+        files: [12, null],                   // 可选：文件夹的递归文件数
+        video: [null, null]                  // 可选：已缓存的视频信息
+    }
+
+path: '/list',
+method: 'POST',
+body: {
+    path: 'path/to/directory',
+    sort: 'name',        // 可选：'name'（自然排序）/'size'/'mtime'/'type'，文件夹总在前
+    order: 'asc',        // 可选：'asc'/'desc'
+    offset: 0,           // 可选
+    limit: 500           // 可选，最大 5000
+}
+returns: 列式列表的一页（同 /get_files 的 format: 'columns'），另附
+    { path, total: 总条目数, offset, version, sort, order }
+    version 在目录重新读取后改变，之前加载的页应丢弃
 
 path: '/parent_path',
 method: 'POST',
@@ -87,13 +161,28 @@ returns: {
     fileList: 'fileList'
 }
 
-path: '/search_files',
+path: '/search',
 method: 'POST',
 body: { 
     path: 'path/to/directory', 
-    search_term: '123.txt'
+    search_term: '123.txt',   // 可带属性过滤条件：ext:mp4 type:video size:>1G modified:2025-*（各条件取交集）
+                              // 空格分隔的各词不区分大小写、全部包含于文件名；含 * ? [ 时整体按通配符匹配
+    format: 'columns'    // 可选，同 /get_files
 }
-returns: fileList;
+returns: fileList;   // 全部匹配（不截断），按相关度排序；需要限制数量时用 /search_stream
+
+path: '/search_stream',
+method: 'POST',
+body: {
+    path: 'path/to/directory',
+    search_term: '123.txt',   // 同 /search
+    client_id: 'id',     // 同一 client_id 的新搜索会停止旧的搜索
+    limit: 10000         // 可选
+}
+returns: NDJSON, 每行一个:
+    { files: fileList }
+    { files: [], scanned: 120 }
+    { done: true, count: 1234, reason: 'done/limit/timeout/cancelled', first_result_ms: 12.3, elapsed_ms: 456.7 }
 
 ...
 
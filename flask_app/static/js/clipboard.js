@@ -2,6 +2,7 @@ import { APIService } from './api-service.js';
 import { updateView } from './file-list.js';
 import { getCurrentPath } from './navigation.js';
 import { getSelectedItemsData, hasSelectedItems, clearAllSelections } from './selection.js';
+import { trackJob } from './jobs.js';
 
 // ================= 剪切板与相关按键逻辑 =============== //
 export {
@@ -91,7 +92,9 @@ function handlePaste() {
 
     APIService('/paste', clipboardState, 'POST')
     .then(response => {
-        updateView(response);
+        // 复制/移动在后台任务中执行，未结束的任务在状态栏显示进度
+        updateView(response.fileList);
+        trackJob(response.job);
         resetClipboardState();
         clearAllSelections();
     })
@@ -4,5 +4,7 @@ export const config = {
     AUDIO_TYPES: ['mp3', 'wav', 'ogg', 'aac', 'flac'],
     DOCUMENT_TYPES: ['pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt'],
     ARCHIVE_TYPES: ['zip', 'rar', '7z', 'tar', 'gz'],
-    CODE_TYPES: ['js', 'html', 'css', 'py', 'java', 'cpp', 'c', 'php', 'json', 'xml']
+    CODE_TYPES: ['js', 'html', 'css', 'py', 'java', 'cpp', 'c', 'php', 'json', 'xml'],
+    THUMBNAIL_SIZES: [96, 240, 480], // 服务端生成的缩略图尺寸（最长边像素）
+    LIST_FORMAT: 'columns'           // 列表与搜索结果的响应格式，'columns' 为列式压缩格式，'' 为逐条 JSON
 }
\ No newline at end of file
@@ -1,4 +1,5 @@
 import { config } from "./config.js";
+import { APIService } from "./api-service.js";
 import { clearAllSelections, toggleItemSelection, isFileSelected, resetSelectBtn } from "./selection.js";
 import { getCurrentViewMode } from "./view-mode.js";
 import { openFile } from "./open-file.js";
@@ -6,10 +7,15 @@ import { openFile } from "./open-file.js";
 export {
     initFileList,
     updateView,
+    appendToView,
     toggleView,
     updateViewToItem,
     updateViewToBottom,
-    getFileList
+    getFileList,
+    formatVideoInfo,
+    fromColumns,    // 列式列表（format: 'columns'）还原为条目数组
+    listDirectory,  // 按当前排序请求目录列表的一页（/list），结果交给 updateView
+    loadAllPages    // 加载分页列表中尚未加载的全部条目
 }
 
 let fileList = [];
@@ -22,6 +28,14 @@ const SELECTORS = {
     CONTAINER: '.content-areas'
 }
 
+// 表头各列对应的服务端排序字段
+const SORT_COLUMNS = {
+    'header-name': 'name',
+    'header-modified': 'mtime',
+    'header-type': 'type',
+    'header-size': 'size'
+}
+
 const domElements = {
     toTopBtn: null,
     toBottomBtn: null,
@@ -47,6 +61,7 @@ function cacheDOMElements() {
 function setupEventListeners() {
     domElements.toTopBtn.addEventListener('click', updateViewToTop);
     domElements.toBottomBtn.addEventListener('click', updateViewToBottom);
+    domElements.header.addEventListener('click', handleHeaderClick);
 
     domElements.content.addEventListener('click', event => {
         const fileItem = event.target.closest('.file-item');
@@ -101,8 +116,18 @@ function initVirtualScroller() {
 }
 
 function updateView(newFileList) {
-    fileList = newFileList;
+    if (newFileList && newFileList.total !== undefined) {
+        // 分页列表：先占好总长度，其余页在滚动到时加载
+        fileList = new Array(newFileList.total);
+        paging = { path: newFileList.path, version: newFileList.version, requested: new Set([0]) };
+        fillPage(newFileList);
+    } else {
+        fileList = Array.isArray(newFileList) ? newFileList : fromColumns(newFileList);
+        paging = null;
+    }
+    updateSortIndicator();
     nodePool.length = 0;
+    clearThumbnailCache();
     currentViewMode = getCurrentViewMode();
 
     clearAllSelections();
@@ -119,6 +144,63 @@ function updateView(newFileList) {
     }
 }
 
+const SIZE_UNITS = ['B', 'KB', 'MB', 'GB', 'TB'];
+
+// 与服务端 file_dir.convert_size 相同的格式
+function formatSize(size) {
+    let unit = 0;
+    while (size >= 1024 && unit < SIZE_UNITS.length - 1) {
+        size /= 1024;
+        unit++;
+    }
+    if (unit === 0) return `${Math.trunc(size)}B`;
+    return `${size.toFixed(size < 10 ? 2 : 1)}${SIZE_UNITS[unit]}`;
+}
+
+const pad = n => String(n).padStart(2, '0');
+
+// 'YYYY-MM-DD HH:MM'（本地时间）
+function formatTime(seconds) {
+    const d = new Date(seconds * 1000);
+    return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())} ${pad(d.getHours())}:${pad(d.getMinutes())}`;
+}
+
+function fromColumns(data) {
+    if (!data || data.format !== 'columns') return [];
+    const items = new Array(data.count);
+    for (let i = 0; i < data.count; i++) {
+        const path = data.paths[data.path[i]];
+        const type = data.types[data.type[i]];
+        const name = data.name[i];
+        const size = data.size[i];
+        const item = {
+            name,
+            modified: formatTime(data.mtime[i]),
+            type,
+            size: size < 0 ? '-' : formatSize(size),
+            path,
+            icon: config.IMAGE_TYPES.includes(type)
+                ? (path.endsWith(data.sep) ? path + name : path + data.sep + name)
+                : ''
+        };
+        if (data.files && data.files[i] != null) item.files = data.files[i];
+        if (data.video && data.video[i]) item.video = data.video[i];
+        items[i] = item;
+    }
+    return items;
+}
+
+// 追加条目（流式搜索结果），不重置滚动位置
+function appendToView(items) {
+    if (!items.length) return;
+    if (!fileList.length) {
+        updateView(items);
+        return;
+    }
+    fileList.push(...items);
+    _render();
+}
+
 function toggleView() {
     let itemId, scrollTop = domElements.container.scrollTop;
     nodePool.length = 0;
@@ -218,6 +300,11 @@ function _render(scrollTop = domElements.container.scrollTop) {
     // 复用或创建节点
     for (let i = startIdx; i <= endIdx; i++) {
         if (i >= fileList.length) continue;
+        // 所在页尚未加载：留空，页加载后重新渲染
+        if (fileList[i] === undefined) {
+            requestPage(i);
+            continue;
+        }
 
         let node = findNodeInPool(i);
         
@@ -288,6 +375,22 @@ function recycleInactiveNodes() {
     activeNodes.clear();
 }
 
+// 视频元数据 {duration, width, height, fps, codec} 格式化为 "01:23:45 · 1920×1080 · h264 · 30fps"
+function formatVideoInfo(meta) {
+    const parts = [];
+    if (meta.duration) {
+        const total = Math.round(meta.duration);
+        const h = Math.floor(total / 3600);
+        const m = String(Math.floor(total % 3600 / 60)).padStart(2, '0');
+        const s = String(total % 60).padStart(2, '0');
+        parts.push(h ? `${h}:${m}:${s}` : `${m}:${s}`);
+    }
+    if (meta.width && meta.height) parts.push(`${meta.width}×${meta.height}`);
+    if (meta.codec) parts.push(meta.codec);
+    if (meta.fps) parts.push(`${Math.round(meta.fps * 100) / 100}fps`);
+    return parts.join(' · ');
+}
+
 function renderItem(itemId) {
     let item = fileList[itemId];
     let div = document.createElement('div');
@@ -309,6 +412,15 @@ function renderItem(itemId) {
         <div class="file-size">${item.size}</div>
     `;
     
+    // 已探测过的视频在悬停提示中显示时长、分辨率等
+    if (item.video) {
+        div.title = formatVideoInfo(item.video);
+    }
+    // 已统计递归大小的文件夹显示其中的文件总数
+    if (item.files !== undefined) {
+        div.title = `${item.files} 个文件`;
+    }
+
     // 设置样式
     div.style.height = '100%';
 
@@ -327,12 +439,232 @@ function updateHeaderVisibility() {
         : '';
 }
 
+// ================ 分页与排序 ================ //
+
+const PAGE_SIZE = 500;          // 与服务端 PAGE_SIZE 相同
+const MAX_PAGE_SIZE = 5000;     // 与服务端 MAX_PAGE_SIZE 相同
+const PAGE_LOAD_DELAY = 50;     // 快速滚动时合并页请求（毫秒）
+let sortState = { sort: 'name', order: 'asc' };
+let paging = null;              // 当前为分页列表时 {path, version, requested: 已请求的页号}
+let wantedPages = new Set();
+let pageTimer = null;
+
+function listDirectory(path, offset = 0, limit = PAGE_SIZE) {
+    return APIService('/list', { path, ...sortState, offset, limit }, 'POST');
+}
+
+function fillPage(page) {
+    fromColumns(page).forEach((item, i) => fileList[page.offset + i] = item);
+}
+
+// 目录在两次请求之间变化（version 不同）：丢弃已加载的页，保持滚动位置重新渲染
+function resetPages(page) {
+    fileList = new Array(page.total);
+    paging = { path: page.path, version: page.version, requested: new Set([Math.floor(page.offset / PAGE_SIZE)]) };
+    fillPage(page);
+    nodePool.length = 0;
+    clearAllSelections();
+    domElements.content.innerHTML = '';
+    _render();
+}
+
+function requestPage(index) {
+    const page = Math.floor(index / PAGE_SIZE);
+    if (!paging || paging.requested.has(page)) return;
+    wantedPages.add(page);
+    if (!pageTimer) pageTimer = setTimeout(flushPages, PAGE_LOAD_DELAY);
+}
+
+function flushPages() {
+    pageTimer = null;
+    const state = paging;
+    const pages = wantedPages;
+    wantedPages = new Set();
+    if (!state) return;
+
+    for (const page of pages) {
+        state.requested.add(page);
+        listDirectory(state.path, page * PAGE_SIZE)
+            .then(response => {
+                if (state !== paging) return;   // 已切换目录或排序
+                if (response.version !== state.version) {
+                    resetPages(response);
+                    return;
+                }
+                fillPage(response);
+                _render();
+            })
+            .catch(error => {
+                state.requested.delete(page);
+                console.error('加载列表分页失败:', error);
+            });
+    }
+}
+
+async function loadAllPages() {
+    const state = paging;
+    if (!state) return;
+    const requests = [];
+    for (let offset = 0; offset < fileList.length; offset += MAX_PAGE_SIZE) {
+        const end = Math.min(offset + MAX_PAGE_SIZE, fileList.length);
+        let complete = true;
+        for (let i = offset; i < end; i++) {
+            if (fileList[i] === undefined) { complete = false; break; }
+        }
+        if (!complete) requests.push(listDirectory(state.path, offset, MAX_PAGE_SIZE));
+    }
+    for (const response of await Promise.all(requests)) {
+        if (state !== paging) return;
+        if (response.version !== state.version) {
+            resetPages(response);
+            return;
+        }
+        fillPage(response);
+    }
+    _render();
+}
+
+// 点击表头：同一列切换升降序，换列时升序；只对分页的目录列表生效（搜索结果不在服务端排序）
+function handleHeaderClick(event) {
+    const column = Object.keys(SORT_COLUMNS).find(name => event.target.closest(`.${name}`));
+    if (!column || !paging) return;
+    const sort = SORT_COLUMNS[column];
+    sortState = {
+        sort,
+        order: sortState.sort === sort && sortState.order === 'asc' ? 'desc' : 'asc'
+    };
+    listDirectory(paging.path)
+        .then(updateView)
+        .catch(error => console.error('排序失败:', error));
+}
+
+function updateSortIndicator() {
+    for (const [column, sort] of Object.entries(SORT_COLUMNS)) {
+        const element = domElements.header.querySelector(`.${column}`);
+        if (!element) continue;
+        element.classList.toggle('sorted-asc', !!paging && sortState.sort === sort && sortState.order === 'asc');
+        element.classList.toggle('sorted-desc', !!paging && sortState.sort === sort && sortState.order === 'desc');
+    }
+}
+
 // =================== 其他 ==================== //
 
 function getFileList() {
     return fileList;
 }
 
+// 按当前视图中条目的显示尺寸（含设备像素比）选择缩略图尺寸
+function thumbnailSize() {
+    const numColumns = Math.max(2, Math.floor(viewportWidth / 256));
+    const needed = viewportWidth / numColumns * (window.devicePixelRatio || 1);
+    const sizes = config.THUMBNAIL_SIZES;
+    return sizes.find(s => s >= needed) || sizes[sizes.length - 1];
+}
+
+function thumbnailUrl(filePath, size = thumbnailSize()) {
+    return `/get_thumbnail/${encodeURIComponent(filePath)}?size=${size}`;
+}
+
+// ================ 批量缩略图 ================ //
+
+const THUMBNAIL_BATCH_SIZE = 100;
+const THUMBNAIL_RETRY_DELAY = 500;  // 未生成的缩略图隔多久再批量请求（毫秒）
+const THUMBNAIL_MAX_RETRIES = 6;    // 超过后改为单独请求（服务端等待生成）
+let thumbnailCache = new Map();     // `${size}|${path}` → Blob URL
+let thumbnailRetries = new Map();   // `${size}|${path}` → 已重试次数
+let pendingThumbnails = new Map();  // `${size}|${path}` → 等待该缩略图的 img 元素
+let thumbnailBatchTimer = null;
+
+// 先显示占位图标，同一帧内请求的缩略图合并为一次 /get_thumbnails 请求
+function requestThumbnail(element, filePath, placeholder) {
+    const size = thumbnailSize();
+    const key = `${size}|${filePath}`;
+    const cached = thumbnailCache.get(key);
+    if (cached) {
+        element.src = cached;
+        return;
+    }
+    element.src = placeholder;
+    if (!pendingThumbnails.has(key)) pendingThumbnails.set(key, []);
+    pendingThumbnails.get(key).push(element);
+    if (!thumbnailBatchTimer) thumbnailBatchTimer = setTimeout(flushThumbnailBatch, 16);
+}
+
+function flushThumbnailBatch() {
+    thumbnailBatchTimer = null;
+    const batch = pendingThumbnails;
+    pendingThumbnails = new Map();
+
+    // 按尺寸分组，每组按 THUMBNAIL_BATCH_SIZE 分批
+    const groups = new Map();
+    for (const key of batch.keys()) {
+        const sep = key.indexOf('|');
+        const size = key.slice(0, sep);
+        if (!groups.has(size)) groups.set(size, []);
+        groups.get(size).push(key.slice(sep + 1));
+    }
+    for (const [size, paths] of groups) {
+        for (let i = 0; i < paths.length; i += THUMBNAIL_BATCH_SIZE) {
+            fetchThumbnailBatch(paths.slice(i, i + THUMBNAIL_BATCH_SIZE), size, batch);
+        }
+    }
+}
+
+async function fetchThumbnailBatch(paths, size, batch) {
+    const cache = thumbnailCache;
+    const elementsOf = path => batch.get(`${size}|${path}`) || [];
+    try {
+        const response = await fetch('/get_thumbnails', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ paths, size: Number(size) })
+        });
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+
+        // 响应：uint32 头部长度 + JSON 头部 + 缩略图数据
+        const buffer = await response.arrayBuffer();
+        const headerLength = new DataView(buffer).getUint32(0, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+        const base = 4 + headerLength;
+        // 目录已切换时不再写入缓存
+        const current = cache === thumbnailCache;
+
+        for (const item of header.items) {
+            const blob = new Blob([new Uint8Array(buffer, base + item.offset, item.length)], { type: header.type });
+            const url = URL.createObjectURL(blob);
+            if (current) cache.set(`${size}|${item.path}`, url);
+            elementsOf(item.path).forEach(element => element.src = url);
+        }
+        // 尚未生成的缩略图（服务端已优先排队生成）：稍后随下一批再取，多次未就绪再单独请求
+        for (const path of header.missing) {
+            const key = `${size}|${path}`;
+            const retries = (thumbnailRetries.get(key) || 0) + 1;
+            if (!current) continue;
+            if (retries > THUMBNAIL_MAX_RETRIES) {
+                elementsOf(path).forEach(element => element.src = thumbnailUrl(path, size));
+                continue;
+            }
+            thumbnailRetries.set(key, retries);
+            setTimeout(() => {
+                if (cache !== thumbnailCache) return;
+                // 已滚出视图的节点不再请求
+                elementsOf(path).filter(element => element.isConnected)
+                    .forEach(element => requestThumbnail(element, path, element.src));
+            }, THUMBNAIL_RETRY_DELAY);
+        }
+    } catch (error) {
+        console.error('批量获取缩略图失败:', error);
+        paths.forEach(path => elementsOf(path).forEach(element => element.src = thumbnailUrl(path, size)));
+    }
+}
+
+function clearThumbnailCache() {
+    thumbnailCache.forEach(url => URL.revokeObjectURL(url));
+    thumbnailCache = new Map();
+    thumbnailRetries = new Map();
+    pendingThumbnails = new Map();
+}
+
 function setIcon(element, item) {
     const type = item.type.toLowerCase(); // 转换为小写方便比较
     
@@ -346,13 +678,13 @@ function setIcon(element, item) {
         element.src = '/static/img/disk.svg';
     } else if (config.IMAGE_TYPES.includes(cleanType)) {
         if (currentViewMode === 'max') {
-            element.src = `/get_thumbnail/${encodeURIComponent(item.icon)}`;
+            requestThumbnail(element, item.icon, '/static/img/image.svg');
         } else {
             element.src = '/static/img/image.svg';
         }
     } else if (config.VIDEO_TYPES.includes(cleanType)) {
         if (currentViewMode === 'max') {
-            element.src = `/get_thumbnail/${encodeURIComponent(normalizeSlashes(item.path + '\\' + item.name))}`;
+            requestThumbnail(element, normalizeSlashes(item.path + '\\' + item.name), '/static/img/video.svg');
         } else {
             element.src = '/static/img/video.svg';
         }
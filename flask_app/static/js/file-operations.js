@@ -2,6 +2,7 @@ import { APIService } from "./api-service.js";
 import { updateView, updateViewToItem, updateViewToBottom } from "./file-list.js";
 import { getSelectedItemsData, getSelectedItemsId, hasSelectedItems } from "./selection.js";
 import { getCurrentPath } from "./navigation.js";
+import { trackJob } from "./jobs.js";
 
 // =============== 新建、重命名、删除文件/文件夹 ============== //
 
@@ -183,7 +184,10 @@ function handleDelete() {
     };
     
     APIService('/delete', deletePayload, 'POST')
-        .then(handleOperationSuccess)
+        .then(response => {
+            trackJob(response.job);
+            return handleOperationSuccess(response.fileList);
+        })
         .catch(handleOperationError.bind(null, '删除'));
 }
 
@@ -0,0 +1,126 @@
+import { APIService } from './api-service.js';
+import { updateView, listDirectory } from './file-list.js';
+import { getCurrentPath } from './navigation.js';
+
+// ================= 后台文件任务（复制/移动/删除）进度 =============== //
+export {
+    trackJob    // 在状态栏跟踪任务直到结束
+};
+
+const POLL_INTERVAL = 500;
+const DISMISS_AFTER = 30000;   // 取消/失败的任务在状态栏保留的时间（毫秒）
+const KIND_TEXT = { copy: '复制', move: '移动', delete: '删除' };
+const FINISHED = ['done', 'failed', 'cancelled'];
+
+// 正在跟踪的任务 {id: job}
+const trackedJobs = new Map();
+let pollTimer = null;
+
+/**
+ * 跟踪任务：在状态栏显示进度，点击可取消；取消或失败后点击可续传
+ * 任务结束时若当前目录是其源或目标目录则刷新列表
+ * @param {Object} job - /paste、/delete 返回的任务状态（返回的列表已反映结束的任务）
+ */
+function trackJob(job) {
+    if (job.state === 'done') return;
+    trackedJobs.set(job.id, job);
+    if (FINISHED.includes(job.state)) {
+        setTimeout(() => dismiss(job.id), DISMISS_AFTER);
+    } else {
+        schedulePoll();
+    }
+    render();
+}
+
+function schedulePoll() {
+    if (!pollTimer) {
+        pollTimer = setTimeout(poll, POLL_INTERVAL);
+    }
+}
+
+async function poll() {
+    pollTimer = null;
+    for (const [id, job] of trackedJobs) {
+        if (FINISHED.includes(job.state)) continue;
+        let current;
+        try {
+            current = await APIService(`/jobs/${id}`);
+        } catch (error) {
+            console.error('查询任务失败:', error);
+            trackedJobs.delete(id);
+            continue;
+        }
+        trackedJobs.set(id, current);
+        if (FINISHED.includes(current.state)) {
+            refreshView(current);
+            if (current.state === 'done') trackedJobs.delete(id);
+            else setTimeout(() => dismiss(id), DISMISS_AFTER);
+        }
+    }
+    render();
+    if ([...trackedJobs.values()].some(job => !FINISHED.includes(job.state))) {
+        schedulePoll();
+    }
+}
+
+function refreshView(job) {
+    const path = getCurrentPath();
+    if (path === job.src || path === job.dst) {
+        listDirectory(path)
+            .then(updateView)
+            .catch(error => console.error('刷新列表失败:', error));
+    }
+}
+
+function render() {
+    const container = document.querySelector('.status-job');
+    if (!container) return;
+    container.replaceChildren(...[...trackedJobs.values()].map(job => {
+        const span = document.createElement('span');
+        span.textContent = describe(job);
+        if (FINISHED.includes(job.state)) {
+            span.title = job.errors.map(e => `${e.path}: ${e.error}`).join('\n') || '点击继续';
+            span.onclick = () => resumeJob(job.id);
+        } else {
+            span.title = '点击取消';
+            span.onclick = () => APIService(`/jobs/${job.id}/cancel`, {}, 'POST');
+        }
+        return span;
+    }));
+}
+
+function dismiss(id) {
+    const job = trackedJobs.get(id);
+    if (job && FINISHED.includes(job.state)) {
+        trackedJobs.delete(id);
+        render();
+    }
+}
+
+async function resumeJob(id) {
+    const response = await APIService(`/jobs/${id}/resume`, {}, 'POST');
+    if (response.ok && trackedJobs.has(id)) {
+        trackedJobs.get(id).state = 'queued';
+        render();
+        schedulePoll();
+    }
+}
+
+function describe(job) {
+    const kind = KIND_TEXT[job.kind] || job.kind;
+    if (job.state === 'cancelled') return `${kind}已取消（点击继续）`;
+    if (job.state === 'failed') return `${kind}失败 ${job.errors.length} 项（点击重试）`;
+    const percent = job.bytes_total ? Math.floor(job.bytes_done * 100 / job.bytes_total) : 0;
+    const speed = job.throughput ? ` ${formatBytes(job.throughput)}/s` : '';
+    return `${kind}中 ${percent}% (${job.files_done}/${job.files_total})${speed}`;
+}
+
+function formatBytes(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let i = 0;
+    while (bytes >= 1024 && i < units.length - 1) {
+        bytes /= 1024;
+        i++;
+    }
+    return `${bytes.toFixed(i ? 1 : 0)} ${units[i]}`;
+}
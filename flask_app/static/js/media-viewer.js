@@ -1,6 +1,7 @@
 import { config } from './config.js';
 import { toggleItemSelection, getSelectedItemsId } from './selection.js';
-import { getFileList, updateViewToItem } from './file-list.js';
+import { getFileList, updateViewToItem, formatVideoInfo } from './file-list.js';
+import { APIService } from './api-service.js';
 
 const domElements = {
     contentArea: null,
@@ -11,7 +12,8 @@ const domElements = {
     closeBtn: null,
     lastBtn: null,
     nextBtn: null,
-    loadingIndicator: null
+    loadingIndicator: null,
+    mediaInfo: null
 }
 
 const SELECTORS = {
@@ -23,7 +25,8 @@ const SELECTORS = {
     CLOSE_BTN: '.media-viewer .close',
     LAST_BTN: '.media-viewer .last',
     NEXT_BTN: '.media-viewer .next',
-    LOADING_INDICATOR: '.media-viewer .loading-indicator'
+    LOADING_INDICATOR: '.media-viewer .loading-indicator',
+    MEDIA_INFO: '.media-viewer .media-info'
 }
 
 let fileList = [];
@@ -84,6 +87,7 @@ function createMediaViewerElement(isVideo) {
         <div class="media-container" title="双击退出或按ESC键">
             ${mediaTag}
             <div class="loading-indicator">加载中...</div>
+            <div class="media-info"></div>
         </div>
         <button class="close" title="点击退出 (Esc)">X</button>
         <button class="last" title="点击上一个 (左箭头键)"></button>
@@ -102,6 +106,7 @@ function cacheDOMElements() {
     domElements.lastBtn = document.querySelector(SELECTORS.LAST_BTN);
     domElements.nextBtn = document.querySelector(SELECTORS.NEXT_BTN);
     domElements.loadingIndicator = document.querySelector(SELECTORS.LOADING_INDICATOR);
+    domElements.mediaInfo = document.querySelector(SELECTORS.MEDIA_INFO);
 }
 
 function setupEventListeners() {
@@ -152,6 +157,7 @@ function setMediaSource(filePath, fileName) {
         if (currentMediaType === 'image') {
             domElements.mediaElement.alt = fileName;
         }
+        showMediaInfo(filePath, fileName);
         
         // 确保媒体查看器获得焦点以接收键盘事件
         if (domElements.mediaViewer) {
@@ -163,6 +169,27 @@ function setMediaSource(filePath, fileName) {
     }
 }
 
+// 视频信息：列表中已带元数据时直接显示，否则向服务端查询（服务端有缓存）
+async function showMediaInfo(filePath, fileName) {
+    if (!domElements.mediaInfo) return;
+    domElements.mediaInfo.textContent = '';
+    if (currentMediaType !== 'video') return;
+
+    const mediaId = currentMediaId;
+    let meta = fileList[mediaId] && fileList[mediaId].name === fileName ? fileList[mediaId].video : null;
+    if (!meta) {
+        try {
+            meta = await APIService('/get_media_info/' + encodeURIComponent(`${filePath}\\${fileName}`));
+        } catch (error) {
+            return;
+        }
+    }
+    // 等待期间已切换到其他文件
+    if (mediaId === currentMediaId && domElements.mediaInfo) {
+        domElements.mediaInfo.textContent = formatVideoInfo(meta);
+    }
+}
+
 /* ===================== 事件处理 ========================= */
 
 function handleClickCloseBtn() {
@@ -0,0 +1,77 @@
+// ================= MessagePack 解码（列式列表响应，服务端安装 msgpack 时使用） =============== //
+export {
+    decode      // Uint8Array -> 对象
+};
+
+const textDecoder = new TextDecoder();
+
+function decode(bytes) {
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let pos = 0;
+
+    function str(length) {
+        const value = textDecoder.decode(bytes.subarray(pos, pos + length));
+        pos += length;
+        return value;
+    }
+
+    function array(length) {
+        const value = new Array(length);
+        for (let i = 0; i < length; i++) value[i] = read();
+        return value;
+    }
+
+    function map(length) {
+        const value = {};
+        for (let i = 0; i < length; i++) {
+            const key = read();
+            value[key] = read();
+        }
+        return value;
+    }
+
+    function bin(length) {
+        const value = bytes.slice(pos, pos + length);
+        pos += length;
+        return value;
+    }
+
+    function read() {
+        const byte = view.getUint8(pos++);
+        if (byte <= 0x7f) return byte;                          // positive fixint
+        if (byte >= 0xe0) return byte - 0x100;                  // negative fixint
+        if ((byte & 0xe0) === 0xa0) return str(byte & 0x1f);    // fixstr
+        if ((byte & 0xf0) === 0x90) return array(byte & 0x0f);  // fixarray
+        if ((byte & 0xf0) === 0x80) return map(byte & 0x0f);    // fixmap
+
+        let value;
+        switch (byte) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: value = view.getUint8(pos); pos += 1; return bin(value);
+            case 0xc5: value = view.getUint16(pos); pos += 2; return bin(value);
+            case 0xc6: value = view.getUint32(pos); pos += 4; return bin(value);
+            case 0xca: value = view.getFloat32(pos); pos += 4; return value;
+            case 0xcb: value = view.getFloat64(pos); pos += 8; return value;
+            case 0xcc: value = view.getUint8(pos); pos += 1; return value;
+            case 0xcd: value = view.getUint16(pos); pos += 2; return value;
+            case 0xce: value = view.getUint32(pos); pos += 4; return value;
+            case 0xcf: value = Number(view.getBigUint64(pos)); pos += 8; return value;
+            case 0xd0: value = view.getInt8(pos); pos += 1; return value;
+            case 0xd1: value = view.getInt16(pos); pos += 2; return value;
+            case 0xd2: value = view.getInt32(pos); pos += 4; return value;
+            case 0xd3: value = Number(view.getBigInt64(pos)); pos += 8; return value;
+            case 0xd9: value = view.getUint8(pos); pos += 1; return str(value);
+            case 0xda: value = view.getUint16(pos); pos += 2; return str(value);
+            case 0xdb: value = view.getUint32(pos); pos += 4; return str(value);
+            case 0xdc: value = view.getUint16(pos); pos += 2; return array(value);
+            case 0xdd: value = view.getUint32(pos); pos += 4; return array(value);
+            case 0xde: value = view.getUint16(pos); pos += 2; return map(value);
+            case 0xdf: value = view.getUint32(pos); pos += 4; return map(value);
+        }
+        throw new Error(`不支持的 MessagePack 类型: 0x${byte.toString(16)}`);
+    }
+
+    return read();
+}
@@ -1,5 +1,6 @@
-import { APIService } from "./api-service.js";
-import { updateView, getTopViewItemId } from "./file-list.js";
+import { APIService, APIStream } from "./api-service.js";
+import { config } from "./config.js";
+import { updateView, appendToView, getTopViewItemId, listDirectory } from "./file-list.js";
 
 // =============== 路径导航、搜索 =============== //
 
@@ -13,6 +14,10 @@ export {
 let viewHistory = [{path: '\\', search_term: '', topViewItemId: 0}];
 let currentPosition = 0;
 
+// 流式搜索：本页面的客户端ID，以及用于中止上一次搜索的控制器
+const searchClientId = Math.random().toString(36).slice(2);
+let searchController = null;
+
 const SELECTORS = {
     BACK_BTN: '.dir-navigation .back',
     FORWARD_BTN: '.dir-navigation .forward',
@@ -66,7 +71,7 @@ function handleBack() {
     const isSearch = viewHistory[currentPosition]['search_term'] != '';
 
     if (!isSearch) {
-        APIService('/get_files', { path: viewHistory[currentPosition]['path'] }, 'POST')
+        listDirectory(viewHistory[currentPosition]['path'])
         .then(response => {
             updateView(response, viewHistory[currentPosition]['topViewItemId']);
             setAddressPath(viewHistory[currentPosition]['path']);
@@ -80,7 +85,8 @@ function handleBack() {
         setAddressPath('搜索中...');    
         APIService('/search', {
             path: viewHistory[currentPosition]['path'], 
-            search_term: searchTerm
+            search_term: searchTerm,
+            format: config.LIST_FORMAT
         }, 'POST')
         .then(response => {
             updateView(response, viewHistory[currentPosition]['topViewItemId']);
@@ -104,7 +110,7 @@ function handleForward() {
     const isSearch = viewHistory[currentPosition]['search_term'] != '';
 
     if (!isSearch) {
-        APIService('/get_files', { path: viewHistory[currentPosition]['path'] }, 'POST')
+        listDirectory(viewHistory[currentPosition]['path'])
         .then(response => {
             updateView(response, viewHistory[currentPosition]['topViewItemId']);
             setAddressPath(viewHistory[currentPosition]['path']);
@@ -118,7 +124,8 @@ function handleForward() {
         setAddressPath('搜索中...');
         APIService('/search', {
             path: viewHistory[currentPosition]['path'], 
-            search_term: searchTerm
+            search_term: searchTerm,
+            format: config.LIST_FORMAT
         }, 'POST')
         .then(response => {
             updateView(response, viewHistory[currentPosition]['topViewItemId']);
@@ -201,7 +208,7 @@ function navigateToPath(dstPath) {
     if (dstPath) {
         viewHistory[currentPosition]['topViewItemId'] = getTopViewItemId();
     
-        APIService('/get_files', { path: dstPath }, 'POST')
+        listDirectory(dstPath)
         .then(response => {
             if (dstPath !== viewHistory[currentPosition]['path']) {
                 for (let i = viewHistory.length - 1; i > currentPosition; i--) {
@@ -227,27 +234,54 @@ function searchFile(searchTerm) {
 
     setAddressPath('搜索中...');
 
-    APIService('/search', {
-        path: viewHistory[currentPosition]['path'], 
-        search_term: searchTerm
-    }, 'POST')
-    .then(response => {
-        setAddressPath(`"${searchTerm}"搜索结果：`);
+    // 中止上一次未完成的搜索（服务端随之停止遍历）
+    if (searchController) searchController.abort();
+    const controller = new AbortController();
+    searchController = controller;
+
+    const searchPath = viewHistory[currentPosition]['path'];
+    let count = 0;
+    let started = false;
+    const startView = () => {
+        if (started) return;
+        started = true;
         for (let i = viewHistory.length - 1; i > currentPosition; i--) {
             viewHistory.pop();
         }
         viewHistory.push({
-            path: viewHistory[currentPosition]['path'],
+            path: searchPath,
             search_term: searchTerm,
             topViewItemId: 0
         });
         currentPosition++;
-        updateView(response);
-    })
+        updateView([]);
+    };
+
+    APIStream('/search_stream', {
+        path: searchPath,
+        search_term: searchTerm,
+        client_id: searchClientId
+    }, message => {
+        if (controller.signal.aborted) return;
+        // 有结果或搜索结束时才切换视图，进度行只更新地址栏
+        if (message.done || message.files.length) startView();
+        if (message.done) {
+            const suffix = message.reason === 'limit' || message.reason === 'timeout' ? '（结果未完整）' : '';
+            setAddressPath(`"${searchTerm}"搜索结果：${message.count}项${suffix}`);
+            return;
+        }
+        count += message.files.length;
+        appendToView(message.files);
+        setAddressPath(`"${searchTerm}"搜索中：${count}项...`);
+    }, controller.signal)
     .catch(err => {
-        setAddressPath(getCurrentPath());
+        if (err.name === 'AbortError') return;
+        if (!started) setAddressPath(getCurrentPath());
         alert('搜索失败');
         console.error('error:', err);
+    })
+    .finally(() => {
+        if (searchController === controller) searchController = null;
     });
 }
 
@@ -1,4 +1,4 @@
-import { getFileList } from "./file-list.js";
+import { getFileList, loadAllPages } from "./file-list.js";
 import { updateStatusBar } from "./status-bar.js"
 import { updataDetailPage } from "./sidebar.js";
 
@@ -113,10 +113,11 @@ function getSelectedItemsData() {
 
     const fileList = getFileList();
 
-    // 按索引排序并映射到 fileList 中的原始项
+    // 按索引排序并映射到 fileList 中的原始项（跳过分页列表中尚未加载的条目）
     return [...selectedFileIds]
         .sort((a, b) => a - b)
-        .map(id => fileList[id]);
+        .map(id => fileList[id])
+        .filter(item => item !== undefined);
 }
 
 function getSelectedItemsId() {
@@ -124,15 +125,20 @@ function getSelectedItemsId() {
     return selectedFileIds;
 }
 
-/** 全选所有文件 */
+/** 全选所有文件（分页列表先加载全部条目） */
 function selectAllFiles() {
-    const fileList = getFileList();
-    selectedFileIds = Array.from({ length: fileList.length }, (_, i) => String(i));
-
-    document.querySelectorAll(SELECTORS.FILE_ITEMS).forEach(item => {
-        item.classList.add('selected');
-    });
-    updateStatusBar();
+    loadAllPages()
+        .then(() => {
+            if (!domElements.selectAllBtn.classList.contains('active')) return;
+            const fileList = getFileList();
+            selectedFileIds = Array.from({ length: fileList.length }, (_, i) => String(i));
+
+            document.querySelectorAll(SELECTORS.FILE_ITEMS).forEach(item => {
+                item.classList.add('selected');
+            });
+            updateStatusBar();
+        })
+        .catch(error => console.error('加载全部条目失败:', error));
 }
 
 /** 清空所有选中状态 */
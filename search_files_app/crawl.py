@@ -0,0 +1,93 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 进程池的启动方式：构建常在已有其他线程的进程中进行（索引服务的后台线程、serve.py 的属主进程），
+# fork 会把其他线程持有的锁一并复制到子进程；有 forkserver 时（POSIX）用它，否则用平台默认（Windows 为 spawn）
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+
+
+def list_dir(path):
+    """
+    列出目录：返回 (文件名列表, 需要递归的子目录路径列表)，失败返回 None
+    与 os.walk 的分类和顺序保持一致（不进入符号链接目录）
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    subdirs.append(os.path.join(path, entry.name))
+    except OSError:
+        return None
+    return files, subdirs
+
+
+def add_tree(indexer, top):
+    """
+    单线程遍历 top 子树并加入索引（与 os.walk 自顶向下的顺序一致）
+    支持的索引会记录每个目录的 mtime，mtime 在列目录之前读取，
+    这样列目录期间发生的变化在下次对账时一定会被发现
+    """
+    set_mtime = getattr(indexer, '_set_dir_mtime', None)
+    stack = [top]
+    while stack:
+        root = stack.pop()
+        try:
+            mtime = os.stat(root).st_mtime_ns
+        except OSError:
+            continue
+        listing = list_dir(root)
+        if listing is None:
+            continue
+        files, subdirs = listing
+        for file in files:
+            indexer._add_to_index(file, os.path.join(root, file))
+        if set_mtime is not None:
+            set_mtime(root, mtime)
+        stack.extend(reversed(subdirs))
+
+
+def build_partial(indexer_cls, top):
+    """进程池任务：为一个顶层子目录构建局部索引"""
+    indexer = indexer_cls()
+    add_tree(indexer, top)
+    return indexer
+
+
+def parallel_build(indexer, root_dir, workers=None):
+    """
+    并行构建索引：按顶层目录拆分到进程池，每个进程构建局部索引，
+    主进程按 os.walk 的顺序依次合并，结果与单线程构建完全一致
+    :param indexer: 目标索引（需实现 _add_to_index 与 merge）
+    :param workers: 进程数，默认 CPU 核数；为 1 时单线程构建
+    """
+    workers = workers or os.cpu_count() or 1
+    try:
+        mtime = os.stat(root_dir).st_mtime_ns
+    except OSError:
+        return
+    listing = list_dir(root_dir)
+    if listing is None:
+        return
+    files, subdirs = listing
+    if workers <= 1 or len(subdirs) <= 1:
+        add_tree(indexer, root_dir)
+        return
+
+    for file in files:
+        indexer._add_to_index(file, os.path.join(root_dir, file))
+    set_mtime = getattr(indexer, '_set_dir_mtime', None)
+    if set_mtime is not None:
+        set_mtime(root_dir, mtime)
+    with ProcessPoolExecutor(max_workers=min(workers, len(subdirs)),
+                             mp_context=multiprocessing.get_context(START_METHOD)) as executor:
+        # map 按提交顺序返回结果，保证合并顺序确定
+        for partial in executor.map(build_partial, [type(indexer)] * len(subdirs), subdirs):
+            indexer.merge(partial)
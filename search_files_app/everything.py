@@ -1,30 +1,55 @@
 import os
+import time
+import heapq
 import pickle
+import threading
 from watchdog.events import FileSystemEventHandler
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import pygtrie  # 需安装 pip install pygtrie
+import crawl
+import query_filter
 
 class FileIndexer:
     def __init__(self):
         self.index = {}                  # {文件名: [完整路径1, 路径2...]} (支持同名文件)
         self.suffix_trie = pygtrie.CharTrie()  # 后缀Trie树，用于快速搜索
         self.path_to_names = defaultdict(set)  # {文件路径: {文件名}} (用于清理索引)
+        self.version = 0                 # 每次修改递增，供查询缓存判断是否过期
+        self.id_epoch = 0                # 记录即 (文件名, 完整路径)，不会失效（与 NgramIndexer 一致）
 
-    def build_index(self, root_dir):
-        """构建初始索引（多线程优化版）"""
-        from concurrent.futures import ThreadPoolExecutor
+    def __len__(self):
+        return len(self.path_to_names)
 
-        def process_file(root, file): # 处理单个文件
-            full_path = os.path.join(root, file)
-            self._add_to_index(file, full_path)
+    def build_index(self, root_dir, workers=1):
+        """
+        构建初始索引
+        :param workers: >1 时按顶层目录多进程并行，结果与单线程构建一致；
+                        后缀Trie的局部索引体积大，跨进程传递与合并开销高，默认单线程
+        """
+        crawl.parallel_build(self, root_dir, workers)
 
-        with ThreadPoolExecutor() as executor: 
-            for root, _, files in os.walk(root_dir):
-                for file in files:
-                    executor.submit(process_file, root, file) # 异步处理文件
+    def merge(self, other):
+        """合并另一个（不相交子树的）索引，保持各文件名下路径的先后顺序"""
+        self.version += 1
+        for filename, paths in other.index.items():
+            if filename not in self.index:
+                self.index[filename] = []
+            for full_path in paths:
+                if full_path not in self.index[filename]:
+                    self.index[filename].append(full_path)
+
+        for full_path, names in other.path_to_names.items():
+            self.path_to_names[full_path].update(names)
+
+        for substring, files in other.suffix_trie.iteritems():
+            if substring in self.suffix_trie:
+                self.suffix_trie[substring].update(files)
+            else:
+                self.suffix_trie[substring] = set(files)
 
     def _add_to_index(self, filename, full_path):
         """安全添加到索引结构"""
+        self.version += 1
         # 主索引更新
         if filename not in self.index:
             self.index[filename] = []
@@ -47,6 +72,105 @@ class FileIndexer:
             self.suffix_trie[substring].add((filename, full_path))
 
 
+    def _remove_from_index(self, path):
+        """安全移除索引（兼容同名文件）"""
+        if path in self.path_to_names:
+            self.version += 1
+            for filename in self.path_to_names[path]:
+                # 主索引清理
+                self.index[filename].remove(path)
+                if not self.index[filename]:
+                    del self.index[filename]
+
+                # Trie树清理
+                lower_name = filename.lower()
+                for i in range(len(lower_name)):
+                    substring = lower_name[i:]
+                    if substring in self.suffix_trie:
+                        self.suffix_trie[substring].discard((filename, path))
+                        if not self.suffix_trie[substring]:
+                            del self.suffix_trie[substring]
+
+            del self.path_to_names[path]
+
+    def _paths_under(self, dir_path):
+        prefix = os.path.join(dir_path, '')
+        return [path for path in self.path_to_names if path.startswith(prefix)]
+
+    def _remove_tree(self, dir_path):
+        """删除目录子树下的所有文件"""
+        for path in self._paths_under(dir_path):
+            self._remove_from_index(path)
+
+    def _move_tree(self, src, dest):
+        """目录移动：子树下的文件逐个改写路径（后缀Trie以完整路径为值，无法整体改写）"""
+        for path in self._paths_under(src):
+            names = list(self.path_to_names[path])
+            self._remove_from_index(path)
+            for filename in names:
+                self._add_to_index(filename, dest + path[len(src):])
+        return True
+
+    def match(self, term):
+        """获取文件名包含该子串（小写）的所有 (文件名, 完整路径)"""
+        matches = set()
+        try:
+            # 使用trie迭代器获取所有以该子串开头的后缀
+            for suffix in self.suffix_trie.iterkeys(prefix=term):
+                matches.update(self.suffix_trie[suffix])
+        except KeyError:
+            pass  # 没有以该子串开头的后缀
+        return matches
+
+    # 排序搜索接口（与 NgramIndexer 一致），记录即 (文件名, 完整路径)
+    match_ids = match
+
+    def filter_ids(self, filters, ids=None):
+        """满足属性过滤条件的记录；后缀Trie不保存文件属性，只能逐个 stat（ngram 后端在内存列上过滤）"""
+        if ids is None:
+            ids = [(filename, full_path) for full_path, names in self.path_to_names.items() for filename in names]
+        return [entry for entry in ids if query_filter.stat_match(filters, entry[1])]
+
+    def estimate(self, term):
+        """后缀Trie无法廉价地统计匹配数，以词长近似：越长越稀有"""
+        return -len(term)
+
+    def contains(self, entries, terms):
+        """entries 中文件名（小写）包含全部 terms 的记录"""
+        return [entry for entry in entries if all(term in entry[0].lower() for term in terms)]
+
+    def under(self, entries, directory):
+        """entries 中位于 directory（含子目录，按 normcase 比较）下的记录"""
+        norm_dir = os.path.normcase(os.path.normpath(directory))
+        prefix = os.path.join(norm_dir, '')
+        result = []
+        for entry in entries:
+            root = os.path.normcase(os.path.dirname(entry[1]))
+            if root == norm_dir or root.startswith(prefix):
+                result.append(entry)
+        return result
+
+    def rank(self, entries, query, terms, limit=None):
+        """按 (完全匹配 < 前缀匹配 < 子串匹配, 路径深度, 目录, 文件名) 排序，返回前 limit 个记录"""
+        def key(entry):
+            filename, full_path = entry
+            lower_name = filename.lower()
+            if lower_name == query or lower_name in terms:
+                kind = 0
+            elif any(lower_name.startswith(term) for term in terms):
+                kind = 1
+            else:
+                kind = 2
+            root = os.path.dirname(full_path)
+            return kind, root.count(os.sep), root, filename
+
+        if limit is None or limit >= len(entries):
+            return sorted(entries, key=key)
+        return heapq.nsmallest(limit, entries, key=key)
+
+    def result(self, entry):
+        return entry
+
     def save_index(self, filename="file_index.pkl"):
         """序列化索引到磁盘"""
         with open(filename, 'wb') as f:
@@ -62,6 +186,7 @@ class FileIndexer:
             data = pickle.load(f)
             self.index = data['index']
             self.path_to_names = defaultdict(set, data['path_to_names'])
+            self.version += 1
             self.suffix_trie.update(data['suffix_data'])
 
     def _debug_print_index(self):
@@ -95,18 +220,33 @@ class IndexUpdater(FileSystemEventHandler):
         self.indexer = indexer
 
     def on_created(self, event):
-        if not event.is_directory:
+        if event.is_directory:
+            # 整个目录移入/复制进来时只有目录事件，扫描其子树
+            crawl.add_tree(self.indexer, event.src_path)
+        else:
             self.indexer._add_to_index(
                 os.path.basename(event.src_path),
                 event.src_path
             )
 
     def on_deleted(self, event):
-        if not event.is_directory:
+        if event.is_directory:
+            self.indexer._remove_tree(event.src_path)
+        else:
             self._remove_from_index(event.src_path)
 
-    def on_moved(self, event):
+    def on_modified(self, event):
+        # 文件内容变化：重复添加即刷新支持属性列的索引中的大小与修改时间
         if not event.is_directory:
+            self.indexer._add_to_index(
+                os.path.basename(event.src_path),
+                event.src_path
+            )
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self._move_tree(event.src_path, event.dest_path)
+        else:
             self._remove_from_index(event.src_path)
             self.indexer._add_to_index(
                 os.path.basename(event.dest_path),
@@ -114,62 +254,216 @@ class IndexUpdater(FileSystemEventHandler):
             )
 
     def _remove_from_index(self, path):
-        """安全移除索引（兼容同名文件）"""
-        if path in self.indexer.path_to_names:
-            for filename in self.indexer.path_to_names[path]:
-                # 主索引清理
-                self.indexer.index[filename].remove(path)
-                if not self.indexer.index[filename]:
-                    del self.indexer.index[filename]
+        self.indexer._remove_from_index(path)
 
-                # Trie树清理
-                lower_name = filename.lower()
-                for i in range(len(lower_name)):
-                    substring = lower_name[i:]
-                    if substring in self.indexer.suffix_trie:
-                        self.indexer.suffix_trie[substring].discard((filename, path))
-                        if not self.indexer.suffix_trie[substring]:
-                            del self.indexer.suffix_trie[substring]
+    def _move_tree(self, src, dest):
+        # 无法直接改写前缀时（目标已在索引中等），删除后重新扫描目标
+        if not self.indexer._move_tree(src, dest):
+            self.indexer._remove_tree(src)
+            crawl.add_tree(self.indexer, dest)
 
-            del self.indexer.path_to_names[path]
+class BatchedIndexUpdater(IndexUpdater):
+    """
+    批量应用 watchdog 事件：事件先入队，静默 debounce 秒后
+    （或最早的事件已等待 max_delay 秒）由后台线程在一次加锁内合并应用
+      - 文件事件按路径去重，只保留最终状态（创建后删除的文件不进入索引），
+        修改事件按创建处理（刷新属性列）；目录的修改事件忽略
+      - 目录删除直接整体删除子树，并丢弃队列中该子树下的文件事件
+      - 目录移动整体改写路径前缀
+    """
+    def __init__(self, indexer, lock=None, journal=None, debounce=0.2, max_delay=1.0):
+        """
+        :param lock: 索引锁，应用批次时持有
+        :param journal: 事件日志（IndexJournal），在应用批次时写入
+        """
+        super().__init__(indexer)
+        self.lock = lock or threading.Lock()
+        self.journal = journal
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._queue = []
+        self._first = 0.0       # 队列中最早事件的入队时间
+        self._last = 0.0        # 最近事件的入队时间
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.batches = 0
+        self.events = 0
+        self.last_batch_size = 0
+        self.last_latency = 0.0     # 上个批次：最早事件入队到应用完成（秒）
+        self.max_latency = 0.0
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'batches': self.batches,
+            'events': self.events,
+            'last_batch_size': self.last_batch_size,
+            'last_latency_ms': round(self.last_latency * 1000, 2),
+            'max_latency_ms': round(self.max_latency * 1000, 2),
+        }
+
+    def dispatch(self, event):
+        if event.event_type not in ('created', 'deleted', 'moved', 'modified'):
+            return
+        if event.event_type == 'modified' and event.is_directory:
+            return
+        now = time.monotonic()
+        with self._cond:
+            if not self._queue:
+                self._first = now
+            self._queue.append(event)
+            self._last = now
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # 等待事件静默，但不超过 max_delay
+                while not self._stopped:
+                    wait = min(self._last + self.debounce, self._first + self.max_delay) - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+            self.flush()
+
+    def flush(self):
+        """立即应用队列中的全部事件"""
+        with self.lock:
+            with self._cond:
+                events, first = self._queue, self._first
+                self._queue = []
+            if not events:
+                return
+            if self.journal is not None:
+                for event in events:
+                    self.journal.append(event)
+            self._apply(events)
+        latency = time.monotonic() - first
+        self.batches += 1
+        self.events += len(events)
+        self.last_batch_size = len(events)
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def stop(self):
+        """停止后台线程并应用剩余事件"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _apply(self, events):
+        # 文件事件：{路径: 是否存在}，遇到目录事件前先落地，保证与逐个应用的结果一致
+        files = {}
+        for event in events:
+            if not event.is_directory:
+                files[event.src_path] = event.event_type in ('created', 'modified')
+                if event.event_type == 'moved':
+                    files[event.dest_path] = True
+                continue
+
+            if event.event_type == 'deleted':
+                prefix = os.path.join(event.src_path, '')
+                files = {path: exists for path, exists in files.items() if not path.startswith(prefix)}
+            self._apply_files(files)
+            files = {}
+            super().dispatch(event)
+        self._apply_files(files)
+
+    def _apply_files(self, files):
+        for path, exists in files.items():
+            if exists:
+                self.indexer._add_to_index(os.path.basename(path), path)
+            else:
+                self._remove_from_index(path)
 
 class FileSearcher:
+    """
+    排序搜索：多个词取交集，结果按 (完全匹配 < 前缀匹配 < 子串匹配, 路径深度, 目录, 文件名) 排序，
+    只保留前 limit 个（两种后端结果相同，与爬取顺序无关）。
+    排序键由索引的 rank 直接从索引结构中取得，只为返回的前 limit 个ID生成结果。
+    最近查询的候选ID缓存在 LRU 中，输入 "rep" 后再输入 "repo" 时直接在 "rep" 的结果上过滤
+    查询中可带属性过滤条件（ext:mp4 size:>1G modified:2025-* type:video，见 query_filter），
+    由索引的 filter_ids 在子串匹配的候选上求值，只有过滤条件时扫描全部记录
+    """
+    CACHE_SIZE = 32             # 缓存的查询数
+    CACHE_MAX_ITEMS = 200000    # 结果数超过此值的查询不缓存
+
     def __init__(self, indexer):
         self.indexer = indexer
+        self._cache = OrderedDict()     # {(查询词元组, 过滤条件): 候选ID列表}
+        self._cache_version = None      # 缓存对应的索引版本，索引修改后整体失效
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def search(self, query, limit=1000, directory=None):
+        """
+        :param limit: 返回前 limit 个结果，None 时返回全部（已排序）
+        :param directory: 只返回该目录（含子目录）下的结果，在排序前过滤
+        :return: [(文件名, 完整路径), ...]
+        """
+        return [self.indexer.result(i) for i in self.search_ids(query, limit, directory)]
 
-    def search(self, query, limit=1000):
-        """支持布尔AND子字符串搜索的最终版"""
+    def search_ids(self, query, limit=1000, directory=None):
+        """
+        search 的ID版本：排好序的前 limit 个ID，由 indexer.result 解析为 (文件名, 完整路径)
+        （索引的 id_epoch 改变前有效），便于调用方分批解析
+        """
+        query, filters = query_filter.parse(query)
         query = query.lower().strip()
-        results = set()
 
-        if not query:
+        if not query and filters is None:
             return []
 
-        # 拆分为多个搜索词（支持AND逻辑）
-        terms = query.split()  
-        
-        # 多关键词处理
-        if len(terms) > 1:
-            # 为每个term获取所有可能的子字符串匹配
-            term_matches = []
-            for term in terms:
-                # 使用trie迭代器获取所有包含该子串的后缀
-                matches = set()
-                for suffix in self.indexer.suffix_trie.iterkeys(prefix=term):
-                    matches.update(self.indexer.suffix_trie[suffix])
-                term_matches.append(matches)
-            
-            # 计算所有term结果的交集
-            if term_matches:
-                results.update(term_matches[0])
-                for match_set in term_matches[1:]:
-                    results.intersection_update(match_set)
+        # 拆分为多个搜索词（支持AND逻辑），按估计的匹配数从少到多
+        terms = tuple(sorted(set(query.split()), key=lambda t: (self.indexer.estimate(t), t)))
+        ids = self._candidates(terms, filters)
+        if directory is not None:
+            ids = self.indexer.under(ids, directory)
+        return self.indexer.rank(ids, query, terms, limit)
+
+    def _candidates(self, terms, filters=None):
+        """
+        匹配全部词与过滤条件的ID：优先在缓存的更宽查询（过滤条件相同）结果上过滤，
+        否则从最稀有的词开始查索引
+        """
+        if self._cache_version != self.indexer.version:
+            self._cache.clear()
+            self._cache_version = self.indexer.version
+        for key, ids in reversed(self._cache.items()):
+            # key 中每个词都被 terms 中某个词包含，则 terms 的结果是 key 的结果的子集
+            cached_terms, cached_filters = key
+            if cached_filters == filters and all(any(cached in term for term in terms) for cached in cached_terms):
+                self.cache_hits += 1
+                self._cache.move_to_end(key)
+                if key != (terms, filters):
+                    ids = self.indexer.contains(ids, terms)
+                break
         else:
-            try:
-                # 单关键词：直接查找包含该子串的所有后缀
-                for suffix in self.indexer.suffix_trie.iterkeys(prefix=terms[0]):
-                    results.update(self.indexer.suffix_trie[suffix])
-
-            finally:
-                # 按路径排序并限制结果数
-                return sorted(results, key=lambda x: x[1])[:limit]
\ No newline at end of file
+            self.cache_misses += 1
+            ids = self.indexer.match_ids(terms[0]) if terms else None
+            if filters is not None:
+                ids = self.indexer.filter_ids(filters, ids)
+            ids = self.indexer.contains(ids, terms[1:])
+
+        if len(ids) <= self.CACHE_MAX_ITEMS:
+            key = (terms, filters)
+            self._cache[key] = ids
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return ids
@@ -0,0 +1,134 @@
+"""
+索引文件二进制格式（可直接 mmap 查询）
+
+  头部:  magic(8s) version(I) flags(I) count(Q) body_crc(I) section_count(I)
+         section_count × (offset(Q), length(Q))
+         header_crc(I)              头部之前所有字节的 crc32
+  数据:  各段按 8 字节对齐依次排列，body_crc 为整个数据区的 crc32
+
+所有整数均为小端序；多个进程以只读方式映射同一文件时共享页缓存
+"""
+import os
+import sys
+import mmap
+import zlib
+import struct
+
+MAGIC = b'SBIDX\0\0\0'
+VERSION = 3            # 2: NgramIndexer 增加目录 mtime 段；3: 增加文件属性列（扩展名、大小、修改时间）
+FLAG_LITTLE_ENDIAN = 1
+ALIGN = 8
+
+_HEAD = struct.Struct('<8sIIQII')
+_SECTION = struct.Struct('<QQ')
+_CRC = struct.Struct('<I')
+
+
+class IndexFormatError(ValueError):
+    """索引文件损坏或版本不兼容"""
+
+
+def _header_size(section_count):
+    size = _HEAD.size + _SECTION.size * section_count + _CRC.size
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_index(filename, count, sections):
+    """
+    写入索引文件（先写临时文件再原子替换）
+    :param count: 文件记录数
+    :param sections: 各段内容（bytes-like）的列表，顺序由调用方约定
+    """
+    sections = [memoryview(s).cast('B') for s in sections]
+    header_size = _header_size(len(sections))
+
+    table = []
+    offset = header_size
+    for data in sections:
+        table.append((offset, data.nbytes))
+        offset += (data.nbytes + ALIGN - 1) // ALIGN * ALIGN
+
+    tmp_name = filename + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        f.seek(header_size)
+        body_crc = 0
+        for data in sections:
+            padding = b'\0' * (-data.nbytes % ALIGN)
+            f.write(data)
+            f.write(padding)
+            body_crc = zlib.crc32(padding, zlib.crc32(data, body_crc))
+
+        head = _HEAD.pack(MAGIC, VERSION, FLAG_LITTLE_ENDIAN, count, body_crc, len(sections))
+        head += b''.join(_SECTION.pack(*entry) for entry in table)
+        head += _CRC.pack(zlib.crc32(head))
+        f.seek(0)
+        f.write(head)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, filename)
+
+
+def open_index(filename, verify=False):
+    """
+    只读映射索引文件
+    :param verify: 是否校验整个数据区的 crc32（头部始终校验）
+    :return: (mmap, 记录数, [(offset, length), ...])
+    """
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if len(mm) < _HEAD.size:
+            raise IndexFormatError(f"索引文件{filename}不完整")
+        magic, version, flags, count, body_crc, section_count = _HEAD.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise IndexFormatError(f"{filename}不是索引文件")
+
+        table_end = _HEAD.size + _SECTION.size * section_count
+        if len(mm) < table_end + _CRC.size:
+            raise IndexFormatError(f"索引文件{filename}不完整")
+        (header_crc,) = _CRC.unpack_from(mm, table_end)
+        if zlib.crc32(mm[:table_end]) != header_crc:
+            raise IndexFormatError(f"索引文件{filename}头部校验失败")
+
+        if version != VERSION:
+            raise IndexFormatError(f"不支持的索引版本: {version}")
+        if not flags & FLAG_LITTLE_ENDIAN or sys.byteorder != 'little':
+            raise IndexFormatError("索引字节序与本机不一致")
+
+        table = [_SECTION.unpack_from(mm, _HEAD.size + _SECTION.size * i) for i in range(section_count)]
+        body_start = _header_size(section_count)
+        if any(offset + length > len(mm) for offset, length in table):
+            raise IndexFormatError(f"索引文件{filename}不完整")
+        if verify and zlib.crc32(memoryview(mm)[body_start:]) != body_crc:
+            raise IndexFormatError(f"索引文件{filename}数据校验失败")
+    except Exception:
+        mm.close()
+        raise
+    return mm, count, table
+
+
+class MappedBuf:
+    """映射文件中的一段字节，提供 bytearray 的只读子集（切片、find）"""
+    def __init__(self, mm, offset, length):
+        self.mm = mm
+        self.base = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(self.length)
+        return self.mm[self.base + start:self.base + stop]
+
+    def find(self, sub, start=0):
+        pos = self.mm.find(sub, self.base + start, self.base + self.length)
+        return pos if pos == -1 else pos - self.base
+
+    def tobytes(self):
+        return self.mm[self.base:self.base + self.length]
+
+
+def mapped_array(mm, offset, length, typecode):
+    """映射文件中的一段定长整数数组（零拷贝 memoryview）"""
+    return memoryview(mm)[offset:offset + length].cast(typecode)
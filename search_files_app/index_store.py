@@ -0,0 +1,116 @@
+import os
+import json
+import threading
+from watchdog.events import (
+    FileCreatedEvent, FileDeletedEvent, FileMovedEvent, FileModifiedEvent,
+    DirCreatedEvent, DirDeletedEvent, DirMovedEvent,
+)
+import everything
+import index_format
+
+# 日志中可重放的事件类型
+EVENT_TYPES = {
+    ('created', False): FileCreatedEvent,
+    ('deleted', False): FileDeletedEvent,
+    ('moved', False): FileMovedEvent,
+    ('modified', False): FileModifiedEvent,
+    ('created', True): DirCreatedEvent,
+    ('deleted', True): DirDeletedEvent,
+    ('moved', True): DirMovedEvent,
+}
+
+
+class IndexJournal:
+    """
+    只追加的事件日志：每行一个 JSON [事件类型, 是否目录, 源路径, 目标路径]
+    快照写入后清空；进程崩溃后重放未写入快照的事件
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.pending = 0    # 上次清空后写入的事件数
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, event):
+        key = (event.event_type, event.is_directory)
+        if key not in EVENT_TYPES:
+            return
+        record = [event.event_type, event.is_directory,
+                  os.fsdecode(event.src_path), os.fsdecode(getattr(event, 'dest_path', '') or '')]
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.filename, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            self.pending += 1
+
+    def events(self):
+        """读取日志中的事件（忽略崩溃时写了一半的最后一行）"""
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            for line in f:
+                try:
+                    event_type, is_directory, src_path, dest_path = json.loads(line)
+                    event_cls = EVENT_TYPES[(event_type, is_directory)]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if event_type == 'moved':
+                    yield event_cls(src_path, dest_path)
+                else:
+                    yield event_cls(src_path)
+
+    def truncate(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            self.pending = 0
+
+
+class IndexStore:
+    """
+    持久化索引：快照文件 + 事件日志
+    启动时加载快照 → 重放日志 → 与磁盘对账（只重扫 mtime 变化的目录）→ 写新快照
+    """
+    def __init__(self, indexer, index_file, journal_file=None):
+        self.indexer = indexer
+        self.index_file = index_file
+        self.journal = IndexJournal(journal_file or index_file + '.journal')
+
+    def open(self, root_dir):
+        """
+        :return: 统计信息（来源、重放事件数、对账结果）
+        """
+        stats = {'source': 'build', 'replayed': 0}
+        try:
+            self.indexer.load_index(self.index_file)
+            stats['source'] = 'snapshot'
+        except (OSError, index_format.IndexFormatError) as e:
+            if os.path.exists(self.index_file):
+                print(f"索引快照不可用，重新构建: {e}")
+            self.indexer.build_index(root_dir)
+            self.journal.truncate()
+
+        if stats['source'] == 'snapshot':
+            replayer = everything.IndexUpdater(self.indexer)
+            for event in self.journal.events():
+                replayer.dispatch(event)
+                stats['replayed'] += 1
+            stats.update(self.indexer.reconcile(root_dir))
+
+        if stats['source'] == 'build' or stats['replayed'] or stats.get('rescanned'):
+            self.checkpoint()
+        return stats
+
+    def updater(self, lock=None):
+        """返回批量应用、应用时写日志的 watchdog 事件处理器"""
+        return everything.BatchedIndexUpdater(self.indexer, lock, self.journal)
+
+    def checkpoint(self):
+        """写入快照并清空日志（调用方需持有索引锁）"""
+        self.indexer.save_index(self.index_file)
+        self.journal.truncate()
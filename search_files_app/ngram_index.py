@@ -0,0 +1,775 @@
+import os
+import heapq
+from array import array
+from bisect import bisect_right
+from itertools import compress, groupby, repeat
+from operator import itemgetter
+import crawl
+import index_format
+import query_filter
+
+SEP = b'\0'         # 文件名分隔符（文件名中不可能出现）
+GRAM = 3            # n-gram 长度
+UNVERIFIED = -1     # 目录 mtime：内容经事件修改过或尚未记录，对账时需重新扫描
+REMOVED = -2        # 目录 mtime：目录已从索引中删除
+EXT_SCAN_RATIO = 0.1    # 扩展名过滤的候选（trigram 倒排表）超过记录数的此比例时改为整列扫描
+_COARSE = itemgetter(0, 1)      # 排序键中不含文件名的部分：(匹配类型, 目录名次)
+RANK_SCAN_RATIO = 0.05  # 排序的候选超过记录数的此比例时，在缓冲区中查找前缀匹配而不逐个取文件名
+
+
+def _grams(lower_name):
+    """小写文件名的所有 trigram（去重）"""
+    return {lower_name[i:i + GRAM] for i in range(len(lower_name) - GRAM + 1)}
+
+
+def _stat(full_path):
+    """(大小, 修改时间的 Unix 秒)，读取失败为 (-1, -1)"""
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return -1, -1
+    return st.st_size, int(st.st_mtime)
+
+
+class _StrTable:
+    """映射文件中的字符串表（UTF-8 拼接 + n+1 个偏移），只读"""
+    def __init__(self, buf, offs):
+        self.buf = buf
+        self.offs = offs
+
+    def __len__(self):
+        return len(self.offs) - 1
+
+    def __getitem__(self, i):
+        return self.buf[self.offs[i]:self.offs[i + 1]].decode('utf-8', 'surrogateescape')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class _GramTable:
+    """映射文件中的 trigram 倒排表：有序键表 + 倒排偏移 + 拼接的文件ID，只读"""
+    def __init__(self, keys, post_offs, postings):
+        self.keys = keys
+        self.post_offs = post_offs
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _key(self, i):
+        return self.keys.buf[self.keys.offs[i]:self.keys.offs[i + 1]]
+
+    def get(self, gram):
+        key = gram.encode('utf-8', 'surrogateescape')
+        lo, hi = 0, len(self.keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.keys) and self._key(lo) == key:
+            return self.postings[self.post_offs[lo]:self.post_offs[lo + 1]]
+        return None
+
+    def items(self):
+        for i in range(len(self.keys)):
+            yield self.keys[i], self.postings[self.post_offs[i]:self.post_offs[i + 1]]
+
+
+class NgramIndexer:
+    """
+    紧凑的整数ID + trigram 倒排索引，与 FileIndexer 接口一致
+
+    每个文件分配一个整数ID：
+      - 文件名（原始/小写）以 UTF-8 顺序写入两个打包缓冲区，用偏移数组定位
+      - 所在目录只保存一次，文件记录目录ID；每个目录记录构建/对账时的 mtime
+      - 每个 trigram 对应一个升序的 array('I') 文件ID倒排表
+      - 属性列：扩展名ID（扩展名另存一张表）、大小、修改时间，各为一个 array，
+        属性过滤（query_filter）逐列求值，不访问磁盘；媒体等类型由扩展名ID集合表示
+    删除只做标记，死记录过多时整体重建
+    文件修改事件只刷新属性列；服务停止期间被修改的文件，其属性在下一次修改事件前不会更新
+
+    load_index 以只读 mmap 打开索引文件后可直接查询；首次修改时才复制为可变结构
+    """
+    def __init__(self):
+        self._name_buf = bytearray()    # 原始文件名，SEP 分隔
+        self._name_offs = array('Q')    # 每个ID在 _name_buf 中的起始偏移
+        self._lower_buf = bytearray()   # 小写文件名，SEP 分隔（用于匹配）
+        self._lower_offs = array('Q')
+        self._dir_of = array('I')       # {ID: 目录ID}
+        self._alive = bytearray()       # {ID: 是否有效}
+        self._dirs = []                 # {目录ID: 目录路径}
+        self._dir_ids = {}              # {目录路径: 目录ID}
+        self._dir_mtime = array('q')    # {目录ID: mtime_ns / UNVERIFIED / REMOVED}
+        self._grams = {}                # {trigram: array('I') 文件ID}
+        self._exts = []                 # {扩展名ID: 扩展名（小写，无扩展名为 ''）}
+        self._ext_ids = {}              # {扩展名: 扩展名ID}
+        self._ext_of = array('I')       # {ID: 扩展名ID}
+        self._size = array('q')         # {ID: 字节数，读取失败为 -1}
+        self._mtime = array('q')        # {ID: 修改时间（Unix 秒），读取失败为 -1}
+        self._by_hash = {}              # {hash((目录ID, 文件名)): ID 或 (ID, ...)}，映射模式下按需构建
+        self._dead = 0
+        self._dir_moves = 0             # 目录移动次数（目录路径改变），供 _dir_ranks 与 _under 判断是否过期
+        self._dir_ranks = None          # ((目录数, 目录移动次数), {目录ID: 按 (深度, 路径) 排序的名次})
+        self._under = None              # ((目录, 目录数, 目录移动次数), 其下的目录ID集合)，见 under
+        self.version = 0                # 每次修改递增，供查询缓存判断是否过期
+        self.id_epoch = 0               # compact / load_index 重新分配ID时递增，之前取得的ID随之失效
+        self._mapped = None             # 只读映射的索引文件
+        self._mapped_file = None
+
+    def __len__(self):
+        return len(self._alive) - self._dead
+
+    def build_index(self, root_dir, workers=None):
+        """构建初始索引（按顶层目录多进程并行，结果与单线程构建一致）"""
+        crawl.parallel_build(self, root_dir, workers)
+
+    def merge(self, other):
+        """
+        追加另一个（不相交子树的）索引，other 的ID整体平移到当前末尾
+        倒排表仍保持升序
+        """
+        self.version += 1
+        self._thaw()
+        if other._dead:
+            other.compact()
+        base = len(self._alive)
+
+        dir_map = array('I')
+        for dir_path, mtime in zip(other._dirs, other._dir_mtime):
+            dir_id = self._dir_id(dir_path)
+            if mtime != REMOVED:
+                self._dir_mtime[dir_id] = mtime
+            dir_map.append(dir_id)
+        self._dir_of.extend(map(dir_map.__getitem__, other._dir_of))
+
+        self._name_offs.extend(map(len(self._name_buf).__add__, other._name_offs))
+        self._name_buf += other._name_buf
+        self._lower_offs.extend(map(len(self._lower_buf).__add__, other._lower_offs))
+        self._lower_buf += other._lower_buf
+        self._alive += other._alive
+
+        ext_map = [self._ext_id(ext) for ext in other._exts]
+        self._ext_of.extend(map(ext_map.__getitem__, other._ext_of))
+        self._size += other._size
+        self._mtime += other._mtime
+
+        # 查找表以 (目录ID, 文件名) 为键，目录ID已重新映射，需在本进程重算
+        for file_id in range(base, len(self._alive)):
+            self._hash_add(self._key(file_id), file_id)
+
+        for gram, ids in other._grams.items():
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = array('I')
+            postings.extend(map(base.__add__, ids))
+
+    # ---------------- 记录读取 ---------------- #
+
+    def _slice(self, buf, offs, file_id):
+        start = offs[file_id]
+        end = offs[file_id + 1] - 1 if file_id + 1 < len(offs) else len(buf) - 1
+        return buf[start:end]
+
+    def name(self, file_id):
+        return self._slice(self._name_buf, self._name_offs, file_id).decode('utf-8', 'surrogateescape')
+
+    def path(self, file_id):
+        return os.path.join(self._dirs[self._dir_of[file_id]], self.name(file_id))
+
+    def _key(self, file_id):
+        return hash((self._dir_of[file_id], self.name(file_id)))
+
+    def _lookup(self, full_path):
+        self._thaw()
+        dir_id = self._dir_ids.get(os.path.dirname(full_path))
+        if dir_id is None:
+            return None
+        name = os.path.basename(full_path)
+        ids = self._by_hash.get(hash((dir_id, name)))
+        if ids is None:
+            return None
+        for file_id in (ids if isinstance(ids, tuple) else (ids,)):
+            if self._dir_of[file_id] == dir_id and self.name(file_id) == name:
+                return file_id
+        return None
+
+    def _hash_add(self, h, file_id):
+        ids = self._by_hash.get(h)
+        if ids is None:
+            self._by_hash[h] = file_id
+        else:
+            self._by_hash[h] = (ids if isinstance(ids, tuple) else (ids,)) + (file_id,)
+
+    def __getstate__(self):
+        # 查找表与进程的哈希种子相关，不随对象传递（merge 时重算）
+        self._thaw()
+        state = self.__dict__.copy()
+        state['_by_hash'] = {}
+        return state
+
+    # ---------------- 增删 ---------------- #
+
+    def _dir_id(self, dir_path):
+        """获取目录ID，不存在时新建（mtime 记为 UNVERIFIED）"""
+        dir_id = self._dir_ids.get(dir_path)
+        if dir_id is None:
+            dir_id = self._dir_ids[dir_path] = len(self._dirs)
+            self._dirs.append(dir_path)
+            self._dir_mtime.append(UNVERIFIED)
+        return dir_id
+
+    def _ext_id(self, ext):
+        ext_id = self._ext_ids.get(ext)
+        if ext_id is None:
+            ext_id = self._ext_ids[ext] = len(self._exts)
+            self._exts.append(ext)
+        return ext_id
+
+    def _set_dir_mtime(self, dir_path, mtime):
+        """记录目录在列出内容之前读取的 mtime（由 crawl / reconcile 调用）"""
+        self._thaw()
+        self._dir_mtime[self._dir_id(dir_path)] = mtime
+
+    def _add_to_index(self, filename, full_path, attrs=None):
+        """
+        添加文件到索引，所在目录标记为需对账；已在索引中时只刷新大小与修改时间（文件修改事件）
+        :param attrs: (大小, 修改时间)，为 None 时 stat 读取
+        """
+        file_id = self._lookup(full_path)
+        if attrs is None:
+            attrs = _stat(full_path)
+        if file_id is not None:
+            if (self._size[file_id], self._mtime[file_id]) != attrs:
+                self._size[file_id], self._mtime[file_id] = attrs
+                self.version += 1
+            return
+
+        dir_id = self._dir_id(os.path.dirname(full_path))
+        self._dir_mtime[dir_id] = UNVERIFIED
+        self.version += 1
+
+        file_id = len(self._alive)
+        lower_name = filename.lower()
+        self._name_offs.append(len(self._name_buf))
+        self._name_buf += filename.encode('utf-8', 'surrogateescape') + SEP
+        self._lower_offs.append(len(self._lower_buf))
+        self._lower_buf += lower_name.encode('utf-8', 'surrogateescape') + SEP
+        self._dir_of.append(dir_id)
+        self._alive.append(1)
+        self._ext_of.append(self._ext_id(query_filter.extension(filename)))
+        self._size.append(attrs[0])
+        self._mtime.append(attrs[1])
+
+        self._hash_add(hash((dir_id, filename)), file_id)
+
+        for gram in _grams(lower_name):
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = array('I')
+            postings.append(file_id)
+
+    def _remove_from_index(self, path):
+        """标记删除，死记录超过一半时重建"""
+        file_id = self._lookup(path)
+        if file_id is None:
+            return
+        self._kill(file_id)
+        self._maybe_compact()
+
+    def _kill(self, file_id):
+        """标记单个ID为删除（不触发重建，调用方持有的ID保持有效）"""
+        h = self._key(file_id)
+        self._alive[file_id] = 0
+        self._dead += 1
+        self.version += 1
+        self._dir_mtime[self._dir_of[file_id]] = UNVERIFIED
+
+        ids = self._by_hash[h]
+        if isinstance(ids, tuple):
+            rest = tuple(i for i in ids if i != file_id)
+            self._by_hash[h] = rest if len(rest) > 1 else rest[0]
+        else:
+            del self._by_hash[h]
+
+    def _maybe_compact(self):
+        if self._dead > 1024 and self._dead * 2 > len(self._alive):
+            self.compact()
+
+    def _remove_tree(self, dir_path):
+        """删除目录子树下的所有文件与目录记录"""
+        self._thaw()
+        prefix = os.path.join(dir_path, '')
+        removed = set()
+        for dir_id, path in enumerate(self._dirs):
+            if self._dir_mtime[dir_id] != REMOVED and (path == dir_path or path.startswith(prefix)):
+                removed.add(dir_id)
+                self._dir_mtime[dir_id] = REMOVED
+                del self._dir_ids[path]
+        if not removed:
+            return
+        for file_id, dir_id in enumerate(self._dir_of):
+            if dir_id in removed and self._alive[file_id]:
+                self._kill(file_id)
+        # _kill 会把目录标记为 UNVERIFIED，这里恢复为 REMOVED
+        for dir_id in removed:
+            self._dir_mtime[dir_id] = REMOVED
+
+    def _move_tree(self, src, dest):
+        """
+        目录移动：只改写受影响目录记录的路径前缀，文件记录不动
+        :return: 是否成功（目标已有记录或源不在索引中时返回 False，由调用方重新扫描）
+        """
+        self._thaw()
+        prefix = os.path.join(src, '')
+        moved = [(dir_id, path) for dir_id, path in enumerate(self._dirs)
+                 if self._dir_mtime[dir_id] != REMOVED and (path == src or path.startswith(prefix))]
+        if not moved:
+            return False
+        targets = [dest + path[len(src):] for _, path in moved]
+        if any(target in self._dir_ids for target in targets):
+            return False
+        for (dir_id, path), target in zip(moved, targets):
+            del self._dir_ids[path]
+            self._dirs[dir_id] = target
+            self._dir_ids[target] = dir_id
+            if path == src:
+                self._dir_mtime[dir_id] = UNVERIFIED
+        self._dir_moves += 1
+        self.version += 1
+        for parent in (os.path.dirname(src), os.path.dirname(dest)):
+            parent_id = self._dir_ids.get(parent)
+            if parent_id is not None:
+                self._dir_mtime[parent_id] = UNVERIFIED
+        return True
+
+    def compact(self):
+        """
+        丢弃死记录，重新分配ID（保留目录 mtime）
+        version 与 id_epoch 在原值上递增而不是随 __init__ 归零，否则可能与查询缓存记录的旧版本号重合
+        """
+        live = [(self.name(i), self.path(i), (self._size[i], self._mtime[i]))
+                for i in range(len(self._alive)) if self._alive[i]]
+        dirs = [(d, m) for d, m in zip(self._dirs, self._dir_mtime) if m != REMOVED]
+        version, id_epoch = self.version, self.id_epoch
+        self.__init__()
+        for filename, full_path, attrs in live:
+            self._add_to_index(filename, full_path, attrs)
+        for dir_path, mtime in dirs:
+            self._dir_mtime[self._dir_id(dir_path)] = mtime
+        self.version = version + 1
+        self.id_epoch = id_epoch + 1
+
+    # ---------------- 启动对账 ---------------- #
+
+    def reconcile(self, root_dir):
+        """
+        与磁盘对账：自顶向下 stat 每个已记录的目录，只重新扫描 mtime 变化
+        （或标记为 UNVERIFIED）的目录，应用新增/删除的文件与子目录
+        :return: 统计 {'checked', 'rescanned', 'added', 'removed'}
+        """
+        stats = {'checked': 0, 'rescanned': 0, 'added': 0, 'removed': 0}
+        dir_ids = {d: i for i, d in enumerate(self._dirs) if self._dir_mtime[i] != REMOVED}
+        children = {}
+        for dir_path in dir_ids:
+            children.setdefault(os.path.dirname(dir_path), []).append(dir_path)
+        files_by_dir = None
+
+        stack = [root_dir]
+        while stack:
+            dir_path = stack.pop()
+            stats['checked'] += 1
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                mtime = None
+            dir_id = dir_ids.get(dir_path)
+            if mtime is not None and dir_id is not None and self._dir_mtime[dir_id] == mtime:
+                stack.extend(children.get(dir_path, ()))
+                continue
+
+            listing = crawl.list_dir(dir_path) if mtime is not None else None
+            if listing is None:
+                # 目录已不存在或无法访问
+                if dir_id is not None:
+                    count = len(self)
+                    self._remove_tree(dir_path)
+                    stats['removed'] += count - len(self)
+                continue
+
+            # 目录有变化：首次修改时才复制映射的索引
+            stats['rescanned'] += 1
+            self._thaw()
+            if files_by_dir is None:
+                files_by_dir = {}
+                for file_id, owner in enumerate(self._dir_of):
+                    if self._alive[file_id]:
+                        files_by_dir.setdefault(owner, []).append(file_id)
+
+            files, subdirs = listing
+            indexed = {self.name(i): i for i in files_by_dir.get(dir_id, ())}
+            on_disk = set(files)
+            for name, file_id in indexed.items():
+                if name not in on_disk:
+                    self._kill(file_id)
+                    stats['removed'] += 1
+            for name in files:
+                if name not in indexed:
+                    self._add_to_index(name, os.path.join(dir_path, name))
+                    stats['added'] += 1
+
+            known = set(children.get(dir_path, ()))
+            for sub in subdirs:
+                if sub in known:
+                    stack.append(sub)
+                else:
+                    count = len(self)
+                    crawl.add_tree(self, sub)
+                    stats['added'] += len(self) - count
+            for sub in known.difference(subdirs):
+                count = len(self)
+                self._remove_tree(sub)
+                stats['removed'] += count - len(self)
+            self._set_dir_mtime(dir_path, mtime)
+
+        self._maybe_compact()
+        return stats
+
+    # ---------------- 查询 ---------------- #
+
+    def match_ids(self, term):
+        """文件名（小写）包含 term 的所有有效ID"""
+        term_bytes = term.encode('utf-8', 'surrogateescape')
+        if len(term) < GRAM:
+            return self._scan(term_bytes)
+
+        postings = []
+        for gram in _grams(term):
+            ids = self._grams.get(gram)
+            if ids is None:
+                return set()
+            postings.append(ids)
+        alive = self._alive
+        if len(term) == GRAM:
+            # 倒排表即精确结果，只需排除死记录（compress/map 在 C 中循环）
+            return set(compress(postings[0], map(alive.__getitem__, postings[0])))
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            if not candidates:
+                return candidates
+            candidates.intersection_update(ids)
+
+        # trigram 命中只是必要条件，需核对子串
+        return {i for i in candidates
+                if alive[i] and term_bytes in self._slice(self._lower_buf, self._lower_offs, i)}
+
+    def _scan(self, term_bytes):
+        """短查询词：直接在小写缓冲区中查找"""
+        ids = set()
+        buf, offs, alive = self._lower_buf, self._lower_offs, self._alive
+        pos = buf.find(term_bytes)
+        while pos != -1:
+            file_id = bisect_right(offs, pos) - 1
+            if alive[file_id]:
+                ids.add(file_id)
+            # 跳到下一个文件名
+            if file_id + 1 >= len(offs):
+                break
+            pos = buf.find(term_bytes, offs[file_id + 1])
+        return ids
+
+    def match(self, term):
+        """获取文件名包含该子串（小写）的所有 (文件名, 完整路径)"""
+        return {(self.name(i), self.path(i)) for i in self.match_ids(term)}
+
+    def filter_ids(self, filters, ids=None):
+        """
+        满足属性过滤条件（query_filter.Filters）的有效ID
+        逐个条件在列上过滤（compress/map 在 C 中循环），先过滤最便宜的扩展名
+        :param ids: 候选ID（子串匹配的结果），为 None 时扫描全部记录
+                    （有扩展名条件时先用 ".扩展名" 的 trigram 倒排表缩小范围）
+        """
+        if ids is None and filters.exts is not None:
+            ids = self._ext_candidates(filters.exts)
+        checks = []
+        if filters.exts is not None:
+            wanted = {i for i, ext in enumerate(self._exts) if ext in filters.exts}
+            checks.append((self._ext_of, wanted.__contains__))
+        for column, field in ((self._size, 'size'), (self._mtime, 'mtime')):
+            low, high = filters.bounds(field)
+            if low is not None:
+                checks.append((column, low.__le__))
+            if high is not None:
+                checks.append((column, high.__ge__))
+
+        alive = self._alive
+        if ids is None:
+            if not checks:
+                return list(compress(range(len(alive)), alive))
+            column, check = checks.pop(0)
+            ids = list(compress(range(len(column)), map(check, column)))
+        else:
+            ids = list(ids)
+        checks.append((alive, bool))
+        for column, check in checks:
+            ids = list(compress(ids, map(check, map(column.__getitem__, ids))))
+        return ids
+
+    def _ext_candidates(self, exts):
+        """
+        文件名含 ".扩展名" 的ID的超集（未核对子串与有效性）
+        有扩展名短于一个 trigram，或候选超过全部记录的 EXT_SCAN_RATIO 时返回 None（整列扫描更快）
+        """
+        lists = []
+        for ext in exts:
+            term = '.' + ext
+            if len(term) < GRAM:
+                return None
+            lists.append(sorted((self._grams.get(gram) or () for gram in _grams(term)), key=len))
+        if sum(len(postings[0]) for postings in lists) > len(self._alive) * EXT_SCAN_RATIO:
+            return None
+        candidates = set()
+        for postings in lists:
+            found = set(postings[0])
+            for ids in postings[1:]:
+                found.intersection_update(ids)
+            candidates |= found
+        return candidates
+
+    def estimate(self, term):
+        """匹配数的上界：最短的 trigram 倒排表长度（短查询词无法估计）"""
+        if len(term) < GRAM:
+            return len(self._alive)
+        return min(len(self._grams.get(gram) or ()) for gram in _grams(term))
+
+    def contains(self, ids, terms):
+        """ids 中文件名（小写）包含全部 terms 的ID"""
+        buf, offs = self._lower_buf, self._lower_offs
+        for term in terms:
+            term_bytes = term.encode('utf-8', 'surrogateescape')
+            ids = [i for i in ids if term_bytes in self._slice(buf, offs, i)]
+        return list(ids)
+
+    def under(self, ids, directory):
+        """ids 中位于 directory（含子目录，按 normcase 比较）下的ID，按所在目录ID过滤"""
+        key = (os.path.normcase(os.path.normpath(directory)), len(self._dirs), self._dir_moves)
+        if self._under is None or self._under[0] != key:
+            norm_dir = key[0]
+            prefix = os.path.join(norm_dir, '')
+            wanted = set()
+            for dir_id, path in enumerate(self._dirs):
+                path = os.path.normcase(path)
+                if path == norm_dir or path.startswith(prefix):
+                    wanted.add(dir_id)
+            self._under = (key, wanted)
+        wanted = self._under[1]
+        if len(wanted) == len(self._dirs):
+            return list(ids)
+        return list(compress(ids, map(wanted.__contains__, map(self._dir_of.__getitem__, ids))))
+
+    def rank(self, ids, query, terms, limit=None):
+        """
+        按 (完全匹配 0 / 前缀匹配 1 / 子串匹配 2, 目录深度, 目录, 文件名) 排序（与 FileIndexer.rank 相同，
+        结果与ID分配顺序无关），返回前 limit 个ID（None 为全部）
+        排序键先取自索引数组（目录深度与路径合为目录的排序名次，map/zip 在 C 中生成），按 (类型, 目录名次, ID) 选出前 limit 个；
+        与第 limit 个同键（同一目录、同一匹配类型）而ID较大的记录可能未被选中，补上后同一目录内再解码文件名比较
+        """
+        ids = list(ids)
+        if limit is not None and limit <= 0:
+            return []
+        kinds = self._match_kinds(ids, query, terms)
+        ranks, dir_of = self._dir_order(), self._dir_of
+        keys = zip(map(kinds.get, ids, repeat(2)), map(ranks.__getitem__, map(dir_of.__getitem__, ids)), ids)
+        if limit is None or limit >= len(ids):
+            keys = sorted(keys)
+        else:
+            keys = heapq.nsmallest(limit, keys)
+            kind, rank, last = keys[-1]
+            selected = {key[2] for key in keys}
+            keys += [(kind, rank, i) for i in compress(ids, map(dir_of[last].__eq__, map(dir_of.__getitem__, ids)))
+                     if i not in selected and kinds.get(i, 2) == kind]
+            keys.sort()
+        ranked = []
+        for _, group in groupby(keys, _COARSE):
+            group_ids = [key[2] for key in group]
+            if len(group_ids) > 1:
+                group_ids.sort(key=self.name)
+            ranked.extend(group_ids)
+        return ranked[:limit]
+
+    def _match_kinds(self, ids, query, terms):
+        """
+        {ID: 0 完全匹配 / 1 前缀匹配}（其余为子串匹配），完全匹配指文件名等于整个查询或某个词
+        候选较多时在小写缓冲区中查找 SEP + 词，否则逐个比较候选的文件名
+        """
+        words = {word.encode('utf-8', 'surrogateescape') for word in (query, *terms) if word}
+        buf, offs = self._lower_buf, self._lower_offs
+        kinds = {}
+        if len(ids) <= len(self._alive) * RANK_SCAN_RATIO:
+            for i in ids:
+                name = self._slice(buf, offs, i)
+                for word in words:
+                    if name.startswith(word):
+                        kind = 0 if len(name) == len(word) else 1
+                        if kinds.get(i, 2) > kind:
+                            kinds[i] = kind
+            return kinds
+
+        for word in words:
+            for start in self._name_starts(word):
+                end = start + len(word)
+                file_id = bisect_right(offs, start) - 1
+                kind = 0 if buf[end:end + 1] == SEP else 1
+                if kinds.get(file_id, 2) > kind:
+                    kinds[file_id] = kind
+        return kinds
+
+    def _name_starts(self, word):
+        """小写文件名以 word 开头的文件在缓冲区中的起始偏移（第一个文件名前没有 SEP）"""
+        buf = self._lower_buf
+        if buf[:len(word)] == word:
+            yield 0
+        pattern = SEP + word
+        pos = buf.find(pattern)
+        while pos != -1:
+            yield pos + 1
+            pos = buf.find(pattern, pos + len(pattern))
+
+    def _dir_order(self):
+        """{目录ID: 按 (路径深度, 路径) 排序的名次}，新增或移动目录后重算"""
+        key = (len(self._dirs), self._dir_moves)
+        if self._dir_ranks is None or self._dir_ranks[0] != key:
+            dirs = self._dirs
+            ranks = array('I', bytes(4 * key[0]))
+            for rank, dir_id in enumerate(sorted(range(key[0]), key=lambda d: (dirs[d].count(os.sep), dirs[d]))):
+                ranks[dir_id] = rank
+            self._dir_ranks = (key, ranks)
+        return self._dir_ranks[1]
+
+    def result(self, file_id):
+        """(文件名, 完整路径)"""
+        return self.name(file_id), self.path(file_id)
+    # ---------------- 持久化 ---------------- #
+
+    SECTIONS = ('name_buf', 'name_offs', 'lower_buf', 'lower_offs', 'dir_of', 'alive',
+                'dir_buf', 'dir_offs', 'dir_mtime', 'gram_buf', 'gram_offs', 'post_offs', 'postings',
+                'ext_buf', 'ext_offs', 'ext_of', 'size', 'mtime')
+
+    def save_index(self, filename="file_index.sbidx"):
+        """写入可 mmap 的二进制索引文件（格式见 index_format）"""
+        if self._mapped is not None and os.path.abspath(filename) == self._mapped_file:
+            return  # 加载后未修改，且不能覆盖仍在映射中的文件
+        if self._dead:
+            self.compact()
+
+        dir_buf, dir_offs = bytearray(), array('Q', [0])
+        for dir_path in self._dirs:
+            dir_buf += dir_path.encode('utf-8', 'surrogateescape')
+            dir_offs.append(len(dir_buf))
+
+        ext_buf, ext_offs = bytearray(), array('Q', [0])
+        for ext in self._exts:
+            ext_buf += ext.encode('utf-8', 'surrogateescape')
+            ext_offs.append(len(ext_buf))
+
+        gram_buf, gram_offs = bytearray(), array('Q', [0])
+        post_offs, postings = array('Q', [0]), array('I')
+        for key, ids in sorted((gram.encode('utf-8', 'surrogateescape'), ids)
+                               for gram, ids in self._grams.items()):
+            gram_buf += key
+            gram_offs.append(len(gram_buf))
+            postings.extend(ids)
+            post_offs.append(len(postings))
+
+        def raw(buf):
+            return buf.tobytes() if isinstance(buf, index_format.MappedBuf) else buf
+
+        index_format.write_index(filename, len(self._alive), [
+            raw(self._name_buf), self._name_offs, raw(self._lower_buf), self._lower_offs,
+            self._dir_of, self._alive, dir_buf, dir_offs, self._dir_mtime,
+            gram_buf, gram_offs, post_offs, postings,
+            ext_buf, ext_offs, self._ext_of, self._size, self._mtime,
+        ])
+
+    def load_index(self, filename="file_index.sbidx", verify=False):
+        """
+        只读映射索引文件，无需反序列化即可查询
+        :param verify: 是否校验整个数据区
+        """
+        mm, count, table = index_format.open_index(filename, verify)
+        if len(table) != len(self.SECTIONS):
+            mm.close()
+            raise index_format.IndexFormatError(f"索引文件{filename}段数不符")
+        sec = dict(zip(self.SECTIONS, table))
+
+        def buf(name):
+            return index_format.MappedBuf(mm, *sec[name])
+
+        def arr(name, typecode):
+            return index_format.mapped_array(mm, *sec[name], typecode)
+
+        version, id_epoch = self.version, self.id_epoch
+        self.__init__()
+        self.version = version + 1
+        self.id_epoch = id_epoch + 1
+        self._mapped = mm
+        self._mapped_file = os.path.abspath(filename)
+        self._name_buf = buf('name_buf')
+        self._name_offs = arr('name_offs', 'Q')
+        self._lower_buf = buf('lower_buf')
+        self._lower_offs = arr('lower_offs', 'Q')
+        self._dir_of = arr('dir_of', 'I')
+        self._alive = arr('alive', 'B')
+        self._dirs = _StrTable(buf('dir_buf'), arr('dir_offs', 'Q'))
+        self._dir_mtime = arr('dir_mtime', 'q')
+        self._grams = _GramTable(_StrTable(buf('gram_buf'), arr('gram_offs', 'Q')),
+                                 arr('post_offs', 'Q'), arr('postings', 'I'))
+        self._exts = _StrTable(buf('ext_buf'), arr('ext_offs', 'Q'))
+        self._ext_of = arr('ext_of', 'I')
+        self._size = arr('size', 'q')
+        self._mtime = arr('mtime', 'q')
+        self._dir_ids = None
+        self._ext_ids = None
+        self._by_hash = None
+        if len(self._alive) != count:
+            raise index_format.IndexFormatError(f"索引文件{filename}记录数不符")
+
+    def _thaw(self):
+        """把映射的只读结构复制为可变结构（首次修改时调用）"""
+        if self._mapped is None:
+            return
+
+        def to_array(typecode, view):
+            a = array(typecode)
+            a.frombytes(view.cast('B'))
+            return a
+
+        self._name_buf = bytearray(self._name_buf.tobytes())
+        self._name_offs = to_array('Q', self._name_offs)
+        self._lower_buf = bytearray(self._lower_buf.tobytes())
+        self._lower_offs = to_array('Q', self._lower_offs)
+        self._dir_of = to_array('I', self._dir_of)
+        self._alive = bytearray(self._alive)
+        self._dirs = list(self._dirs)
+        self._dir_mtime = to_array('q', self._dir_mtime)
+        self._dir_ids = {d: i for i, d in enumerate(self._dirs) if self._dir_mtime[i] != REMOVED}
+        self._grams = {gram: to_array('I', ids) for gram, ids in self._grams.items()}
+        self._exts = list(self._exts)
+        self._ext_ids = {ext: i for i, ext in enumerate(self._exts)}
+        self._ext_of = to_array('I', self._ext_of)
+        self._size = to_array('q', self._size)
+        self._mtime = to_array('q', self._mtime)
+        mm, self._mapped, self._mapped_file = self._mapped, None, None
+        try:
+            mm.close()  # 解除映射，之后才能原子替换该文件
+        except BufferError:
+            pass  # 仍有外部引用的视图，等其释放后自动解除
+        # 字符串哈希每个进程不同，需重建
+        self._by_hash = {}
+        for file_id in range(len(self._alive)):
+            if self._alive[file_id]:
+                self._hash_add(self._key(file_id), file_id)
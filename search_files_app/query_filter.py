@@ -0,0 +1,202 @@
+"""
+搜索词中的属性过滤条件，与文件名子串匹配组合使用（各条件取交集）
+
+  ext:mp4  ext:mp4,mkv          扩展名（不区分大小写，可带点）
+  type:video                    类型组：image/video/audio/document/archive/code/media
+  size:>1G  size:<=10M  size:1M..1G
+                                大小，单位 B/K/M/G/T（1024 进制），不带比较符为等于
+  modified:2025-*  modified:2025-03  modified:>=2025-03-01  modified:2025-01..2025-06
+                                修改时间（本地时间），年/月/日都表示整段时间
+
+无法解析的条件按普通搜索词处理
+"""
+import os
+import re
+import time
+
+# 类型组（与前端 config.js 的分类相同），media 为图片、视频与音频
+TYPE_GROUPS = {
+    'image': {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'svg', 'ico', 'tiff'},
+    'video': {'mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv', 'webm'},
+    'audio': {'mp3', 'wav', 'ogg', 'aac', 'flac'},
+    'document': {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt'},
+    'archive': {'zip', 'rar', '7z', 'tar', 'gz'},
+    'code': {'js', 'html', 'css', 'py', 'java', 'cpp', 'c', 'php', 'json', 'xml'},
+}
+TYPE_GROUPS['media'] = TYPE_GROUPS['image'] | TYPE_GROUPS['video'] | TYPE_GROUPS['audio']
+
+UNITS = {'': 1, 'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+
+_SIZE = re.compile(r'^(\d+(?:\.\d+)?)([kmgt]?)b?$')
+_DATE = re.compile(r'^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$')
+_COMPARE = re.compile(r'^(>=|<=|>|<|=)?(.*)$')
+
+
+def extension(name):
+    """与 os.path.splitext 相同的扩展名规则（开头的点不算），小写，无扩展名为 ''"""
+    i = name.rfind('.')
+    if i <= 0 or (name[0] == '.' and not name[:i].lstrip('.')):
+        return ''
+    return name[i + 1:].lower()
+
+
+class Filters:
+    """
+    解析后的过滤条件：扩展名集合（None 为不限）与大小、修改时间的闭区间（端点 None 为不限）
+    可作为字典键（FileSearcher 的查询缓存）
+    """
+    def __init__(self):
+        self.exts = None
+        self.size_min = self.size_max = None
+        self.mtime_min = self.mtime_max = None
+
+    def _key(self):
+        return self.exts, self.size_min, self.size_max, self.mtime_min, self.mtime_max
+
+    def __eq__(self, other):
+        return isinstance(other, Filters) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def restrict_exts(self, exts):
+        exts = frozenset(exts)
+        self.exts = exts if self.exts is None else self.exts & exts
+
+    def restrict(self, field, low, high):
+        """与已有区间求交集"""
+        current_low, current_high = getattr(self, field + '_min'), getattr(self, field + '_max')
+        if low is not None and (current_low is None or low > current_low):
+            setattr(self, field + '_min', low)
+        if high is not None and (current_high is None or high < current_high):
+            setattr(self, field + '_max', high)
+
+    def bounds(self, field):
+        """
+        (下界, 上界)；只限制上界时下界取 0，排除读取失败记为 -1 的文件
+        """
+        low, high = getattr(self, field + '_min'), getattr(self, field + '_max')
+        if low is None and high is not None:
+            low = 0
+        return low, high
+
+    def match(self, name, size, mtime):
+        """逐个文件判断（遍历搜索与不保存属性的索引后端使用）"""
+        if self.exts is not None and extension(name) not in self.exts:
+            return False
+        for field, value in (('size', size), ('mtime', int(mtime))):
+            low, high = self.bounds(field)
+            if (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+
+def _size(text):
+    """'1.5G' → [字节数, 字节数 + 1)"""
+    match = _SIZE.match(text)
+    if match is None:
+        return None
+    size = int(float(match.group(1)) * UNITS[match.group(2)])
+    return size, size + 1
+
+
+def _period(text):
+    """'2025' / '2025-03' / '2025-03-14'（可带结尾的 -* 或 *）→ [起, 止) 的 Unix 秒（本地时间）"""
+    match = _DATE.match(text.rstrip('*').rstrip('-'))
+    if match is None:
+        return None
+    year, month, day = match.group(1), match.group(2), match.group(3)
+    start = [int(year), int(month or 1), int(day or 1)]
+    end = list(start)
+    if day:
+        end[2] += 1
+    elif month:
+        end[1] += 1
+    else:
+        end[0] += 1
+    try:
+        # mktime 会把 13 月、32 日等进位到下一年/月
+        return (int(time.mktime((*start, 0, 0, 0, 0, 0, -1))),
+                int(time.mktime((*end, 0, 0, 0, 0, 0, -1))))
+    except (OverflowError, ValueError):
+        return None
+
+
+def _range(text, parse):
+    """
+    比较或区间 → 闭区间 (下界, 上界)，端点 None 为不限，无法解析返回 None
+    :param parse: 值 → (起, 止)，止为开区间
+    """
+    if '..' in text:
+        low, _, high = text.partition('..')
+        low, high = parse(low), parse(high)
+        if low is None or high is None:
+            return None
+        return low[0], high[1] - 1
+    op, value = _COMPARE.match(text).groups()
+    value = parse(value)
+    if value is None:
+        return None
+    start, end = value
+    if op == '>':
+        return end, None
+    if op == '>=':
+        return start, None
+    if op == '<':
+        return None, start - 1
+    if op == '<=':
+        return None, end - 1
+    return start, end - 1
+
+
+def _apply(filters, key, value):
+    """应用一个条件，成功返回 True"""
+    if key == 'ext':
+        exts = {ext.lstrip('.') for ext in value.split(',') if ext}
+        if not exts:
+            return False
+        filters.restrict_exts(exts)
+    elif key == 'type':
+        groups = [TYPE_GROUPS.get(group) for group in value.split(',')]
+        if not groups or None in groups:
+            return False
+        filters.restrict_exts(set().union(*groups))
+    elif key == 'size':
+        bounds = _range(value, _size)
+        if bounds is None:
+            return False
+        filters.restrict('size', *bounds)
+    elif key == 'modified':
+        bounds = _range(value, _period)
+        if bounds is None:
+            return False
+        filters.restrict('mtime', *bounds)
+    else:
+        return False
+    return True
+
+
+def parse(query):
+    """
+    拆出过滤条件
+    :return: (其余的搜索词（空格分隔）, Filters 或 None)
+    """
+    words = []
+    filters = Filters()
+    found = False
+    for word in query.split():
+        key, sep, value = word.partition(':')
+        if sep and _apply(filters, key.lower(), value.lower()):
+            found = True
+        else:
+            words.append(word)
+    return ' '.join(words), filters if found else None
+
+
+def stat_match(filters, path):
+    """stat 文件并判断是否满足条件（文件不存在时为 False）"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return filters.match(os.path.basename(path), st.st_size, st.st_mtime)
@@ -1,12 +1,13 @@
-
 import everything
+from ngram_index import NgramIndexer
+from index_store import IndexStore
 import os
 import time
 from watchdog.observers import Observer
 
 # 使用示例
 if __name__ == "__main__":
-    indexer = everything.FileIndexer()
+    indexer = NgramIndexer()
     searcher = everything.FileSearcher(indexer)
 
     myPath = input("请输入要索引的目录: ")
@@ -14,23 +15,19 @@ if __name__ == "__main__":
         print("目录不存在，请检查路径。")
         exit()
         
-    # 索引构建（如果已有保存的索引则加载）
-    index_file = "file_index.pkl"
-    if os.path.exists(index_file):
-        print("Loading existing index...")
-        indexer.load_index(index_file)
-    else:
-        print("Building new index...") 
-        start = time.time()
-        indexer.build_index(myPath)  # 构建索引
-        elapsed = (time.time() - start) * 1000
-        print(f"构建耗时：{elapsed:.2f}ms")
-        indexer.save_index()
-
-    # 启动文件监控
+    # 索引构建（已有快照则加载，重放事件日志并与磁盘对账）
+    index_file = "file_index.sbidx"
+    store = IndexStore(indexer, index_file)
+    start = time.time()
+    stats = store.open(myPath)
+    elapsed = (time.time() - start) * 1000
+    print(f"索引就绪：{stats}，耗时：{elapsed:.2f}ms")
+
+    # 启动文件监控（事件批量合并后写日志并更新索引）
+    updater = store.updater()
     observer = Observer()
     observer.schedule(
-        everything.IndexUpdater(indexer),
+        updater,
         path=myPath,
         recursive=True
     )
@@ -44,7 +41,8 @@ if __name__ == "__main__":
                 break
 
             start = time.time()
-            results = searcher.search(query)
+            with updater.lock:
+                results = searcher.search(query)
             elapsed = (time.time() - start) * 1000
 
             print(f"Found {len(results)} results in {elapsed:.2f}ms:")
@@ -54,4 +52,5 @@ if __name__ == "__main__":
     finally:
         observer.stop()
         observer.join()
-        indexer.save_index()  # 退出时保存最新索引
\ No newline at end of file
+        updater.stop()
+        store.checkpoint()  # 退出时写入快照并清空日志
\ No newline at end of file
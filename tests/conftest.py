@@ -0,0 +1,10 @@
+"""
+测试与 benchmarks 一样直接导入源码目录：flask_app（modules 包）与 search_files_app
+运行: python -m pytest tests
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'flask_app'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'search_files_app'))
@@ -0,0 +1,39 @@
+import threading
+import pytest
+import crawl
+import everything
+from ngram_index import NgramIndexer
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for top in ('b', 'a', 'c'):
+        for sub in ('x', 'y'):
+            d = tmp_path / top / sub
+            d.mkdir(parents=True)
+            for i in range(5):
+                (d / f'{top}{sub}{i}.txt').write_text('x')
+    (tmp_path / 'root.txt').write_text('x')
+    return tmp_path
+
+
+def _entries(indexer):
+    return sorted(indexer.match('.txt'))
+
+
+@pytest.mark.parametrize('backend', [NgramIndexer, everything.FileIndexer])
+def test_parallel_build_matches_single(tree, backend):
+    single, parallel = backend(), backend()
+    crawl.parallel_build(single, str(tree), workers=1)
+
+    # 与索引服务一样在后台线程中构建（进程池不能直接 fork 有其他线程的进程）
+    thread = threading.Thread(target=crawl.parallel_build, args=(parallel, str(tree), 2))
+    thread.start()
+    thread.join(60)
+
+    assert not thread.is_alive()
+    assert len(_entries(single)) == 31
+    assert _entries(parallel) == _entries(single)
+    if backend is NgramIndexer:
+        # 合并顺序确定：ID与单线程构建相同
+        assert [parallel.path(i) for i in range(len(parallel))] == [single.path(i) for i in range(len(single))]
@@ -0,0 +1,135 @@
+import os
+import time
+import pytest
+from modules import dir_cache
+
+# 等待 watchdog 事件到达的最长时间（秒）
+EVENT_TIMEOUT = 5
+
+
+@pytest.fixture
+def cache():
+    cache = dir_cache.DirCache()
+    yield cache
+    if cache._observer is not None:
+        cache._observer.stop()
+        cache._observer.join()
+
+
+def _names(result):
+    return sorted(item['name'] for item in result)
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + EVENT_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_hit_returns_cached_list(cache, tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    first = cache.get_files(str(tmp_path))
+    assert _names(first) == ['a.txt']
+    assert cache.get_files(str(tmp_path)) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    # 列表、目录与列式结果分别缓存
+    assert cache.get_dirs(str(tmp_path)) == []
+    assert len(cache.get_columns(str(tmp_path))) == 1
+
+
+def test_changes_invalidate(cache, tmp_path):
+    (tmp_path / 'sub').mkdir()
+    path = str(tmp_path)
+    cache.get_files(path)
+
+    (tmp_path / 'new.txt').write_text('x')
+    assert _wait_for(lambda: 'new.txt' in _names(cache.get_files(path)))
+
+    os.rename(tmp_path / 'new.txt', tmp_path / 'renamed.txt')
+    assert _wait_for(lambda: _names(cache.get_files(path)) == ['renamed.txt', 'sub'])
+
+    os.remove(tmp_path / 'renamed.txt')
+    assert _wait_for(lambda: _names(cache.get_files(path)) == ['sub'])
+
+
+def test_reads_do_not_invalidate(cache, tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    first = cache.get_files(str(tmp_path))
+    (tmp_path / 'a.txt').read_text()
+    time.sleep(0.3)
+    assert cache.get_files(str(tmp_path)) is first
+
+
+def test_removed_directory_invalidates_subtree(cache, tmp_path):
+    sub = tmp_path / 'sub'
+    (sub / 'deep').mkdir(parents=True)
+    (sub / 'deep' / 'a.txt').write_text('a')
+    cache.get_files(str(tmp_path))
+    cache.get_files(str(sub / 'deep'))
+
+    os.rename(sub, tmp_path / 'moved')
+    assert _wait_for(lambda: _names(cache.get_files(str(tmp_path))) == ['moved'])
+    assert _wait_for(lambda: cache.get_files(str(sub / 'deep')) is None)
+
+
+def test_explicit_invalidate(cache, tmp_path):
+    (tmp_path / 'sub').mkdir()
+    top = cache.get_files(str(tmp_path))
+    sub = cache.get_files(str(tmp_path / 'sub'))
+
+    cache.invalidate(str(tmp_path))
+    assert cache.get_files(str(tmp_path)) is not top
+    assert cache.get_files(str(tmp_path / 'sub')) is sub
+
+    top = cache.get_files(str(tmp_path))
+    cache.invalidate(str(tmp_path) + os.sep, recursive=True)
+    assert cache.get_files(str(tmp_path)) is not top
+    assert cache.get_files(str(tmp_path / 'sub')) is not sub
+
+
+def test_lru_limits(tmp_path):
+    cache = dir_cache.DirCache(max_dirs=2)
+    try:
+        dirs = []
+        for i in range(3):
+            d = tmp_path / f'd{i}'
+            d.mkdir()
+            (d / 'f').write_text('x')
+            dirs.append(str(d))
+        results = [cache.get_files(d) for d in dirs]
+        assert len(cache._entries) == 2
+        # 最早的目录被淘汰，其监控注销
+        assert cache.get_files(dirs[2]) is results[2]
+        assert dir_cache._norm(dirs[0]) not in cache._watches
+        assert cache.get_files(dirs[0]) is not results[0]
+    finally:
+        if cache._observer is not None:
+            cache._observer.stop()
+
+
+def test_missing_directory_not_cached(cache, tmp_path):
+    assert cache.get_files(str(tmp_path / 'missing')) is None
+    assert not cache._entries
+
+
+def test_share_splits_limit(cache, tmp_path, monkeypatch):
+    """多进程时各工作进程的目录上限平分，监控总数不超过 MAX_DIRS"""
+    monkeypatch.setattr(dir_cache, 'MAX_DIRS', 6)
+    dirs = []
+    for i in range(4):
+        d = tmp_path / f'd{i}'
+        d.mkdir()
+        dirs.append(str(d))
+        cache.get_files(str(d))
+    assert len(cache._watches) == 4
+
+    cache.share(3)
+    assert cache.max_dirs == 2
+    assert len(cache._entries) == len(cache._watches) == 2
+    # 保留最近使用的目录
+    assert dir_cache._norm(dirs[3]) in cache._watches
+    cache.share(10)
+    assert cache.max_dirs == 1
@@ -0,0 +1,97 @@
+import os
+import json
+import gzip
+import pytest
+from flask import Flask
+from modules import file_columns, file_dir
+
+
+@pytest.fixture
+def listing(tmp_path):
+    for name in ('file10.txt', 'File2.TXT', 'file1.txt', 'README', '.bashrc', 'a.tar.gz', 'x.'):
+        (tmp_path / name).write_bytes(b'x' * len(name))
+    for name in ('dir2', 'Dir10'):
+        (tmp_path / name).mkdir()
+    return tmp_path
+
+
+def _rows(columns, rows):
+    return [columns.name[row] for row in rows]
+
+
+def test_scan_matches_get_files(listing):
+    columns = file_columns.scan(str(listing))
+    files = file_dir.get_files(str(listing))
+    assert columns.name == [item['name'] for item in files]
+    for row, item in enumerate(files):
+        if item['type'] == file_columns.FOLDER:
+            assert columns.types[columns.type[row]] == file_columns.FOLDER
+            assert columns.size[row] == -1
+        else:
+            assert file_dir.convert_size(str(columns.size[row])) == item['size']
+        assert columns.paths[columns.path[row]] == item['path']
+        assert columns.full_path(row) == os.path.join(str(listing), item['name'])
+    assert file_columns.scan(str(listing / 'missing')) is None
+
+
+@pytest.mark.parametrize('name, file_type', [
+    ('a.JPG', 'jpg'), ('a.tar.gz', 'gz'), ('README', 'file'), ('.bashrc', 'file'), ('.a.b', 'b'),
+])
+def test_file_type(name, file_type):
+    assert file_columns._file_type(name) == file_type
+
+
+def test_order(listing):
+    columns = file_columns.scan(str(listing))
+    # 自然排序、不区分大小写，文件夹总在前
+    assert _rows(columns, columns.order('name')) == [
+        'dir2', 'Dir10', '.bashrc', 'a.tar.gz', 'file1.txt', 'File2.TXT', 'file10.txt', 'README', 'x.']
+    assert _rows(columns, columns.order('name', reverse=True))[:2] == ['Dir10', 'dir2']
+    by_size = _rows(columns, columns.order('size'))
+    assert by_size[:2] == ['dir2', 'Dir10']
+    assert by_size[2:] == sorted(by_size[2:], key=len)
+    assert _rows(columns, columns.order('type'))[2:] == [
+        '.bashrc', 'README', 'x.', 'a.tar.gz', 'file1.txt', 'File2.TXT', 'file10.txt']
+    # 每种排序只计算一次
+    assert columns.order('size') is columns.order('size')
+    with pytest.raises(ValueError):
+        columns.order('owner')
+
+
+def test_take_and_replace_copy(listing):
+    columns = file_columns.scan(str(listing))
+    rows = columns.order('name')[2:5]
+    page = columns.take(rows)
+    assert page.name == ['.bashrc', 'a.tar.gz', 'file1.txt']
+    assert page.version == columns.version and len(columns) == 9
+
+    with_video = page.replace(video=[None, {'duration': 1}, None])
+    assert with_video.to_dict()['video'] == [None, {'duration': 1}, None]
+    assert 'video' not in page.to_dict()
+
+
+def test_from_entries(listing):
+    entries = [file_columns.stat_entry(str(listing), name) for name in ('file1.txt', 'dir2')]
+    assert file_columns.stat_entry(str(listing), 'missing') is None
+    data = file_columns.from_entries(entries).to_dict()
+    assert data['name'] == ['file1.txt', 'dir2']
+    assert [data['types'][t] for t in data['type']] == ['txt', file_columns.FOLDER]
+    assert data['size'] == [9, -1]
+
+
+def test_respond_compression(listing):
+    data = file_columns.scan(str(listing)).to_dict()
+    big = dict(data, name=data['name'] * 200, path=data['path'] * 200)
+    app = Flask(__name__)
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = file_columns.respond(big)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.get_data())) == big
+
+    # 小响应不压缩
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = file_columns.respond(data)
+        assert 'Content-Encoding' not in response.headers
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.get_data()) == data
@@ -0,0 +1,216 @@
+import os
+import pytest
+from modules import file_jobs
+
+
+@pytest.fixture
+def manager():
+    return file_jobs.JobManager(workers=2)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _run(manager, kind, src_dir, dst_dir, names):
+    job = manager.submit(kind, src_dir, dst_dir, names)
+    assert manager.wait(job, timeout=10)
+    return job
+
+
+def test_copy_file_and_tree(manager, tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.bin'), os.urandom(100000))
+    _write(str(src / 'tree' / 'b.txt'), b'hello')
+    _write(str(src / 'tree' / 'sub' / 'c.txt'), b'')
+    os.symlink('b.txt', src / 'tree' / 'link')
+    dst.mkdir()
+
+    job = _run(manager, 'copy', str(src), str(dst), ['a.bin', 'tree'])
+
+    status = job.status()
+    assert status['state'] == file_jobs.DONE, status['errors']
+    assert status['files_done'] == status['files_total'] == 4
+    assert status['bytes_done'] == status['bytes_total'] == 100005
+    for name in ('a.bin', 'tree/b.txt', 'tree/sub/c.txt'):
+        assert _read(str(dst / name)) == _read(str(src / name))
+    assert os.readlink(dst / 'tree' / 'link') == 'b.txt'
+    assert os.stat(dst / 'a.bin').st_mtime_ns == os.stat(src / 'a.bin').st_mtime_ns
+    # 源不变
+    assert (src / 'a.bin').exists() and (src / 'tree' / 'sub').is_dir()
+
+
+def test_copy_refuses_existing_target(manager, tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.txt'), b'new')
+    _write(str(dst / 'a.txt'), b'old')
+
+    job = _run(manager, 'copy', str(src), str(dst), ['a.txt'])
+
+    assert job.state == file_jobs.FAILED
+    assert _read(str(dst / 'a.txt')) == b'old'
+
+
+def test_copy_same_file_keeps_source(manager, tmp_path):
+    """源与目标为同一文件时报错，不能以 'wb' 打开截断源文件"""
+    data = os.urandom(5000)
+    _write(str(tmp_path / 'a.bin'), data)
+    os.symlink(tmp_path, tmp_path / 'alias')
+
+    for dst_dir in (tmp_path, tmp_path / 'alias'):
+        job = _run(manager, 'copy', str(tmp_path), str(dst_dir), ['a.bin'])
+        assert job.state == file_jobs.FAILED
+        assert job.errors[0]['error'] == "源与目标是同一文件"
+        assert _read(str(tmp_path / 'a.bin')) == data
+
+
+def test_copy_into_own_subdirectory(manager, tmp_path):
+    _write(str(tmp_path / 'tree' / 'a.txt'), b'x')
+
+    job = _run(manager, 'copy', str(tmp_path), str(tmp_path / 'tree'), ['tree'])
+
+    assert job.state == file_jobs.FAILED
+    assert not (tmp_path / 'tree' / 'tree').exists()
+
+
+def test_move(manager, tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.txt'), b'a')
+    _write(str(src / 'tree' / 'b.txt'), b'b')
+    _write(str(src / 'taken.txt'), b'src')
+    _write(str(dst / 'taken.txt'), b'dst')
+
+    job = _run(manager, 'move', str(src), str(dst), ['a.txt', 'tree', 'taken.txt'])
+
+    assert job.state == file_jobs.FAILED
+    assert [e['path'] for e in job.errors] == [str(dst / 'taken.txt')]
+    assert not (src / 'a.txt').exists() and not (src / 'tree').exists()
+    assert _read(str(dst / 'a.txt')) == b'a'
+    assert _read(str(dst / 'tree' / 'b.txt')) == b'b'
+    assert _read(str(src / 'taken.txt')) == b'src'
+    assert _read(str(dst / 'taken.txt')) == b'dst'
+
+
+def test_cancel_and_resume(manager, tmp_path, monkeypatch):
+    """第一块写完后取消，续传从已写入的长度继续"""
+    chunk = 64 * 1024
+    data = os.urandom(chunk * 5 + 123)
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'big.bin'), data)
+    dst.mkdir()
+
+    def cancelling_copy(fin, fout, pos, count):
+        n = file_jobs._buffered_copy(fin, fout, pos, count)
+        for job_id in list(manager._jobs):
+            manager.cancel(job_id)
+        return n
+
+    monkeypatch.setattr(file_jobs, 'CHUNK_SIZE', chunk)
+    monkeypatch.setattr(file_jobs, 'COPY_METHODS', [cancelling_copy])
+    job = _run(manager, 'copy', str(src), str(dst), ['big.bin'])
+
+    assert job.state == file_jobs.CANCELLED
+    assert os.path.getsize(dst / 'big.bin') == chunk
+    assert not manager.resume('no-such-job')
+
+    monkeypatch.setattr(file_jobs, 'COPY_METHODS', [file_jobs._buffered_copy])
+    assert manager.resume(job.id)
+    assert manager.wait(job, timeout=10)
+
+    assert job.state == file_jobs.DONE, job.errors
+    assert _read(str(dst / 'big.bin')) == data
+    assert job.bytes_done == len(data)
+    assert job.transferred == len(data) - chunk
+    # 已结束的任务不能再取消
+    assert not manager.cancel(job.id)
+
+
+def test_resume_skips_finished_files(manager, tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.txt'), b'aaa')
+    dst.mkdir()
+    job = _run(manager, 'copy', str(src), str(dst), ['a.txt', 'b.txt'])
+    assert job.state == file_jobs.FAILED     # b.txt 不存在
+
+    # 续传时本任务已完整复制的文件（大小与修改时间一致）跳过
+    _write(str(src / 'b.txt'), b'bbbb')
+    assert manager.resume(job.id)
+    assert manager.wait(job, timeout=10)
+    assert job.state == file_jobs.DONE, job.errors
+    assert job.files_done == 2 and job.transferred == 4
+    assert _read(str(dst / 'b.txt')) == b'bbbb'
+
+
+@pytest.mark.parametrize('existing', [b'IMPORTANT', b'IMPORTANT THAT IS LONGER THAN THE SOURCE'])
+def test_resume_keeps_existing_target(manager, tmp_path, existing):
+    """重试因目标已存在而失败的任务，不能续写或覆盖原本就存在的文件"""
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.txt'), b'source data')
+    _write(str(dst / 'a.txt'), existing)
+
+    for kind in ('copy', 'move'):
+        job = _run(manager, kind, str(src), str(dst), ['a.txt'])
+        assert job.state == file_jobs.FAILED
+        assert manager.resume(job.id)
+        assert manager.wait(job, timeout=10)
+        assert job.state == file_jobs.FAILED
+        assert [e['error'] for e in job.errors] == ["目标已存在"]
+        assert _read(str(dst / 'a.txt')) == existing
+        assert _read(str(src / 'a.txt')) == b'source data'
+
+
+def test_resume_keeps_existing_directory(manager, tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'tree' / 'a.txt'), b'source')
+    _write(str(dst / 'tree' / 'a.txt'), b'keep')
+
+    job = _run(manager, 'copy', str(src), str(dst), ['tree'])
+    assert manager.resume(job.id)
+    assert manager.wait(job, timeout=10)
+
+    assert job.state == file_jobs.FAILED
+    assert _read(str(dst / 'tree' / 'a.txt')) == b'keep'
+
+
+def test_cancel_and_resume_tree(manager, tmp_path, monkeypatch):
+    """目录树复制中途取消，续传时写入本任务创建的目录与文件"""
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    files = {f'tree/d{i}/f{j}.bin': os.urandom(1000 * (i + j + 1)) for i in range(3) for j in range(3)}
+    for name, data in files.items():
+        _write(str(src / name), data)
+    dst.mkdir()
+    copies = []
+
+    def cancelling_copy(fin, fout, pos, count):
+        copies.append(pos)
+        if len(copies) == 4:
+            for job_id in list(manager._jobs):
+                manager.cancel(job_id)
+        return file_jobs._buffered_copy(fin, fout, pos, count)
+
+    monkeypatch.setattr(file_jobs, 'COPY_METHODS', [cancelling_copy])
+    job = _run(manager, 'copy', str(src), str(dst), ['tree'])
+    assert job.state == file_jobs.CANCELLED
+
+    assert manager.resume(job.id)
+    assert manager.wait(job, timeout=10)
+    assert job.state == file_jobs.DONE, job.errors
+    for name, data in files.items():
+        assert _read(str(dst / name)) == data
+
+
+def test_delete(manager, tmp_path):
+    _write(str(tmp_path / 'a.txt'), b'a')
+    _write(str(tmp_path / 'tree' / 'sub' / 'b.txt'), b'b')
+
+    job = _run(manager, 'delete', str(tmp_path), None, ['a.txt', 'tree'])
+
+    assert job.state == file_jobs.DONE, job.errors
+    assert os.listdir(tmp_path) == []
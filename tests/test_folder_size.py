@@ -0,0 +1,142 @@
+import os
+import time
+import pytest
+from modules import folder_size
+
+# 等待 watchdog 事件与后台刷新的最长时间（秒）
+EVENT_TIMEOUT = 5
+
+
+def _write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / 'root'
+    for i, name in enumerate(('a/f1', 'a/f2', 'a/sub/f3', 'a/sub/deep/f4', 'b/f5', 'c/f6', 'top')):
+        _write(str(root / name), 10 * (i + 1))
+    return root
+
+
+@pytest.fixture
+def service(root):
+    service = folder_size.FolderSizeService(debounce=0)
+    service.start([str(root)])
+    assert _wait_for(lambda: service.get(str(root)) is not None)
+    yield service
+    service.stop()
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + EVENT_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def _state(nodes):
+    return {path: (node.own_bytes, node.own_files, node.bytes, node.files, node.children)
+            for path, node in nodes.items()}
+
+
+def _consistent(service, root):
+    """增量维护的节点与重新扫描的结果相同"""
+    with service._lock:
+        return _state(service._nodes) == _state(folder_size._scan_tree(str(root)))
+
+
+def test_build_totals(service, root):
+    assert service.get(str(root)) == {'bytes': 280, 'files': 7}
+    assert service.get(str(root / 'a')) == {'bytes': 100, 'files': 4}
+    assert service.get(str(root / 'a' / 'sub')) == {'bytes': 70, 'files': 2}
+    assert service.get(str(root / 'missing')) is None
+    assert _consistent(service, root)
+
+    listing = [{'name': 'a', 'path': str(root), 'type': "文件夹", 'size': '-'},
+               {'name': 'top', 'path': str(root), 'type': 'file', 'size': '70B'}]
+    annotated = service.annotate(str(root), listing)
+    assert annotated[0]['files'] == 4 and annotated[1] is listing[1]
+    assert 'files' not in listing[0]
+
+
+def test_changes_propagate(service, root):
+    _write(str(root / 'a' / 'sub' / 'deep' / 'new'), 1000)
+    assert _wait_for(lambda: service.get(str(root)) == {'bytes': 1280, 'files': 8})
+    (root / 'a' / 'f1').unlink()
+    os.makedirs(root / 'b' / 'fresh' / 'x')
+    _write(str(root / 'b' / 'fresh' / 'x' / 'g'), 5)
+    assert _wait_for(lambda: service.get(str(root / 'b')) == {'bytes': 55, 'files': 2})
+    assert _wait_for(lambda: service.get(str(root)) == {'bytes': 1275, 'files': 8})
+    assert _consistent(service, root)
+
+
+def test_removed_directory(service, root):
+    for name in ('a/sub/deep/f4', 'a/sub/f3'):
+        (root / name).unlink()
+    os.rmdir(root / 'a' / 'sub' / 'deep')
+    os.rmdir(root / 'a' / 'sub')
+    assert _wait_for(lambda: service.get(str(root / 'a' / 'sub')) is None)
+    assert _wait_for(lambda: service.get(str(root)) == {'bytes': 210, 'files': 5})
+    assert _consistent(service, root)
+
+
+def test_rename_moves_nodes_without_rescan(service, root, monkeypatch):
+    """目录改名/移动把已统计的子树改挂到新路径，不重新扫描移动的子树"""
+    scanned = []
+    scan_tree = folder_size._scan_tree
+    monkeypatch.setattr(folder_size, '_scan_tree', lambda top: scanned.append(top) or scan_tree(top))
+
+    os.rename(root / 'a', root / 'renamed')
+    os.rename(root / 'renamed' / 'sub', root / 'b' / 'moved')
+    assert _wait_for(lambda: service.get(str(root / 'b')) == {'bytes': 120, 'files': 3})
+    assert _wait_for(lambda: service.get(str(root / 'renamed')) == {'bytes': 30, 'files': 2})
+    assert service.get(str(root / 'a')) is None
+    assert service.get(str(root / 'b' / 'moved' / 'deep')) == {'bytes': 40, 'files': 1}
+    assert service.get(str(root)) == {'bytes': 280, 'files': 7}
+    assert scanned == []
+    assert _consistent(service, root)
+
+    # 改挂后的节点继续增量更新
+    _write(str(root / 'b' / 'moved' / 'deep' / 'more'), 100)
+    assert _wait_for(lambda: service.get(str(root / 'b')) == {'bytes': 220, 'files': 4})
+    assert _consistent(service, root)
+
+
+def test_move_onto_empty_directory(service, root):
+    os.makedirs(root / 'empty')
+    assert _wait_for(lambda: service.get(str(root / 'empty')) is not None)
+    os.rename(root / 'a', root / 'empty')
+    assert _wait_for(lambda: service.get(str(root / 'empty')) == {'bytes': 100, 'files': 4})
+    assert _wait_for(lambda: _consistent(service, root))
+
+
+def test_move_out_of_and_into_root(service, root, tmp_path):
+    os.rename(root / 'a', tmp_path / 'outside')
+    assert _wait_for(lambda: service.get(str(root)) == {'bytes': 180, 'files': 3})
+    assert service.get(str(tmp_path / 'outside')) is None
+    os.rename(tmp_path / 'outside', root / 'c' / 'back')
+    assert _wait_for(lambda: service.get(str(root)) == {'bytes': 280, 'files': 7})
+    assert _consistent(service, root)
+
+
+def test_rebase():
+    src, dst = os.path.join('r', 'a'), os.path.join('r', 'b', 'a')
+    assert folder_size._rebase(src, src, dst) == dst
+    assert folder_size._rebase(os.path.join(src, 'x'), src, dst) == os.path.join(dst, 'x')
+    assert folder_size._rebase(os.path.join('r', 'ab'), src, dst) == os.path.join('r', 'ab')
+
+
+def test_publish_and_attach(service, root, tmp_path):
+    filename = str(tmp_path / 'index' / 'folder_size.json')
+    service.publish(filename)
+    reader = folder_size.FolderSizeService()
+    reader.attach([str(root)], filename)
+    assert reader.get(str(root / 'a')) == {'bytes': 100, 'files': 4}
+    # 只读副本不处理事件
+    reader.mark(str(root / 'a'))
+    assert not reader._dirty
@@ -0,0 +1,130 @@
+import os
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileMovedEvent, DirDeletedEvent, FileOpenedEvent
+from ngram_index import NgramIndexer
+from index_store import IndexJournal, IndexStore
+
+
+def _write(path, data='x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(data)
+
+
+def _paths(indexer):
+    return sorted(path for _, path in indexer.match('.txt'))
+
+
+def _touch_later(path):
+    """保证目录 mtime 变化（文件系统时间戳精度有限）"""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def _open(root, index_file):
+    store = IndexStore(NgramIndexer(), index_file)
+    return store, store.open(root)
+
+
+def test_journal_round_trip(tmp_path):
+    journal = IndexJournal(str(tmp_path / 'index.journal'))
+    assert list(journal.events()) == []
+    journal.append(FileCreatedEvent('/r/a.txt'))
+    journal.append(FileMovedEvent('/r/a.txt', '/r/b.txt'))
+    journal.append(DirDeletedEvent('/r/old'))
+    journal.append(FileOpenedEvent('/r/b.txt'))       # 不可重放的事件不写入
+    assert journal.pending == 3
+    # 崩溃时写了一半的最后一行被忽略
+    with open(journal.filename, 'a', encoding='utf-8') as f:
+        f.write('["created", false, "/r/c')
+
+    events = list(journal.events())
+    assert [(e.event_type, e.is_directory, e.src_path, e.dest_path) for e in events] == [
+        ('created', False, '/r/a.txt', ''), ('moved', False, '/r/a.txt', '/r/b.txt'), ('deleted', True, '/r/old', '')]
+    journal.truncate()
+    assert not os.path.exists(journal.filename) and journal.pending == 0
+
+
+def test_open_builds_then_loads_snapshot(tmp_path):
+    root, index_file = str(tmp_path / 'root'), str(tmp_path / 'index' / 'files.sbidx')
+    for name in ('a.txt', 'sub/b.txt', 'sub/deep/c.txt'):
+        _write(os.path.join(root, name))
+    os.makedirs(os.path.dirname(index_file))
+
+    store, stats = _open(root, index_file)
+    assert stats['source'] == 'build'
+    assert os.path.exists(index_file)
+    expected = _paths(store.indexer)
+    assert len(expected) == 3
+
+    snapshot_mtime = os.stat(index_file).st_mtime_ns
+    store, stats = _open(root, index_file)
+    assert stats == {'source': 'snapshot', 'replayed': 0, 'checked': 3, 'rescanned': 0, 'added': 0, 'removed': 0}
+    assert _paths(store.indexer) == expected
+    # 没有变化时不重写快照
+    assert os.stat(index_file).st_mtime_ns == snapshot_mtime
+
+
+def test_reconcile_offline_changes(tmp_path):
+    """停机期间的变化：只重扫 mtime 变化的目录，结果与重新构建一致"""
+    root, index_file = str(tmp_path / 'root'), str(tmp_path / 'files.sbidx')
+    for name in ('a.txt', 'keep/b.txt', 'gone/c.txt', 'gone/sub/d.txt', 'quiet/e.txt'):
+        _write(os.path.join(root, name))
+    _open(root, index_file)
+
+    _write(os.path.join(root, 'keep', 'new.txt'))
+    os.remove(os.path.join(root, 'a.txt'))
+    for name in ('gone/sub/d.txt', 'gone/c.txt'):
+        os.remove(os.path.join(root, name))
+    os.rmdir(os.path.join(root, 'gone', 'sub'))
+    os.rmdir(os.path.join(root, 'gone'))
+    _write(os.path.join(root, 'added', 'deep', 'f.txt'))
+    for name in ('', 'keep'):
+        _touch_later(os.path.join(root, name))
+
+    store, stats = _open(root, index_file)
+    assert stats['source'] == 'snapshot'
+    assert stats['rescanned'] == 2                  # root 与 keep；quiet 未变化
+    assert stats['added'] == 2 and stats['removed'] == 3
+    rebuilt = NgramIndexer()
+    rebuilt.build_index(root)
+    assert _paths(store.indexer) == _paths(rebuilt)
+    # 对账后写入新快照
+    assert _paths(_open(root, index_file)[0].indexer) == _paths(rebuilt)
+
+
+def test_replay_journal_after_crash(tmp_path):
+    """快照之后记录在日志中的事件在下次启动时重放"""
+    root, index_file = str(tmp_path / 'root'), str(tmp_path / 'files.sbidx')
+    _write(os.path.join(root, 'a.txt'))
+    _write(os.path.join(root, 'b.txt'))
+    store, _ = _open(root, index_file)
+
+    updater = store.updater()
+    _write(os.path.join(root, 'c.txt'))
+    os.remove(os.path.join(root, 'a.txt'))
+    updater.dispatch(FileCreatedEvent(os.path.join(root, 'c.txt')))
+    updater.dispatch(FileDeletedEvent(os.path.join(root, 'a.txt')))
+    updater.stop()
+    assert store.journal.pending == 2
+    assert _paths(store.indexer) == [os.path.join(root, 'b.txt'), os.path.join(root, 'c.txt')]
+    store.journal._file.close()     # 模拟崩溃：不写快照
+
+    reopened, stats = _open(root, index_file)
+    assert stats['replayed'] == 2
+    assert _paths(reopened.indexer) == [os.path.join(root, 'b.txt'), os.path.join(root, 'c.txt')]
+    # 重放后写入快照并清空日志
+    assert not os.path.exists(reopened.journal.filename)
+
+
+def test_invalid_snapshot_rebuilds(tmp_path, capsys):
+    root, index_file = str(tmp_path / 'root'), str(tmp_path / 'files.sbidx')
+    _write(os.path.join(root, 'a.txt'))
+    with open(index_file, 'wb') as f:
+        f.write(b'not an index')
+    IndexJournal(index_file + '.journal').append(FileCreatedEvent(os.path.join(root, 'stale.txt')))
+
+    store, stats = _open(root, index_file)
+    assert stats['source'] == 'build'
+    assert "索引快照不可用" in capsys.readouterr().out
+    assert _paths(store.indexer) == [os.path.join(root, 'a.txt')]
+    assert not os.path.exists(store.journal.filename)
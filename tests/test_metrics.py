@@ -0,0 +1,76 @@
+import pytest
+from flask import Flask
+from blueprints import metrics_route
+from modules import metrics
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(metrics_route.bp)
+    metrics.init_app(app)
+    yield app.test_client()
+    metrics.profiler.disable()
+
+
+def test_counter_render():
+    counter = metrics.Counter('calls_total', "调用次数", ('op',))
+    counter.inc(op='stat')
+    counter.inc(3, op='stat')
+    counter.inc(op='a"b\\c\n')
+    assert counter.render() == [
+        '# HELP calls_total 调用次数', '# TYPE calls_total counter',
+        'calls_total{op="a\\"b\\\\c\\n"} 1', 'calls_total{op="stat"} 4']
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram('latency_seconds', "延迟", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2', 'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4', 'latency_seconds_sum 3.65', 'latency_seconds_count 4']
+
+
+def test_registry_collectors(capsys):
+    registry = metrics.Registry()
+    registry.counter('c_total', "计数").inc()
+
+    @registry.collector
+    def _broken():
+        raise RuntimeError("boom")
+
+    @registry.collector
+    def _queue():
+        return [('queue_depth', 'gauge', "队列长度", [({'queue': 'index'}, 3), ({}, 1)])]
+
+    text = registry.render()
+    assert text.endswith('\n')
+    assert 'c_total 1\n' in text
+    assert '# TYPE queue_depth gauge\nqueue_depth{queue="index"} 3\nqueue_depth 1\n' in text
+    assert "采集指标失败:boom" in capsys.readouterr().out
+
+
+def test_request_latency_recorded(client):
+    client.get('/metrics')
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert ('storagebox_request_seconds_count{endpoint="metrics_route.get_metrics",method="GET",status="200"}'
+            in text)
+    assert '# TYPE storagebox_fs_calls_total counter' in text
+
+
+def test_profile_switch(client):
+    for body in ({'rate': 'abc'}, [1], 'x'):
+        assert client.post('/metrics/profile', json=body).status_code == 400
+    assert "没有采样数据" in client.get('/metrics/profile').get_data(as_text=True)
+
+    assert client.post('/metrics/profile', json={'rate': 5}).get_json() == {'rate': 1.0}
+    client.get('/metrics')
+    report = client.get('/metrics/profile?sort=tottime&limit=5').get_data(as_text=True)
+    assert report.startswith("采样请求数: ")
+    assert client.get('/metrics/profile?sort=bogus').status_code == 400
+
+    assert client.post('/metrics/profile', json={'rate': 0}).get_json() == {'rate': 0.0}
+    assert not metrics.profiler.enabled
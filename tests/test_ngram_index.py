@@ -0,0 +1,138 @@
+"""NgramIndexer 的匹配结果在各种修改之后与逐个文件名比较的结果一致"""
+import os
+import random
+import pytest
+import everything
+from ngram_index import NgramIndexer
+
+TERMS = ['a', 'é', 'ab', 'b.', 'abc', 'ca.', '.éa', 'abca', 'bc.é', 'zz', 'aaaa']
+DIRS = ['/r', '/r/x', '/r/x/y', '/r/xy', '/r/z', '/r/z/x']
+
+
+class Model:
+    """索引的参照实现：{完整路径: 文件名}"""
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.indexer = NgramIndexer()
+        self.files = {}
+
+    def add(self, count):
+        for _ in range(count):
+            name = ''.join(self.rng.choice('abcAB.é') for _ in range(self.rng.randint(1, 6)))
+            path = os.path.join(self.rng.choice(DIRS), name)
+            self.indexer._add_to_index(name, path, (1, 1))
+            self.files[path] = name
+
+    def remove(self, count):
+        for path in self.rng.sample(sorted(self.files), count):
+            self.indexer._remove_from_index(path)
+            del self.files[path]
+
+    def remove_tree(self, dir_path):
+        self.indexer._remove_tree(dir_path)
+        for path in [p for p in self.files if p.startswith(dir_path + '/')]:
+            del self.files[path]
+
+    def move_tree(self, src, dest):
+        assert self.indexer._move_tree(src, dest)
+        for path in [p for p in self.files if p.startswith(src + '/')]:
+            self.files[dest + path[len(src):]] = self.files.pop(path)
+
+    def check(self):
+        assert len(self.indexer) == len(self.files)
+        searcher = everything.FileSearcher(self.indexer)
+        for term in TERMS:
+            expected = {(name, path) for path, name in self.files.items() if term in name.lower()}
+            assert self.indexer.match(term) == expected, term
+        for query in ('a', 'ab b', 'A.'):
+            words = query.lower().split()
+            for directory in ('/r', '/r/x', '/r/x/', '/q', *{os.path.dirname(p) for p in self.files}):
+                prefix = os.path.join(directory.rstrip('/'), '')
+                expected = {(name, path) for path, name in self.files.items()
+                            if path.startswith(prefix) and all(w in name.lower() for w in words)}
+                assert set(searcher.search(query, None, directory)) == expected, (query, directory)
+
+
+@pytest.fixture
+def model():
+    model = Model(seed=7)
+    model.add(2000)
+    return model
+
+
+def test_add(model):
+    model.check()
+    # 重复添加只刷新属性
+    path, name = next(iter(model.files.items()))
+    model.indexer._add_to_index(name, path, (2, 2))
+    model.check()
+
+
+def test_remove(model):
+    model.remove(700)
+    model.check()
+    model.add(300)
+    model.check()
+
+
+def test_remove_tree(model):
+    model.remove_tree('/r/x')
+    model.check()
+    assert any(p.startswith('/r/xy/') for p in model.files)
+
+
+def test_move(model):
+    searcher = everything.FileSearcher(model.indexer)
+    assert searcher.search('a', None, '/r/x')
+    model.move_tree('/r/x', '/r/moved')
+    # 目录过滤的缓存（under）随移动失效
+    assert searcher.search('a', None, '/r/x') == []
+    assert searcher.search('a', None, '/r/moved')
+    model.check()
+    # 移动后的目录继续添加、删除与再次移动
+    model.add(200)
+    model.remove(100)
+    model.move_tree('/r/moved/y', '/r/z/y')
+    model.check()
+    assert not model.indexer._move_tree('/r/missing', '/r/other')
+    assert not model.indexer._move_tree('/r/z', '/r/xy')    # 目标已有记录
+
+
+def test_compact(model):
+    model.remove(1500)
+    model.move_tree('/r/z', '/r/w')
+    epoch, version = model.indexer.id_epoch, model.indexer.version
+    model.indexer.compact()
+    assert model.indexer._dead == 0
+    assert model.indexer.id_epoch == epoch + 1 and model.indexer.version > version
+    model.check()
+    model.add(500)
+    model.remove(200)
+    model.check()
+
+
+def test_auto_compact():
+    """死记录超过一半时删除会自动重建"""
+    model = Model(seed=3)
+    model.add(6000)
+    epoch = model.indexer.id_epoch
+    model.remove(len(model.files) * 3 // 4)
+    assert model.indexer.id_epoch > epoch
+    model.check()
+
+
+def test_save_and_load(model, tmp_path):
+    model.remove(500)
+    model.move_tree('/r/x/y', '/r/y')
+    filename = str(tmp_path / 'index.sbidx')
+    model.indexer.save_index(filename)
+
+    loaded = NgramIndexer()
+    loaded.load_index(filename, verify=True)
+    model.indexer = loaded
+    model.check()
+    # 映射的索引首次修改时复制为可变结构
+    model.add(100)
+    model.remove(100)
+    model.move_tree('/r/z', '/r/q')
+    model.check()
@@ -0,0 +1,111 @@
+import time
+import random
+import pytest
+import query_filter
+from ngram_index import NgramIndexer
+
+G = 1 << 30
+M = 1 << 20
+
+
+def _local(*date):
+    return int(time.mktime((*date, 0, 0, 0, 0, 0, -1)))
+
+
+@pytest.mark.parametrize('name, ext', [
+    ('a.JPG', 'jpg'), ('a.tar.gz', 'gz'), ('noext', ''), ('.bashrc', ''),
+    ('..hidden', ''), ('.a.b', 'b'), ('x.', ''),
+])
+def test_extension(name, ext):
+    assert query_filter.extension(name) == ext
+
+
+def test_parse_without_filters():
+    assert query_filter.parse('holiday  photo') == ('holiday photo', None)
+    # 无法解析的条件按普通搜索词处理
+    assert query_filter.parse('size:huge note:1 type:nope') == ('size:huge note:1 type:nope', None)
+
+
+def test_parse_ext_and_type():
+    rest, filters = query_filter.parse('clip EXT:.MP4,mkv')
+    assert rest == 'clip'
+    assert filters.exts == {'mp4', 'mkv'}
+
+    _, filters = query_filter.parse('type:video ext:mp4,jpg')
+    assert filters.exts == {'mp4'}      # 各条件取交集
+
+    _, filters = query_filter.parse('type:image,audio')
+    assert filters.exts == query_filter.TYPE_GROUPS['image'] | query_filter.TYPE_GROUPS['audio']
+
+
+@pytest.mark.parametrize('query, bounds', [
+    ('size:>1G', (G + 1, None)),
+    ('size:>=1G', (G, None)),
+    ('size:<10m', (0, 10 * M - 1)),
+    ('size:<=10M', (0, 10 * M)),
+    ('size:1M..1G', (M, G)),
+    ('size:1.5k', (1536, 1536)),
+    ('size:>1M size:<1G', (M + 1, G - 1)),
+])
+def test_parse_size(query, bounds):
+    rest, filters = query_filter.parse(query)
+    assert rest == ''
+    assert filters.bounds('size') == bounds
+
+
+@pytest.mark.parametrize('query, bounds', [
+    ('modified:2025', (_local(2025, 1, 1), _local(2026, 1, 1) - 1)),
+    ('modified:2025-*', (_local(2025, 1, 1), _local(2026, 1, 1) - 1)),
+    ('modified:2025-12', (_local(2025, 12, 1), _local(2026, 1, 1) - 1)),
+    ('modified:2025-03-14', (_local(2025, 3, 14), _local(2025, 3, 15) - 1)),
+    ('modified:>=2025-03-01', (_local(2025, 3, 1), None)),
+    ('modified:<2025', (0, _local(2025, 1, 1) - 1)),
+    ('modified:2025-01..2025-06', (_local(2025, 1, 1), _local(2025, 7, 1) - 1)),
+])
+def test_parse_modified(query, bounds):
+    _, filters = query_filter.parse(query)
+    assert filters.bounds('mtime') == bounds
+
+
+def test_filters_are_dict_keys():
+    assert query_filter.parse('ext:mp4 size:>1M')[1] == query_filter.parse('size:>1M ext:MP4')[1]
+    assert len({query_filter.parse('ext:mp4')[1], query_filter.parse('ext:mkv')[1]}) == 2
+
+
+def test_match():
+    _, filters = query_filter.parse('type:video size:>1M modified:2025')
+    inside = _local(2025, 6, 1)
+    assert filters.match('a.MP4', 2 * M, inside)
+    assert not filters.match('a.jpg', 2 * M, inside)
+    assert not filters.match('a.mp4', M, inside)
+    assert not filters.match('a.mp4', 2 * M, _local(2024, 6, 1))
+    # 只限制上界时排除读取失败（-1）的文件
+    _, filters = query_filter.parse('size:<1M')
+    assert filters.match('a', 0, 0) and not filters.match('a', -1, 0)
+
+
+def test_index_filter_matches_brute_force():
+    """NgramIndexer.filter_ids 的列式过滤与逐个文件的 Filters.match 一致"""
+    rng = random.Random(1)
+    exts = ['mp4', 'MKV', 'jpg', 'txt', 'gz', '']
+    indexer = NgramIndexer()
+    files = []
+    for i in range(3000):
+        ext = rng.choice(exts)
+        name = f'f{i}.{ext}' if ext else f'f{i}'
+        attrs = (rng.choice([-1, 0, 100, M, 5 * M, G, 2 * G]),
+                 rng.choice([-1, _local(2024, 5, 1), _local(2025, 3, 14), _local(2025, 12, 31)]))
+        indexer._add_to_index(name, f'/r/d{i % 7}/{name}', attrs)
+        files.append((name, attrs))
+    for i in range(0, 3000, 5):
+        indexer._remove_from_index(f'/r/d{i % 7}/{files[i][0]}')
+
+    for query in ['ext:mp4', 'ext:mkv,gz', 'type:video', 'type:media size:>1M', 'size:<1M',
+                  'size:1M..1G', 'modified:2025', 'modified:<2025-06', 'ext:txt modified:>=2025-03-14']:
+        _, filters = query_filter.parse(query)
+        expected = {i for i, (name, (size, mtime)) in enumerate(files)
+                    if i % 5 and filters.match(name, size, mtime)}
+        assert set(indexer.filter_ids(filters)) == expected, query
+        # 在子串匹配的候选上过滤
+        candidates = indexer.match_ids('f1')
+        assert set(indexer.filter_ids(filters, candidates)) == expected & candidates, query
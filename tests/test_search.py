@@ -0,0 +1,87 @@
+"""FileSearcher 的排序与 top-k：两个索引后端的结果一致，且与ID分配（爬取）顺序无关"""
+import os
+import random
+import pytest
+import everything
+import ngram_index
+from ngram_index import NgramIndexer
+
+QUERIES = ['a', 'ab', 'b a', 'abc', 'c.', '.', 'a a', 'ab ab', 'zz', 'A', 'ba.c']
+DIRECTORIES = [None, '/r/d1', '/r/d1/', '/r/d2/d0', '/nope']
+
+
+def _files(seed):
+    rng = random.Random(seed)
+    files = set()
+    while len(files) < 3000:
+        name = ''.join(rng.choice('abcB.') for _ in range(rng.randint(1, 5)))
+        root = '/r' + ''.join(f'/d{rng.randint(0, 3)}' for _ in range(rng.randint(0, 3)))
+        files.add((name, os.path.join(root, name)))
+    return sorted(files)
+
+
+def _expected(files, query, limit, directory):
+    """参照实现：(完全匹配 / 前缀匹配 / 子串匹配, 目录深度, 目录, 文件名)"""
+    query = query.lower().strip()
+    terms = set(query.split())
+    ranked = []
+    for name, path in files:
+        lower_name = name.lower()
+        root = os.path.dirname(path)
+        if not all(term in lower_name for term in terms):
+            continue
+        if directory is not None and not (root + '/').startswith(directory.rstrip('/') + '/'):
+            continue
+        kind = 0 if lower_name == query or lower_name in terms else \
+            1 if any(lower_name.startswith(term) for term in terms) else 2
+        ranked.append((kind, root.count('/'), root, name, path))
+    ranked.sort()
+    return [(name, path) for *_, name, path in ranked[:limit]]
+
+
+@pytest.fixture(scope='module')
+def searchers():
+    files = _files(seed=3)
+    shuffled = list(files)
+    random.Random(5).shuffle(shuffled)
+    result = {'files': files}
+    for label, indexer, order in (('ngram', NgramIndexer(), files), ('ngram_shuffled', NgramIndexer(), shuffled),
+                                  ('trie', everything.FileIndexer(), shuffled)):
+        for name, path in order:
+            if isinstance(indexer, NgramIndexer):
+                indexer._add_to_index(name, path, (1, 1))
+            else:
+                indexer._add_to_index(name, path)
+        result[label] = everything.FileSearcher(indexer)
+    return result
+
+
+@pytest.mark.parametrize('ratio', [ngram_index.RANK_SCAN_RATIO, 0.0])
+@pytest.mark.parametrize('directory', DIRECTORIES)
+def test_ranked_top_k(searchers, monkeypatch, ratio, directory):
+    monkeypatch.setattr(ngram_index, 'RANK_SCAN_RATIO', ratio)
+    files = searchers['files']
+    for query in QUERIES:
+        for limit in (None, 1, 7, 100):
+            expected = _expected(files, query, limit, directory)
+            for label in ('ngram', 'ngram_shuffled', 'trie'):
+                searcher = searchers[label]
+                searcher._cache.clear()
+                assert searcher.search(query, limit, directory) == expected, (label, query, limit)
+                # 第二次命中查询缓存
+                assert searcher.search(query, limit, directory) == expected, (label, query, limit)
+
+
+def test_cached_prefix_narrowing(searchers):
+    """较短查询的缓存结果用于缩小较长查询的候选"""
+    files = searchers['files']
+    for label in ('ngram', 'trie'):
+        searcher = searchers[label]
+        searcher._cache.clear()
+        searcher.search('a', 5)
+        assert searcher.search('ab', 50) == _expected(files, 'ab', 50, None), label
+        assert searcher.search('ab c', 50) == _expected(files, 'ab c', 50, None), label
+
+
+def test_zero_limit(searchers):
+    assert searchers['ngram'].search('a', 0) == []
@@ -0,0 +1,89 @@
+import json
+import pytest
+from flask import Flask
+from blueprints import file_utils
+from modules import search_stream
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """未建索引的目录，搜索退回遍历"""
+    for i in range(30):
+        sub = tmp_path / f'd{i % 3}'
+        sub.mkdir(exist_ok=True)
+        (sub / f'report{i}.txt').write_text('x')
+        (sub / f'photo{i}.jpg').write_text('x')
+    return tmp_path
+
+
+def _messages(lines):
+    return [json.loads(line) for line in lines]
+
+
+def _files(messages):
+    return [item['name'] for message in messages for item in message.get('files', ())]
+
+
+def test_stream_all(tree):
+    messages = _messages(search_stream.stream_search(str(tree), 'report'))
+    done = messages[-1]
+    assert done['done'] and done['reason'] == 'done'
+    assert done['count'] == 30
+    assert sorted(_files(messages)) == sorted(f'report{i}.txt' for i in range(30))
+    # 第一个结果单独立即发送
+    assert len(messages[0]['files']) == 1
+    assert done['first_result_ms'] is not None
+
+
+def test_stream_filters_and_terms(tree):
+    messages = _messages(search_stream.stream_search(str(tree), 'PHOTO1 ext:jpg'))
+    assert sorted(_files(messages)) == sorted(f'photo{i}.jpg' for i in (1, *range(10, 20)))
+    messages = _messages(search_stream.stream_search(str(tree), 'nothing'))
+    assert messages[-1]['count'] == 0 and messages[-1]['first_result_ms'] is None
+
+
+def test_stream_limit(tree):
+    messages = _messages(search_stream.stream_search(str(tree), 'report', max_results=3))
+    assert messages[-1]['reason'] == 'limit'
+    assert messages[-1]['count'] == 3
+    assert len(_files(messages)) == 3
+
+
+def test_stream_timeout(tree):
+    messages = _messages(search_stream.stream_search(str(tree), 'report', timeout=-1))
+    assert messages[-1]['reason'] == 'timeout'
+
+
+def test_new_search_cancels_old(tree):
+    old = search_stream.stream_search(str(tree), 'report', client_id='client')
+    first = json.loads(next(old))
+    assert first['files']
+    new = _messages(search_stream.stream_search(str(tree), 'photo', client_id='client'))
+    assert new[-1]['reason'] == 'done'
+
+    rest = _messages(old)
+    assert rest[-1]['reason'] == 'cancelled'
+    assert rest[-1]['count'] < 30
+    # 已结束的搜索不再记录
+    assert not search_stream.registry._latest
+
+
+def test_close_stops_search(tree):
+    lines = search_stream.stream_search(str(tree), 'report', client_id='closing')
+    next(lines)
+    lines.close()
+    assert 'closing' not in search_stream.registry._latest
+
+
+def test_search_route_is_not_capped(tree, monkeypatch):
+    """非流式 /search 返回全部匹配，不受 MAX_RESULTS 限制"""
+    monkeypatch.setattr(search_stream, 'MAX_RESULTS', 5)
+    app = Flask(__name__)
+    app.register_blueprint(file_utils.bp)
+    client = app.test_client()
+
+    response = client.post('/search', json={'path': str(tree), 'search_term': 'report'})
+    assert sorted(item['name'] for item in response.get_json()) == sorted(f'report{i}.txt' for i in range(30))
+    response = client.post('/search', json={'path': str(tree), 'search_term': 'report', 'format': 'columns'},
+                           headers={'Accept': 'application/json'})
+    assert response.get_json()['count'] == 30
@@ -0,0 +1,133 @@
+import os
+import pytest
+from flask import Flask
+from werkzeug.http import http_date
+from modules import static_serve
+
+DATA = bytes(range(256)) * 40     # 10240 字节
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 100)]),
+    ('bytes=100-', [(100, 1000)]),
+    ('bytes=-50', [(950, 1000)]),
+    ('bytes=-5000', [(0, 1000)]),
+    ('bytes=990-2000', [(990, 1000)]),
+    ('bytes=0-9, 5-19, 20-29', [(0, 30)]),             # 重叠与相邻的区间合并
+    ('bytes=500-599,0-99', [(0, 100), (500, 600)]),
+    ('bytes=1000-', []),                               # 不可满足
+    ('bytes=2000-3000,-0', []),
+    (None, None),
+    ('items=0-1', None),
+    ('bytes=abc', None),
+    ('bytes=5-1', None),
+    ('bytes=' + ','.join(['0-1'] * (static_serve.MAX_RANGES + 1)), None),
+])
+def test_parse_ranges(header, expected):
+    assert static_serve.parse_ranges(header, 1000) == expected
+
+
+@pytest.fixture(params=['read', 'file_wrapper'])
+def client(request, tmp_path):
+    """两种响应体：按块读取（测试客户端没有套接字）与 WSGI file_wrapper"""
+    path = tmp_path / 'data.bin'
+    path.write_bytes(DATA)
+    app = Flask(__name__)
+
+    @app.route('/file')
+    def serve_file():
+        return static_serve.serve(str(path))
+
+    @app.route('/missing')
+    def missing():
+        return static_serve.serve(str(tmp_path / 'missing')) or ("not found", 404)
+
+    client = app.test_client()
+    if request.param == 'file_wrapper':
+        from werkzeug.wsgi import FileWrapper
+        client.environ_base['wsgi.file_wrapper'] = FileWrapper
+    client.st = os.stat(path)
+    return client
+
+
+def test_full_response(client):
+    response = client.get('/file')
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.headers['Content-Length'] == str(len(DATA))
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag'] == static_serve.etag(client.st)
+
+
+def test_missing_file(client):
+    assert client.get('/missing').status_code == 404
+
+
+def test_single_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=100-299'})
+    assert response.status_code == 206
+    assert response.data == DATA[100:300]
+    assert response.headers['Content-Range'] == f'bytes 100-299/{len(DATA)}'
+    assert response.headers['Content-Length'] == '200'
+
+    response = client.get('/file', headers={'Range': 'bytes=-10'})
+    assert response.status_code == 206
+    assert response.data == DATA[-10:]
+
+
+def test_multiple_ranges(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9,1000-1009'})
+    assert response.status_code == 206
+    content_type = response.headers['Content-Type']
+    assert content_type.startswith('multipart/byteranges; boundary=')
+    boundary = content_type.split('boundary=')[1]
+    body = response.data
+    assert len(body) == int(response.headers['Content-Length'])
+    assert body.endswith(f'--{boundary}--\r\n'.encode())
+    for start, end in ((0, 10), (1000, 1010)):
+        part = f'Content-Range: bytes {start}-{end - 1}/{len(DATA)}\r\n\r\n'.encode() + DATA[start:end]
+        assert part in body
+
+
+def test_unsatisfiable_range(client):
+    response = client.get('/file', headers={'Range': f'bytes={len(DATA)}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(DATA)}'
+    assert response.data == b''
+
+
+def test_invalid_range_returns_whole_file(client):
+    response = client.get('/file', headers={'Range': 'bytes=x-y'})
+    assert response.status_code == 200
+    assert response.data == DATA
+
+
+def test_not_modified(client):
+    tag = static_serve.etag(client.st)
+    for headers in ({'If-None-Match': tag},
+                    {'If-None-Match': f'"other", W/{tag}'},
+                    {'If-None-Match': '*'},
+                    {'If-Modified-Since': http_date(client.st.st_mtime + 1)}):
+        response = client.get('/file', headers=headers)
+        assert response.status_code == 304, headers
+        assert response.data == b''
+        assert response.headers['ETag'] == tag
+
+    # If-None-Match 优先于 If-Modified-Since
+    response = client.get('/file', headers={'If-None-Match': '"other"',
+                                            'If-Modified-Since': http_date(client.st.st_mtime + 1)})
+    assert response.status_code == 200
+    response = client.get('/file', headers={'If-Modified-Since': http_date(client.st.st_mtime - 10)})
+    assert response.status_code == 200
+
+
+def test_if_range(client):
+    tag = static_serve.etag(client.st)
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': tag})
+    assert response.status_code == 206
+    assert response.data == DATA[:10]
+
+    # 版本不一致时忽略 Range
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == DATA
@@ -0,0 +1,103 @@
+import os
+import json
+import struct
+import time
+import threading
+import cv2
+import numpy as np
+import pytest
+from modules import create_thumbnail, thumbnail_store, thumbnail_service
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = str(tmp_path / 'photo.png')
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 255, (300, 400, 3), dtype=np.uint8))
+    return path
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = thumbnail_service.ThumbnailService(thumbnail_store.ThumbnailStore(str(tmp_path / 'thumbs')), workers=1)
+    yield service
+    service.shutdown(wait=True)
+
+
+def _settle(service):
+    """等待完成回调登记缩略图（回调在 get 返回之后、任务移出进行中之前执行）"""
+    deadline = time.monotonic() + 10
+    while service.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not service.pending()
+
+
+def _unpack(body):
+    (length,) = struct.unpack_from('<I', body)
+    return json.loads(body[4:4 + length]), body[4 + length:]
+
+
+def test_rendition():
+    assert [thumbnail_service.rendition(size) for size in (None, 1, 96, 97, 480, 5000)] == [480, 96, 96, 240, 480, 480]
+
+
+def test_get_generates_all_renditions(service, image):
+    location = service.get(image, size=100, timeout=30)
+    assert location == service.store.locate(service.store.key(image, 240))
+    assert _settle(service)
+    # 一次解码生成全部尺寸
+    for size in create_thumbnail.RENDITIONS:
+        key = service.store.key(image, size)
+        assert os.path.exists(service.store.path(key))
+        assert service.lookup(image, size, generate=False) == service.store.locate(key)
+
+
+def test_get_failures(service, image, tmp_path):
+    assert service.get(str(tmp_path / 'missing.png')) is False
+    (tmp_path / 'notes.txt').write_text('x')
+    assert service.get(str(tmp_path / 'notes.txt'), timeout=30) is False
+    (tmp_path / 'broken.jpg').write_bytes(b'not an image')
+    assert service.get(str(tmp_path / 'broken.jpg'), timeout=30) is False
+
+
+def test_timeout_keeps_job_running(service, image):
+    assert service.get(image, timeout=0) is None
+    assert service.pending() == 1
+    assert service.get(image, timeout=30)
+
+
+def test_concurrent_requests_share_job(service, image, monkeypatch):
+    submitted = []
+    new_pool = service._new_pool
+
+    def counting_pool():
+        pool = new_pool()
+        submit = pool.submit
+        pool.submit = lambda *args: submitted.append(args) or submit(*args)
+        return pool
+
+    monkeypatch.setattr(service, '_new_pool', counting_pool)
+    results = []
+    threads = [threading.Thread(target=lambda size=size: results.append(service.get(image, size, timeout=30)))
+               for size in (96, 240, 480, 480)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(submitted) == 1
+    assert all(results)
+
+
+def test_pack(service, image, tmp_path):
+    (tmp_path / 'notes.txt').write_text('x')
+    header, data = _unpack(service.pack([image, str(tmp_path / 'notes.txt')], size=96, generate=False))
+    assert header['items'] == [] and len(header['missing']) == 2
+    assert service.pending() == 0
+
+    assert service.get(image, timeout=30) and _settle(service)
+    header, data = _unpack(service.pack([image, str(tmp_path / 'notes.txt')], size=96))
+    assert header['type'] == 'image/webp'
+    assert header['missing'] == [str(tmp_path / 'notes.txt')]
+    (item,) = header['items']
+    assert item['key'] == service.store.key(image, 96)
+    with open(service.store.path(item['key']), 'rb') as f:
+        assert data[item['offset']:item['offset'] + item['length']] == f.read()
@@ -0,0 +1,101 @@
+import os
+import pytest
+from modules import thumbnail_store
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'jpeg')
+    return str(path)
+
+
+def _put(store, key, size, mtime=None):
+    path = store.reserve(key)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    store.add(key)
+    return path
+
+
+def test_key_changes_with_version_and_size(source):
+    store = thumbnail_store.ThumbnailStore('unused')
+    key = store.key(source, 240)
+    assert store.key(source, 240) == key
+    assert store.key(source, 96) != key
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert store.key(source, 240) != key
+    # 内容寻址：按键的前两位分子目录
+    sub_dir, name = store.locate(key)
+    assert os.path.basename(sub_dir) == key[:2] and name == key + '.webp'
+
+
+def test_lookup_and_lru_eviction(tmp_path):
+    store = thumbnail_store.ThumbnailStore(str(tmp_path / 'thumbs'), max_bytes=250)
+    assert store.lookup('aa' * 20) is None
+    paths = {key: _put(store, key, 100) for key in ('aa' * 20, 'bb' * 20)}
+    assert store.lookup('aa' * 20) == store.locate('aa' * 20)
+
+    # 超出预算时淘汰最久未访问的 bb
+    paths['cc' * 20] = _put(store, 'cc' * 20, 100)
+    assert not os.path.exists(paths['bb' * 20])
+    assert store.lookup('bb' * 20) is None
+    assert store.stats() == {'count': 2, 'bytes': 200, 'hits': 1, 'misses': 2}
+
+
+def test_load_from_disk(tmp_path):
+    root = tmp_path / 'thumbs'
+    first = thumbnail_store.ThumbnailStore(str(root))
+    _put(first, 'aa' * 20, 10, mtime=2000)
+    _put(first, 'bb' * 20, 20, mtime=1000)
+    # 未完成的临时文件不计入
+    (root / 'cc').mkdir()
+    (root / 'cc' / ('cc' * 20 + '.123.tmp.webp')).write_bytes(b'x')
+
+    store = thumbnail_store.ThumbnailStore(str(root), max_bytes=15)
+    assert store.stats()['count'] == 2
+    # 按 mtime 近似访问顺序：淘汰较旧的 bb
+    assert store.trim() == 1
+    assert store.lookup('aa' * 20) is not None
+    assert store.lookup('bb' * 20) is None
+    assert thumbnail_store.ThumbnailStore(str(tmp_path / 'missing')).stats()['count'] == 0
+
+
+def test_legacy_thumbnails_removed(tmp_path, capsys):
+    """旧版按文件名命名、直接放在目录下的缩略图在首次扫描时删除"""
+    root = tmp_path / 'thumbs'
+    root.mkdir()
+    for name in ('thumbnail.a.jpg.webp', 'thumbnail.#b#0.mp4.webp'):
+        (root / name).write_bytes(b'old')
+    (root / 'video_meta.jsonl').write_text('{}\n')
+    (root / 'thumbnail.dir.webp').mkdir()
+    store = thumbnail_store.ThumbnailStore(str(root))
+    _put(thumbnail_store.ThumbnailStore(str(root)), 'aa' * 20, 10)
+
+    assert store.stats()['count'] == 1
+    assert sorted(os.listdir(root)) == ['aa', 'thumbnail.dir.webp', 'video_meta.jsonl']
+    assert "已删除2个旧版缩略图" in capsys.readouterr().out
+
+
+def test_shared_lookup_follows_disk(tmp_path):
+    """共享模式：其他进程写入的缩略图可以命中，被淘汰的不再命中"""
+    root = str(tmp_path / 'thumbs')
+    writer, reader = thumbnail_store.ThumbnailStore(root), thumbnail_store.ThumbnailStore(root)
+    reader.share()
+    assert reader.lookup('aa' * 20) is None
+    path = _put(writer, 'aa' * 20, 10, mtime=1000)
+
+    assert reader.lookup('aa' * 20) == reader.locate('aa' * 20)
+    # 命中刷新 mtime，属主进程 trim 时视为最近访问
+    assert os.path.getmtime(path) > 1000
+    os.remove(path)
+    assert reader.lookup('aa' * 20) is None
+    assert reader.stats()['count'] == 0
+
+    # 共享模式下 add 不淘汰
+    reader.max_bytes = 5
+    _put(reader, 'bb' * 20, 10)
+    assert reader.lookup('bb' * 20) is not None
@@ -0,0 +1,131 @@
+import os
+import json
+import cv2
+import numpy as np
+import pytest
+from modules import video_probe, file_dir, file_columns
+
+
+@pytest.fixture
+def video(tmp_path):
+    """3 秒、10 fps，前 10 帧全黑"""
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for i in range(30):
+        writer.write(np.full((48, 64, 3), 0 if i < 10 else 200, np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return video_probe.MetadataStore(str(tmp_path / 'meta' / 'video_meta.jsonl'))
+
+
+def _lines(store):
+    with open(store.filename, 'rb') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_poster_frame_skips_dark_frames(video, tmp_path):
+    frame, meta = video_probe.poster_frame(video)
+    assert meta == {'duration': 3.0, 'width': 64, 'height': 48, 'fps': 10.0, 'frames': 30, 'codec': 'MJPG'}
+    assert video_probe.brightness(frame) >= video_probe.DARK_THRESHOLD
+    assert video_probe.poster_frame(str(tmp_path / 'missing.avi')) == (None, None)
+
+
+def test_info_probes_once(store, video, monkeypatch):
+    meta = store.info(video)
+    assert meta['frames'] == 30
+    # 命中缓存时不再打开视频
+    monkeypatch.setattr(video_probe.cv2, 'VideoCapture', None)
+    assert store.info(video) == meta
+    assert store.entry(video)[2] == meta
+
+
+def test_modified_file_invalidates(store, tmp_path):
+    path = tmp_path / 'a.mp4'
+    path.write_bytes(b'v1')
+    store.put(str(path), {'duration': 1})
+    assert store.get(str(path)) == {'duration': 1}
+    path.write_bytes(b'version 2')
+    assert store.get(str(path)) is None
+    assert store.get(str(tmp_path / 'missing.mp4')) is None
+
+
+def test_append_and_read_other_process(store, tmp_path, monkeypatch):
+    """每次 put 只追加一行；其他进程追加的行在 REFRESH_INTERVAL 后读取"""
+    monkeypatch.setattr(video_probe, 'REFRESH_INTERVAL', 0)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f'{i}.mp4'
+        path.write_bytes(b'x' * i)
+        paths.append(str(path))
+    store.put(paths[0], {'duration': 0})
+    other = video_probe.MetadataStore(store.filename)
+    assert other.get(paths[0]) == {'duration': 0}
+
+    other.put(paths[1], {'duration': 1})
+    store.put(paths[2], {'duration': 2})
+    assert [line[0] for line in _lines(store)] == paths
+    assert store.get(paths[1]) == {'duration': 1}
+    assert other.get(paths[2]) == {'duration': 2}
+
+    # 写了一半的行（其他进程正在追加）不读取
+    with open(store.filename, 'ab') as f:
+        f.write(b'["/x.mp4", 1, 2, {')
+    assert video_probe.MetadataStore(store.filename).get(paths[2]) == {'duration': 2}
+
+
+def test_compact_drops_stale_and_superseded(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(video_probe, 'COMPACT_MIN', 3)
+    keep, gone = tmp_path / 'keep.mp4', tmp_path / 'gone.mp4'
+    keep.write_bytes(b'k')
+    gone.write_bytes(b'g')
+    store.put(str(gone), {'duration': 0})      # 本进程首次写入时重写一次日志
+    store.put(str(keep), {'duration': 1})
+    os.remove(gone)
+    for duration in range(2, 6):
+        store.put(str(keep), {'duration': duration})
+
+    # 被覆盖的行超过 COMPACT_MIN 时重写：去掉已删除文件与被覆盖的行
+    lines = _lines(store)
+    assert len(lines) < 6 and {line[0] for line in lines} == {str(keep)}
+    assert store.get(str(keep)) == {'duration': 5}
+    assert store.entry(str(gone)) is None
+
+
+def test_migrate_legacy_json(tmp_path):
+    path = tmp_path / 'a.mp4'
+    path.write_bytes(b'v')
+    st = os.stat(path)
+    legacy = tmp_path / 'video_meta.json'
+    legacy.write_text(json.dumps({str(path): [st.st_mtime_ns, st.st_size, {'duration': 7}],
+                                  str(tmp_path / 'deleted.mp4'): [1, 1, {'duration': 0}]}))
+
+    store = video_probe.MetadataStore(str(tmp_path / 'video_meta.jsonl'), legacy_file=str(legacy))
+    assert store.get(str(path)) == {'duration': 7}
+    assert not legacy.exists()
+    assert len(_lines(store)) == 1
+
+
+def test_annotate_listing(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(video_probe, 'store', store)
+    for name in ('a.mp4', 'b.mp4', 'c.txt'):
+        (tmp_path / name).write_bytes(b'x' * 10)
+    store.put(str(tmp_path / 'a.mp4'), {'duration': 1})
+
+    listing = file_dir.get_files(str(tmp_path))
+    annotated = {item['name']: item for item in video_probe.annotate(listing)}
+    assert annotated['a.mp4']['video'] == {'duration': 1}
+    assert 'video' not in annotated['b.mp4'] and 'video' not in annotated['c.txt']
+    assert all('video' not in item for item in listing)
+
+    columns = file_columns.scan(str(tmp_path))
+    video = video_probe.annotate_columns(columns).to_dict()['video']
+    assert video == [{'duration': 1} if name == 'a.mp4' else None for name in columns.name]
+    # 文件修改后（大小变化）记录过期
+    (tmp_path / 'a.mp4').write_bytes(b'x' * 20)
+    columns = file_columns.scan(str(tmp_path))
+    assert video_probe.annotate_columns(columns) is columns
+    assert all('video' not in item for item in video_probe.annotate(file_dir.get_files(str(tmp_path))))